@@ -1,65 +1,115 @@
 import os
-from openai import OpenAI
 from llm_interface import LLMInterface
+from llm_clients import openai_client, async_openai_client
+from board_encoding import encoding_legend, needs_stone_lists
+from threat_solver import prompt_hint_section
 import re
 
 class QWQ(LLMInterface):
-    def __init__(self, config, gomoku_game):
+    final_answer_marker = "=== Final Answer ==="  # 推理和最终回答的分界，流式解析只在它后面找最终坐标
+
+    def __init__(self, config, gomoku_game, model_name=None, base_url=None, api_key_section=None):
+        # 三个参数都可以在 config.ini 的 [provider:名字] 小节里覆盖，接入别的 OpenAI 兼容模型不用再复制一份文件
         self.config = config
         self.gomoku_game = gomoku_game
-        self.api_key = self.config.get('modelscope', 'api_key')  # 从 config.ini 读取 API Key
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api-inference.modelscope.cn/v1/"
-        )
+        self.base_url = base_url or "https://api-inference.modelscope.cn/v1/"
+        self.model_name = model_name or "Qwen/QwQ-32B"  # ModelScope Model-Id
+        self.api_key_section = api_key_section or 'modelscope'
 
-    def create_prompt(self, board_state, ai_color):
+    @property
+    def client(self):
+        """第一次请求时才创建，和同一 base_url 的其他模型共用一个连接池"""
+        return openai_client(self.config, self.api_key_section, self.base_url)
+
+    @property
+    def async_client(self):
+        """异步驱动用的客户端，必须在事件循环里取"""
+        return async_openai_client(self.config, self.api_key_section, self.base_url)
+
+    def prompt_rules(self):
         prompt = f"【五子棋指令】你现在是白棋AI (玩家2)，目标是赢下这场对决！<(￣︶￣)>\n"
         prompt += "棋盘大小为15x15，坐标范围0到14，请牢记！(눈_눈)\n"
         prompt += "【规则】横、纵、斜均可连成五子获胜！(ง •̀_•́)ง\n"
-        prompt += "【说明】棋盘状态中：'空'表示空位，'黑'表示黑棋，'白'表示白棋，请勿混淆！(╯▔皿▔)╯\n"
+        prompt += encoding_legend(self.board_encoding) or "【说明】棋盘状态中：'空'表示空位，'黑'表示黑棋，'白'表示白棋，请勿混淆！(╯▔皿▔)╯\n"
         prompt += "坐标说明：格式为[行,列]，例如[2,0]表示第3行第1列；棋盘顶部及左侧有坐标轴。\n"
-        prompt += "当前棋盘状态：\n" + board_state + "\n"
-
-        # 记录双方棋子的位置
-        black_pieces = []
-        white_pieces = []
-        for x in range(self.gomoku_game.size):
-            for y in range(self.gomoku_game.size):
-                if self.gomoku_game.board[x][y] == 1:
-                    black_pieces.append((x, y))
-                elif self.gomoku_game.board[x][y] == 2:
-                    white_pieces.append((x, y))
-        prompt += "\n【黑棋位置】： " + str(black_pieces) + "\n"
-        prompt += "\n【白棋位置】： " + str(white_pieces) + "\n"
+        return prompt
 
-        prompt += "【核心】只能在空位落子，否则判输！(╬￣皿￣)\n"
+    def prompt_instructions(self):
+        prompt = "【核心】只能在空位落子，否则判输！(╬￣皿￣)\n"
         prompt += "\n请快速思考一步最佳落子位置，迅速决定，最多思考30秒！(눈_눈)\n"
         prompt += "思考时请用()标示考虑的坐标（例如：(3,5)），最终请用[]标示最终选择（例如：[4,7]）。\n"
         prompt += "理由可附加，但坐标格式必须正确！(ಡωಡ)\n"
+        return prompt
+
+    def create_prompt(self, board_state, ai_color):
+        if self.session is not None and self.session.active:
+            # 会话模式：规则和要求在系统前缀里，这里只发这一步的增量
+            prompt = self.session.turn_prompt(self.gomoku_game, board_state, self.board_encoding)
+            print(prompt)
+            return prompt
+
+        prompt = self.prompt_rules()
+        prompt += "当前棋盘状态：\n" + board_state + "\n"
+
+        # 记录双方棋子的位置
+        if needs_stone_lists(self.gomoku_game, self.board_encoding):
+            black_pieces = self.gomoku_game.position.stones(1)
+            white_pieces = self.gomoku_game.position.stones(2)
+            prompt += "\n【黑棋位置】： " + str(black_pieces) + "\n"
+            prompt += "\n【白棋位置】： " + str(white_pieces) + "\n"
+        if self.gomoku_game.prompt_hints:
+            prompt += prompt_hint_section(self.gomoku_game.position, 2)
+
+        prompt += self.prompt_instructions()
         print(prompt)
         return prompt
 
     def get_llm_response_stream(self, prompt):
         done_reasoning = False
         completion = self.client.chat.completions.create(
-            model="Qwen/QwQ-32B",  # ModelScope Model-Id
-            messages=[{"role": "user", "content": prompt}],
+            model=self.model_name,
+            messages=self.chat_messages(prompt),  # 开了会话时是系统前缀 + 历史 + 这一步的增量
+            stream=True,
+        )
+        try:
+            for chunk in completion:
+                reasoning_chunk = chunk.choices[0].delta.reasoning_content
+                answer_chunk = chunk.choices[0].delta.content
+                if reasoning_chunk:
+                    yield reasoning_chunk
+                elif answer_chunk:
+                    if not done_reasoning:
+                        yield "\n\n === Final Answer ===\n"
+                        done_reasoning = True
+                    yield answer_chunk
+        finally:
+            # 提前结束迭代（已经拿到最终坐标）时关掉 HTTP 连接，服务端不再继续生成
+            completion.close()
+
+    async def get_llm_response_astream(self, prompt, executor=None):
+        """原生异步的流：期限到了任务被取消时，正在等的读操作马上取消、连接跟着关掉，不占线程，也不用等 read_timeout"""
+        done_reasoning = False
+        completion = await self.async_client.chat.completions.create(
+            model=self.model_name,
+            messages=self.chat_messages(prompt),
             stream=True,
         )
-        for chunk in completion:
-            reasoning_chunk = chunk.choices[0].delta.reasoning_content
-            answer_chunk = chunk.choices[0].delta.content
-            if reasoning_chunk:
-                yield reasoning_chunk
-            elif answer_chunk:
-                if not done_reasoning:
-                    yield "\n\n === Final Answer ===\n"
-                    done_reasoning = True
-                yield answer_chunk
+        try:
+            async for chunk in completion:
+                reasoning_chunk = chunk.choices[0].delta.reasoning_content
+                answer_chunk = chunk.choices[0].delta.content
+                if reasoning_chunk:
+                    yield reasoning_chunk
+                elif answer_chunk:
+                    if not done_reasoning:
+                        yield "\n\n === Final Answer ===\n"
+                        done_reasoning = True
+                    yield answer_chunk
+        finally:
+            await completion.close()
 
     def parse_response(self, response_text):
-        marker = "=== Final Answer ==="
+        marker = self.final_answer_marker
         if marker in response_text:
             final_text = response_text.split(marker)[-1]
         else:
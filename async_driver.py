@@ -0,0 +1,417 @@
+# async_driver.py
+# 异步走棋驱动：所有 LLM 请求都跑在同一个后台 asyncio 事件循环里，每步有超时、可以随时取消，
+# 每个模型提供方一个信号量限制并发，一个进程就能同时驱动几十盘 AIvsAI！(ง •̀_•́)ง
+# 界面不直接碰这里的线程：请求结果通过 concurrent.futures.Future 交回去，由 Tk 主线程处理。
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_clients
+from game_core import GomokuGame, MoveRequest, MAX_LLM_RETRIES
+from bitboard import BLACK, WHITE
+from move_salvage import MoveSalvager
+from move_metrics import percentile
+
+
+class LLMMoveTimeout(Exception):
+    """这一步在规定时间内没有拿到坐标"""
+
+
+async def request_llm_move_async(llm, game, ai_color, on_text=None, book=None, early_stop=None, salvage=None,
+                                 executor=None, request=None):
+    """request_llm_move 的异步版：参数和返回值相同，流式回复走 llm.get_llm_response_astream
+
+    可以传入现成的 request（MoveRequest），被取消后调用方还能从 request.response_text 里拿到已收到的部分。
+    """
+    loop = asyncio.get_running_loop()
+    if request is None:
+        request = MoveRequest(llm, game, ai_color, on_text, book, early_stop, salvage)
+    hit = request.book_move()
+    if hit is not None:
+        return hit
+    # 生成 Prompt 可能要跑威胁分析，放到线程池里，不卡事件循环
+    prompt = await loop.run_in_executor(executor, request.build_prompt)
+    request.mark("request")
+    stream = llm.get_llm_response_astream(prompt, executor)
+    try:
+        async for chunk in stream:
+            if request.feed(chunk):
+                break
+    finally:
+        await stream.aclose()
+    return request.finish()
+
+
+class DeadlineFallback:
+    """每步的硬性期限到了时替 LLM 落子：先从已收到的思考过程里按棋型挑合法候选，没有再让本地引擎搜一步
+
+    use_candidates=False 时直接用引擎；engine 为 None 时只看候选，候选也没有就返回 None（按超时处理）。
+    """
+
+    def __init__(self, engine=None, engine_time=1.0, use_candidates=True):
+        self.engine = engine
+        self.engine_time = engine_time
+        self.salvager = MoveSalvager("threat") if use_candidates else None
+        self.counts = {}  # 提供方 -> {"candidate": 次数, "engine": 次数}
+
+    def __call__(self, game, partial_text, provider):
+        """返回 (坐标, 来源说明) 或 None，在线程池里调用（引擎搜索会阻塞）"""
+        move, source = None, None
+        if self.salvager is not None and partial_text:
+            move = self.salvager.salvage(game, partial_text)
+            source = "candidate"
+        if move is None and self.engine is not None:
+            move = self.engine.search(game.position, game.player, self.engine_time).move
+            source = "engine"
+        if move is None:
+            return None
+        counts = self.counts.setdefault(provider, {"candidate": 0, "engine": 0})
+        counts[source] += 1
+        return move, ("已收到的思考过程里的候选" if source == "candidate" else "本地引擎")
+
+    def stats_text(self):
+        parts = [f"{provider} {c['candidate'] + c['engine']} 次（候选 {c['candidate']}、引擎 {c['engine']}）"
+                 for provider, c in self.counts.items()]
+        return "超时代下：" + ("，".join(parts) if parts else "0 次")
+
+
+class RaceStats:
+    """对冲请求的统计：每家胜了几次，整步用时的 p50 / p99
+
+    只让主请求单跑时的用时拿不到（对冲一发出去主请求就可能被取消），
+    所以用“没发对冲、主请求自己赢下”的那些步当基线，和整体用时比，估出对冲省下的时间。
+    """
+
+    def __init__(self):
+        self.wins = {}  # 提供方 -> 胜出次数
+        self.races = 0
+        self.hedged = 0  # 真的发出了对冲请求的步数
+        self.latencies = []
+        self.solo_latencies = []
+
+    def record(self, winner, primary, latency, launched):
+        self.races += 1
+        self.latencies.append(latency)
+        if launched > 1:
+            self.hedged += 1
+        elif winner == primary:
+            self.solo_latencies.append(latency)
+        key = winner if winner is not None else "无"
+        self.wins[key] = self.wins.get(key, 0) + 1
+
+    def stats_text(self):
+        if not self.races:
+            return "对冲请求：0 步"
+        wins = "，".join(f"{provider} {count}" for provider, count in self.wins.items())
+        text = f"对冲请求：{self.races} 步，发出对冲 {self.hedged} 步，胜出 {wins}"
+        p50, p99 = percentile(self.latencies, 0.5), percentile(self.latencies, 0.99)
+        text += f"；用时 p50 {p50:.1f} 秒 / p99 {p99:.1f} 秒"
+        if self.solo_latencies:
+            base50, base99 = percentile(self.solo_latencies, 0.5), percentile(self.solo_latencies, 0.99)
+            text += (f"；主请求单跑 p50 {base50:.1f} 秒 / p99 {base99:.1f} 秒，"
+                     f"估计省下 p50 {base50 - p50:+.1f} 秒 / p99 {base99 - p99:+.1f} 秒")
+        return text
+
+
+class AsyncMoveDriver:
+    """后台线程里跑一个事件循环，按提供方限制并发，给每步加硬性期限
+
+    provider_limits 是 {提供方: 最多同时请求数}，没列出的用 default_limit；
+    provider_timeouts 是 {提供方: 每步秒数}，没列出的用 move_timeout，None 表示不限；
+    fallback（DeadlineFallback）给了的话，期限一到就取消流，由它代下这一步。
+    """
+
+    def __init__(self, provider_limits=None, default_limit=4, move_timeout=None, max_threads=64,
+                 provider_timeouts=None, fallback=None):
+        self.provider_limits = dict(provider_limits or {})
+        self.default_limit = default_limit
+        self.move_timeout = move_timeout
+        self.provider_timeouts = dict(provider_timeouts or {})
+        self.fallback = fallback
+        # 同步 SDK 的流在这些线程里一段一段推进，几十盘同时下就需要几十个线程
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="llm-driver")
+        self.loop = None
+        self.thread = None
+        self.semaphores = {}
+
+    # ---------- 事件循环 ----------
+
+    def start(self):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, name="llm-event-loop", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, coro):
+        """把协程交给后台事件循环，返回 concurrent.futures.Future（可以 cancel()）"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """提交协程并阻塞等待结果，无界面批量对局用"""
+        return self.submit(coro).result()
+
+    def shutdown(self):
+        """取消所有还在进行的请求，停掉事件循环和线程池"""
+        if self.loop is not None:
+            async def cancel_all():
+                tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await llm_clients.close_async_clients()
+
+            try:
+                asyncio.run_coroutine_threadsafe(cancel_all(), self.loop).result(timeout=2)
+            except Exception as e:
+                print("取消 LLM 请求时出错:", e)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2)
+            self.loop = None
+            self.thread = None
+            self.semaphores = {}
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- 请求 ----------
+
+    def _semaphore(self, provider):
+        semaphore = self.semaphores.get(provider)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.provider_limits.get(provider, self.default_limit))
+            self.semaphores[provider] = semaphore
+        return semaphore
+
+    def timeout_for(self, provider):
+        return self.provider_timeouts.get(provider, self.move_timeout)
+
+    async def request_move(self, llm, game, ai_color, provider, timeout=None, on_text=None, book=None,
+                           early_stop=None, salvage=None, trace=None):
+        """按 provider 的并发上限排队，然后在 timeout 秒（默认按提供方配置）内要一步棋
+
+        返回 (坐标或 None, 收到的回复)。期限到了会取消流，有 fallback 就由它代下并把说明写进回复，
+        否则抛出 LLMMoveTimeout。排队时间不算在期限里。trace（MoveTrace）会在各阶段打点。
+        """
+        if timeout is None:
+            timeout = self.timeout_for(provider)
+        request = MoveRequest(llm, game, ai_color, on_text, book, early_stop, salvage, trace)
+        async with self._semaphore(provider):
+            try:
+                return await asyncio.wait_for(
+                    request_llm_move_async(llm, game, ai_color, executor=self.executor, request=request),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                pass
+        return await self._deadline_expired(game, ai_color, provider, timeout, request)
+
+    async def _deadline_expired(self, game, ai_color, provider, timeout, request):
+        """期限到了：有 fallback 就代下一步并写进回复，否则抛出 LLMMoveTimeout"""
+        if request.trace is not None:
+            request.trace.outcome = "timeout"
+        message = f"{provider} ({ai_color} 棋) 超过 {timeout:g} 秒还没给出坐标"
+        if self.fallback is not None:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, self.fallback, game, request.response_text, provider)
+            if result is not None:
+                (x, y), source = result
+                note = f"\n({message}，已取消请求，由{source}代下 ({x},{y}))\n"
+                request.emit(note)
+                return (x, y), request.response_text + note
+        raise LLMMoveTimeout(message)
+
+    # ---------- 对冲请求：同一步同时问几家，谁先给出合法坐标用谁 ----------
+
+    async def _race_one(self, provider, llm, request, first_token):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(provider):
+            prompt = await loop.run_in_executor(self.executor, request.build_prompt)
+            request.mark("request")
+            stream = llm.get_llm_response_astream(prompt, self.executor)
+            try:
+                async for chunk in stream:
+                    first_token.set()
+                    if request.feed(chunk):
+                        break
+            finally:
+                await stream.aclose()
+        return request.finish()
+
+    async def race_move(self, entries, game, ai_color, hedge_delay=1.0, timeout=None, on_text=None, book=None,
+                        early_stop=None, salvagers=None, stats=None, metrics=None):
+        """对冲请求：entries 是 [(提供方, llm), ...]，第一个是主请求
+
+        主请求 hedge_delay 秒内还没吐出第一个 token 时才发下一家，正在跑的都失败了也会立刻补发下一家；
+        谁先解析出合法坐标就用谁，其余马上取消。主请求的输出实时显示，对冲请求的输出先攒着，
+        胜出了才交给 on_text。stats（RaceStats）记录胜者和延迟，metrics（MetricsRecorder）给每家各记一条。
+        返回值同 request_move。
+        """
+        primary = entries[0][0]
+        if timeout is None:
+            timeout = self.timeout_for(primary)
+        salvagers = salvagers or {}
+        if book is not None:
+            hit = MoveRequest(entries[0][1], game, ai_color, on_text, book).book_move()
+            if hit is not None:
+                return hit
+        requests = []
+        buffers = {}
+        start = time.perf_counter()
+
+        def racer_on_text(provider, live):
+            if live:
+                return on_text
+            buffer = buffers.setdefault(provider, [])
+            return lambda text, text_type: buffer.append((text, text_type))
+
+        async def race():
+            loop = asyncio.get_running_loop()
+            pending = {}
+            next_index = 0
+            first_token = None
+            hedge_at = 0.0
+            errors = []
+
+            def launch():
+                nonlocal next_index, first_token, hedge_at
+                provider, llm = entries[next_index]
+                trace = None
+                if metrics is not None:
+                    trace = metrics.start(provider, ai_color, getattr(llm, "model_name", provider), len(game.moves) + 1)
+                request = MoveRequest(llm, game, ai_color, racer_on_text(provider, next_index == 0), None,
+                                      early_stop, salvagers.get(provider), trace)
+                requests.append(request)
+                first_token = asyncio.Event()
+                task = asyncio.create_task(self._race_one(provider, llm, request, first_token))
+                pending[task] = (provider, request)
+                next_index += 1
+                hedge_at = loop.time() + hedge_delay
+
+            launch()
+            try:
+                while pending:
+                    waiters = set(pending)
+                    token_waiter = None
+                    wait_timeout = None
+                    if next_index < len(entries) and not first_token.is_set():
+                        token_waiter = asyncio.create_task(first_token.wait())
+                        waiters.add(token_waiter)
+                        wait_timeout = max(0.0, hedge_at - loop.time())
+                    done, _ = await asyncio.wait(waiters, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if token_waiter is not None:
+                        token_waiter.cancel()
+                    for task in done:
+                        if task is token_waiter:
+                            continue
+                        provider, request = pending.pop(task)
+                        if task.exception() is not None:
+                            errors.append(task.exception())
+                            continue
+                        move, text = task.result()
+                        if move is not None and game.is_legal(*move):
+                            return provider, request, move, text
+                    hedge_due = not done and next_index < len(entries)
+                    if hedge_due or (not pending and next_index < len(entries)):
+                        launch()
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            if errors and len(errors) == len(requests):
+                raise errors[0]
+            return None, requests[0], None, requests[0].response_text
+
+        try:
+            winner, request, move, text = await asyncio.wait_for(race(), timeout)
+        except asyncio.TimeoutError:
+            if stats is not None:
+                stats.record(None, primary, time.perf_counter() - start, len(requests))
+            try:
+                return await self._deadline_expired(game, ai_color, primary, timeout, requests[0])
+            finally:
+                self._record_racers(metrics, requests)
+        self._record_racers(metrics, requests)
+        latency = time.perf_counter() - start
+        if stats is not None:
+            stats.record(winner, primary, latency, len(requests))
+        if winner is not None and on_text:
+            losers = [provider for provider, _ in entries[:len(requests)] if provider != winner]
+            if winner != primary:
+                on_text(f"\n(对冲请求：{winner} 抢先给出了合法坐标，用时 {latency:.1f} 秒，以下是它的输出)\n", "output")
+                for buffered_text, text_type in buffers.get(winner, []):
+                    on_text(buffered_text, text_type)
+            if losers:
+                on_text(f"\n({winner} 胜出，已取消 {'、'.join(losers)} 的请求)\n", "output")
+        return move, text
+
+    @staticmethod
+    def _record_racers(metrics, requests):
+        if metrics is None:
+            return
+        for request in requests:
+            if request.trace.outcome is None:
+                request.trace.outcome = "cancelled"
+            metrics.record(request.trace)
+
+
+class AsyncLLMPlayer:
+    """play_game_async 用的 LLM 玩家：坐标无效、超时都算犯错，连续犯错 max_retries 次返回 None（投降）"""
+
+    def __init__(self, driver, llm, provider, max_retries=MAX_LLM_RETRIES, timeout=None, on_text=None, book=None,
+                 early_stop=None, salvage=None, metrics=None):
+        self.driver = driver
+        self.llm = llm
+        self.provider = provider
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.on_text = on_text
+        self.book = book
+        self.early_stop = early_stop
+        self.salvage = salvage
+        self.metrics = metrics  # move_metrics.MetricsRecorder，每次尝试记一条
+
+    async def __call__(self, game):
+        for attempt in range(self.max_retries):
+            trace = None
+            if self.metrics is not None:
+                trace = self.metrics.start(self.provider, game.current_color,
+                                           getattr(self.llm, "model_name", self.provider), len(game.moves) + 1, attempt)
+            try:
+                move, _ = await self.driver.request_move(self.llm, game, game.current_color, self.provider,
+                                                         self.timeout, self.on_text, self.book, self.early_stop,
+                                                         self.salvage, trace)
+            except LLMMoveTimeout:
+                continue
+            finally:
+                if self.metrics is not None:
+                    if trace.outcome is None:
+                        trace.outcome = "error"
+                    self.metrics.record(trace)
+            if move and game.is_legal(*move):
+                return move
+        return None
+
+
+async def play_game_async(black_player, white_player, game=None, on_move=None, executor=None):
+    """play_game 的异步版：玩家可以是协程函数（AsyncLLMPlayer），也可以是普通函数（引擎、随机），
+    普通函数放到线程池里跑，不会卡住同一事件循环上的其他对局。"""
+    if game is None:
+        game = GomokuGame()
+    loop = asyncio.get_running_loop()
+    players = {BLACK: black_player, WHITE: white_player}
+    while not game.game_over:
+        player = players[game.player]
+        if inspect.iscoroutinefunction(player) or inspect.iscoroutinefunction(getattr(player, "__call__", None)):
+            move = await player(game)
+        else:
+            move = await loop.run_in_executor(executor, player, game)
+        if move is None:
+            game.resign()
+            break
+        x, y = move
+        game.play(x, y)
+        if on_move:
+            on_move(game, x, y)
+    return game
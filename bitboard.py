@@ -0,0 +1,240 @@
+# bitboard.py
+# 位棋盘：每种颜色用一个整数位掩码保存，同时维护每条线（行、列、两条斜线）的位掩码，
+# 这样落子/悔棋和五连判断都只需要几次位运算，不用再一格一格地扫 self.board 了！(ง •̀_•́)ง
+import random
+
+EMPTY = 0
+BLACK = 1
+WHITE = 2
+
+# 四个方向：横、竖、主对角线（左上到右下）、副对角线（右上到左下）
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+CANDIDATE_RADIUS = 2  # 候选点：已有棋子周围两格内的空位
+
+
+def _has_five(mask):
+    """线掩码里是否有连续五个 1（移位 + 按位与）"""
+    m = mask & (mask >> 1)   # 连续两个
+    m &= m >> 2              # 连续四个
+    return (m & (mask >> 4)) != 0  # 连续五个
+
+
+_ZOBRIST_TABLES = {}
+
+
+def zobrist_table(size):
+    """Zobrist 随机数表 table[color][idx]，固定种子，不同进程算出的哈希也一致"""
+    table = _ZOBRIST_TABLES.get(size)
+    if table is None:
+        rng = random.Random(0x60B0 + size)
+        n = size * (size + 1)
+        table = [[0] * n] + [[rng.getrandbits(64) for _ in range(n)] for _ in range(2)]
+        _ZOBRIST_TABLES[size] = table
+    return table
+
+
+_NEIGHBOURS = {}
+
+
+def neighbour_masks(size, radius=CANDIDATE_RADIUS):
+    """预计算每一格周围 radius 格内（含自身）的位掩码"""
+    key = (size, radius)
+    neighbours = _NEIGHBOURS.get(key)
+    if neighbours is not None:
+        return neighbours
+    stride = size + 1
+    neighbours = [0] * (size * stride)
+    for x in range(size):
+        for y in range(size):
+            mask = 0
+            for nx in range(max(0, x - radius), min(size, x + radius + 1)):
+                for ny in range(max(0, y - radius), min(size, y + radius + 1)):
+                    mask |= 1 << (nx * stride + ny)
+            neighbours[x * stride + y] = mask
+    _NEIGHBOURS[key] = neighbours
+    return neighbours
+
+
+_NEIGHBOUR_INDICES = {}
+
+
+def neighbour_indices(size, radius=CANDIDATE_RADIUS):
+    """每一格周围 radius 格内（含自身）的格子下标列表，落子/悔棋时维护引用计数用"""
+    key = (size, radius)
+    indices = _NEIGHBOUR_INDICES.get(key)
+    if indices is None:
+        indices = [list(_iter_bits(mask)) for mask in neighbour_masks(size, radius)]
+        _NEIGHBOUR_INDICES[key] = indices
+    return indices
+
+
+def _iter_bits(mask):
+    """按从低到高的顺序遍历掩码里每个为 1 的位的下标"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitBoard:
+    """位棋盘：bits[color] 是整盘的位掩码，每行多留一位哨兵，移位时不会跨行串位"""
+
+    def __init__(self, size=15):
+        self.size = size
+        self.stride = size + 1  # 第 size 列永远是 0，作为哨兵
+        self.bits = [0, 0, 0]   # 下标 1 黑棋，2 白棋（0 不用）
+        # 每条线的位掩码，行/列按下标存位，两条斜线统一用行号 x 作为线上的位置
+        n_diag = 2 * size - 1
+        self.rows = [[0] * size for _ in range(3)]
+        self.cols = [[0] * size for _ in range(3)]
+        self.diags = [[0] * n_diag for _ in range(3)]  # 下标 x - y + size - 1
+        self.antis = [[0] * n_diag for _ in range(3)]  # 下标 x + y
+        self.history = []  # [(x, y, color), ...]
+        self.zobrist = zobrist_table(size)
+        self.hash = 0  # 随落子/悔棋增量更新的 Zobrist 哈希
+        # 候选集：near_counts[idx] 是 idx 周围两格内的棋子数，大于 0 的格子记在 near_mask 里
+        self.neighbours = neighbour_indices(size)
+        self.near_counts = [0] * (size * self.stride)
+        self.near_mask = 0
+
+        self.valid_mask = 0
+        for x in range(size):
+            self.valid_mask |= ((1 << size) - 1) << (x * self.stride)
+
+    def index(self, x, y):
+        return x * self.stride + y
+
+    def coords(self, idx):
+        return divmod(idx, self.stride)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.size and 0 <= y < self.size
+
+    @property
+    def occupied(self):
+        return self.bits[BLACK] | self.bits[WHITE]
+
+    def get(self, x, y):
+        bit = 1 << self.index(x, y)
+        if self.bits[BLACK] & bit:
+            return BLACK
+        if self.bits[WHITE] & bit:
+            return WHITE
+        return EMPTY
+
+    def is_empty(self, x, y):
+        return not (self.occupied >> self.index(x, y)) & 1
+
+    def is_full(self):
+        return self.occupied == self.valid_mask
+
+    def move_count(self):
+        return len(self.history)
+
+    def last_move(self):
+        return self.history[-1] if self.history else None
+
+    def _toggle(self, x, y, color):
+        """翻转 (x, y) 在 color 的全盘掩码和四条线掩码中的位（落子和悔棋共用）"""
+        size = self.size
+        idx = self.index(x, y)
+        self.bits[color] ^= 1 << idx
+        self.hash ^= self.zobrist[color][idx]
+        self.rows[color][x] ^= 1 << y
+        self.cols[color][y] ^= 1 << x
+        self.diags[color][x - y + size - 1] ^= 1 << x
+        self.antis[color][x + y] ^= 1 << x
+
+    def make(self, x, y, color):
+        """落子，位置非法或已被占用时抛出 ValueError"""
+        if not self.in_bounds(x, y) or not self.is_empty(x, y):
+            raise ValueError(f"非法落子: ({x}, {y})")
+        self._toggle(x, y, color)
+        self.history.append((x, y, color))
+        counts = self.near_counts
+        for idx in self.neighbours[self.index(x, y)]:
+            if counts[idx] == 0:
+                self.near_mask |= 1 << idx
+            counts[idx] += 1
+
+    def unmake(self):
+        """撤销最后一步，返回被撤销的 (x, y, color)"""
+        x, y, color = self.history.pop()
+        self._toggle(x, y, color)
+        counts = self.near_counts
+        for idx in self.neighbours[self.index(x, y)]:
+            counts[idx] -= 1
+            if counts[idx] == 0:
+                self.near_mask ^= 1 << idx
+        return x, y, color
+
+    def line_masks(self, x, y, color):
+        """经过 (x, y) 的四条线在 color 下的掩码，顺序与 DIRECTIONS 一致"""
+        size = self.size
+        return (
+            self.rows[color][x],
+            self.cols[color][y],
+            self.diags[color][x - y + size - 1],
+            self.antis[color][x + y],
+        )
+
+    def check_win(self, x, y, color):
+        """只检查经过 (x, y) 的四条线，O(1) 判断 color 是否连成包含 (x, y) 的五子"""
+        # 每条线只保留以 (x, y) 为中心的 9 格窗口，窗口里的五连必然经过 (x, y)
+        for mask, pos in zip(self.line_masks(x, y, color), (y, x, x, x)):
+            low = pos - 4 if pos > 4 else 0
+            window = (mask >> low) & ((1 << (pos + 5 - low)) - 1)
+            if _has_five(window):
+                return True
+        return False
+
+    def has_five(self, color):
+        """整盘判断 color 是否有五连：对四个方向的移位量做移位 + 按位与"""
+        bits = self.bits[color]
+        for shift in (1, self.stride, self.stride + 1, self.stride - 1):
+            m = bits & (bits >> shift)
+            m &= m >> (2 * shift)
+            if m & (bits >> (4 * shift)):
+                return True
+        return False
+
+    def candidate_mask(self, radius=CANDIDATE_RADIUS):
+        """已有棋子周围 radius 格内的空位掩码，默认半径直接读增量维护的候选集"""
+        if radius == CANDIDATE_RADIUS:
+            return self.near_mask & ~self.occupied
+        neighbours = neighbour_masks(self.size, radius)
+        occupied = self.occupied
+        mask = 0
+        for idx in _iter_bits(occupied):
+            mask |= neighbours[idx]
+        return mask & ~occupied
+
+    def candidates(self, radius=CANDIDATE_RADIUS):
+        """已有棋子周围 radius 格内的空位坐标"""
+        return [self.coords(idx) for idx in _iter_bits(self.candidate_mask(radius))]
+
+    def stones(self, color):
+        """color 所有棋子的坐标，按行优先排序"""
+        return [self.coords(idx) for idx in _iter_bits(self.bits[color])]
+
+    def empty_cells(self):
+        """所有空位的坐标，按行优先排序"""
+        return [self.coords(idx) for idx in _iter_bits(self.valid_mask & ~self.occupied)]
+
+    def to_list(self):
+        """转换成旧的二维列表格式 board[x][y]"""
+        board = [[EMPTY] * self.size for _ in range(self.size)]
+        for color in (BLACK, WHITE):
+            for x, y in self.stones(color):
+                board[x][y] = color
+        return board
+
+    def copy(self):
+        other = BitBoard(self.size)
+        for x, y, color in self.history:
+            other.make(x, y, color)
+        return other
+
+    def clear(self):
+        self.__init__(self.size)
@@ -0,0 +1,167 @@
+# board_encoding.py
+# 发给 LLM 的局面编码：原来的汉字棋盘每格两个全角字加空格，后面还要把黑白棋子列表再发一遍，token 又多又慢！(╯▔皿▔)╯
+# 这里把编码做成可插拔的，每个模型可以在 config.ini 的 [prompt] 里单独选：
+#   grid     原来的汉字棋盘（默认）
+#   compact  每格一个字符的紧凑棋盘
+#   rle      只列有棋子的行，每行做游程编码
+#   sparse   只发双方棋子坐标，不画棋盘
+# python board_encoding.py 会离线对一盘示例对局逐步统计各编码的 token 数。(ง •̀_•́)ง
+import re
+import sys
+from collections import namedtuple
+
+from bitboard import BLACK, WHITE
+
+# legend 为 None 时沿用各模型 Prompt 里原来的说明；lists_stones 为 True 表示编码本身已经完整给出双方棋子，不用再附棋子列表
+BoardEncoding = namedtuple("BoardEncoding", "name legend encode lists_stones")
+
+COMPACT_CHARS = {0: ".", BLACK: "X", WHITE: "O"}
+
+
+def encode_grid(game):
+    return game.get_board_state()
+
+
+def encode_compact(game):
+    lines = ["   " + "".join(str(col % 10) for col in range(game.size))]
+    for row in range(game.size):
+        cells = "".join(COMPACT_CHARS[game.position.get(row, col)] for col in range(game.size))
+        lines.append(f"{row:>2} {cells}")
+    return "\n".join(lines) + "\n"
+
+
+def run_length(cells):
+    """'.......X.......' -> '7.X7.'，长度为 1 的段不写数字"""
+    return "".join((str(len(run)) if len(run) > 1 else "") + run[0]
+                   for run in re.findall(r"(\.+|X+|O+)", cells))
+
+
+def encode_rle(game):
+    lines = []
+    for row in range(game.size):
+        cells = "".join(COMPACT_CHARS[game.position.get(row, col)] for col in range(game.size))
+        if cells.strip("."):
+            lines.append(f"{row}: {run_length(cells)}")
+    if not lines:
+        return "(棋盘还是空的)\n"
+    return "\n".join(lines) + "\n"
+
+
+def encode_sparse(game):
+    def cells(color):
+        stones = game.position.stones(color)
+        return " ".join(f"({x},{y})" for x, y in stones) if stones else "无"
+
+    return f"黑：{cells(BLACK)}\n白：{cells(WHITE)}\n"
+
+
+ENCODINGS = {
+    "grid": BoardEncoding("grid", None, encode_grid, False),
+    "compact": BoardEncoding(
+        "compact",
+        "【说明】棋盘每格一个字符：'.'表示空位，'X'表示黑棋，'O'表示白棋；每行开头是行号，顶部一行是列号的个位（10~14 写作 0~4）。\n",
+        encode_compact, True),
+    "rle": BoardEncoding(
+        "rle",
+        "【说明】棋盘按行做了游程编码，只列出有棋子的行，没列出的行全是空位。"
+        "'.'表示空位，'X'表示黑棋，'O'表示白棋，数字是连续相同格子的个数（没写就是 1 个），"
+        "例如 '7: 6.XO7.' 表示第 7 行第 6 列是黑棋、第 7 列是白棋。\n",
+        encode_rle, True),
+    "sparse": BoardEncoding(
+        "sparse",
+        "【说明】棋盘省略，只给出双方棋子坐标 (行,列)，没列出的位置都是空位。\n",
+        encode_sparse, True),
+}
+DEFAULT_ENCODING = "grid"
+
+
+def get_encoding(name):
+    """按名字取编码，名字不认识时退回默认的汉字棋盘"""
+    return ENCODINGS.get(name or DEFAULT_ENCODING, ENCODINGS[DEFAULT_ENCODING])
+
+
+def encoding_legend(name):
+    """编码的说明文字；原来的汉字棋盘返回 None，由各模型沿用自己的说明"""
+    return get_encoding(name).legend
+
+
+def needs_stone_lists(game, name):
+    """Prompt 里还要不要再附上黑白棋子列表（附近空位模式下局面本身不含棋子，总是要附）"""
+    return game.prompt_relevant_cells or not get_encoding(name).lists_stones
+
+
+# ---------- 离线统计 Prompt 大小 ----------
+
+_tokenizer = None
+
+
+def count_tokens(text):
+    """有 tiktoken 就用 o200k_base 精确计数，没有（或词表下载不了）时按字符类别估算"""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+
+            _tokenizer = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text))
+    return estimate_tokens(text)
+
+
+# 估算规则：每个汉字或全角符号算 1 个，数字每 3 位 1 个，字母每 4 个 1 个，连续的点每 8 个 1 个，其他符号每个 1 个，空白不单独计
+_TOKEN_PATTERN = re.compile(r"[　-〿一-鿿＀-￯]|\d{1,3}|[A-Za-z]{1,4}|\.{1,8}|[^\s\w]")
+
+
+def estimate_tokens(text):
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def tokenizer_name():
+    count_tokens("")
+    return "tiktoken o200k_base" if _tokenizer else "按字符估算（没装 tiktoken）"
+
+
+def board_section(game, name):
+    """Prompt 里和局面有关的部分：说明、局面本身，需要时再加上棋子列表"""
+    legend = encoding_legend(name) or ""
+    text = legend + "当前棋盘状态：\n" + game.get_prompt_board_state(name) + "\n"
+    if needs_stone_lists(game, name):
+        text += "\n【黑棋位置】： " + str(game.position.stones(BLACK)) + "\n"
+        text += "\n【白棋位置】： " + str(game.position.stones(WHITE)) + "\n"
+    return text
+
+
+def size_report(games=1, time_limit=0.05, out=sys.stdout):
+    """用本地引擎自我对弈，逐步打印每种编码的局面部分有多少 token，最后给出平均值和相对 grid 的比例"""
+    from engine import EnginePlayer
+    from game_core import GomokuGame, play_game
+
+    names = list(ENCODINGS)
+    totals = dict.fromkeys(names, 0)
+    moves = 0
+    print(f"分词器：{tokenizer_name()}", file=out)
+    print("局-步  " + "".join(f"{name:>9}" for name in names), file=out)
+
+    for game_index in range(games):
+        def on_move(game, x, y):
+            nonlocal moves
+            moves += 1
+            counts = {name: count_tokens(board_section(game, name)) for name in names}
+            for name in names:
+                totals[name] += counts[name]
+            label = f"{game_index + 1}-{len(game.moves)}"
+            print(f"{label:<7}" + "".join(f"{counts[name]:>9}" for name in names), file=out)
+
+        player = EnginePlayer(time_limit=time_limit)
+        play_game(player, player, GomokuGame(), on_move)
+
+    if moves:
+        print("平均   " + "".join(f"{totals[name] / moves:>9.0f}" for name in names), file=out)
+        print("相对grid" + "".join(f"{totals[name] / totals['grid']:>9.0%}" for name in names), file=out)
+    return totals, moves
+
+
+if __name__ == "__main__":
+    size_report(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
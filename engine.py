@@ -0,0 +1,263 @@
+# engine.py
+# 本地搜索引擎：负极大值 Alpha-Beta + 迭代加深 + 威胁启发式走法排序 + Zobrist 置换表
+# PVE 模式和无界面对局都可以直接用它，终于不是随机乱下了！(ง •̀_•́)ง
+import time
+from collections import namedtuple
+
+from patterns import CLASS_SCORES, PatternEvaluator, cell_threats
+from threat_solver import ThreatSolver
+
+WIN_SCORE = 10_000_000
+# 走法排序：进攻分和防守分（堵对方）的权重，同样的棋型优先自己成型
+ATTACK_WEIGHT = 4
+DEFEND_WEIGHT = 3
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+SearchResult = namedtuple("SearchResult", "move score depth nodes elapsed nps")
+TTEntry = namedtuple("TTEntry", "key depth score flag move generation")
+
+
+class SearchTimeout(Exception):
+    """本步的思考时间用完了"""
+
+
+def _iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class TranspositionTable:
+    """定长置换表：按哈希取模找槽位，深度优先 + 代数老化的替换策略"""
+
+    def __init__(self, size=1 << 18):
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """每次搜索开始时调用，旧搜索留下的条目可以被直接覆盖"""
+        self.generation += 1
+
+    def get(self, key):
+        entry = self.slots[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def put(self, key, depth, score, flag, move):
+        index = key % self.size
+        old = self.slots[index]
+        # 空槽、同一局面、旧搜索留下的、或者深度不超过新条目的，才允许替换
+        if old is None or old.key == key or old.generation != self.generation or old.depth <= depth:
+            self.slots[index] = TTEntry(key, depth, score, flag, move, self.generation)
+            self.stores += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+
+class SearchEngine:
+    """迭代加深的负极大值 Alpha-Beta 搜索"""
+
+    def __init__(self, time_limit=1.0, max_depth=8, max_width=12, tt_size=1 << 18, use_threat_solver=True):
+        self.time_limit = time_limit  # 每步思考的时间预算（秒）
+        self.max_depth = max_depth
+        self.max_width = max_width    # 每层最多展开的候选数
+        self.tt = TranspositionTable(tt_size)
+        # 先用威胁空间搜索找杀棋，最多占用 1/5 的思考时间
+        self.solver = ThreatSolver() if use_threat_solver else None
+        self.nodes = 0
+        self.deadline = 0.0
+        self.root_move = None
+        self.root_moves = None     # 只搜索这些根节点走法（多进程分根时用）
+        self.depth_results = []    # 每个完成的深度：(深度, 最佳走法下标, 分数)
+        self.evaluator = None
+        self.last_result = None
+
+    # ---------- 评估和走法生成 ----------
+
+    def evaluate(self, board, color):
+        """站在 color 一方的静态评估：直接读增量维护的棋型分"""
+        return self.evaluator.score(color)
+
+    def move_score(self, board, idx, color):
+        """威胁启发式：查表看这一格自己能成什么棋型、对方在这里又能成什么棋型"""
+        x, y = divmod(idx, board.stride)
+        attack = sum(CLASS_SCORES[c] for c in cell_threats(board, x, y, color))
+        defend = sum(CLASS_SCORES[c] for c in cell_threats(board, x, y, 3 - color))
+        return ATTACK_WEIGHT * attack + DEFEND_WEIGHT * defend
+
+    def ordered_moves(self, board, color, tt_move=None):
+        scored = []
+        for idx in _iter_bits(board.candidate_mask()):
+            scored.append((self.move_score(board, idx, color), idx))
+        scored.sort(reverse=True)
+        moves = [idx for _, idx in scored[:self.max_width]]
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    # ---------- 搜索 ----------
+
+    def negamax(self, board, depth, alpha, beta, color, ply):
+        self.nodes += 1
+        if self.nodes & 127 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        alpha_orig = alpha
+        entry = self.tt.get(board.hash)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if entry.depth >= depth and ply > 0:
+                if entry.flag == EXACT:
+                    return entry.score
+                if entry.flag == LOWER:
+                    alpha = max(alpha, entry.score)
+                elif entry.flag == UPPER:
+                    beta = min(beta, entry.score)
+                if alpha >= beta:
+                    return entry.score
+
+        if depth == 0:
+            return self.evaluate(board, color)
+
+        if ply == 0 and self.root_moves:
+            moves = list(self.root_moves)
+            if tt_move in moves:
+                moves.remove(tt_move)
+                moves.insert(0, tt_move)
+        else:
+            moves = self.ordered_moves(board, color, tt_move)
+        if not moves:
+            return 0
+
+        best_score = -WIN_SCORE * 2
+        best_move = moves[0]
+        stride = board.stride
+        for idx in moves:
+            x, y = divmod(idx, stride)
+            board.make(x, y, color)
+            self.evaluator.update(x, y)
+            try:
+                if board.check_win(x, y, color):
+                    score = WIN_SCORE - ply
+                else:
+                    score = -self.negamax(board, depth - 1, -beta, -alpha, 3 - color, ply + 1)
+            finally:
+                board.unmake()
+                self.evaluator.update(x, y)
+            if score > best_score:
+                best_score = score
+                best_move = idx
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.put(board.hash, depth, best_score, flag, best_move)
+        if ply == 0:
+            self.root_move = best_move
+        return best_score
+
+    def search(self, position, color, time_limit=None, root_moves=None):
+        """对 position（BitBoard）上 color 方的局面做迭代加深搜索，返回 SearchResult
+
+        root_moves 给出时只在这些根节点走法里挑（坐标列表），多进程分根搜索用。
+        """
+        if time_limit is None:
+            time_limit = self.time_limit
+        board = position.copy()
+        self.evaluator = PatternEvaluator(board)
+        start = time.perf_counter()
+        self.deadline = start + time_limit
+        self.nodes = 0
+        self.root_move = None
+        self.root_moves = [board.index(x, y) for x, y in root_moves] if root_moves else None
+        self.depth_results = []
+        self.tt.new_search()
+
+        if board.move_count() == 0:
+            center = board.size // 2
+            result = SearchResult((center, center), 0, 0, 0, 0.0, 0.0)
+            self.last_result = result
+            return result
+
+        if self.solver is not None:
+            line = self.solver.find_vcf(board, color, time_limit * 0.1)
+            if line is None:
+                line = self.solver.find_vct(board, color, time_limit * 0.1)
+            if line:
+                elapsed = time.perf_counter() - start
+                result = SearchResult(line[0], WIN_SCORE, len(line), self.solver.nodes, elapsed,
+                                      self.solver.nodes / elapsed if elapsed > 0 else 0.0)
+                self.last_result = result
+                return result
+
+        best_move = None
+        best_score = 0
+        completed_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score = self.negamax(board, depth, -WIN_SCORE * 2, WIN_SCORE * 2, color, 0)
+            except SearchTimeout:
+                # 这一层没搜完（negamax 的 finally 已经把棋盘还原），保留上一层的结果
+                break
+            best_move = self.root_move
+            best_score = score
+            completed_depth = depth
+            self.depth_results.append((depth, best_move, score))
+            if abs(score) >= WIN_SCORE - 100:
+                break  # 已经找到必胜/必败，不用再加深了
+
+        if best_move is None:
+            moves = self.ordered_moves(board, color)
+            best_move = moves[0] if moves else None
+        elapsed = time.perf_counter() - start
+        nps = self.nodes / elapsed if elapsed > 0 else 0.0
+        move = board.coords(best_move) if best_move is not None else None
+        result = SearchResult(move, best_score, completed_depth, self.nodes, elapsed, nps)
+        self.last_result = result
+        return result
+
+    def best_move(self, game, time_limit=None):
+        """给 GomokuGame 当前行棋方找一步棋"""
+        return self.search(game.position, game.player, time_limit).move
+
+
+class EnginePlayer:
+    """把 SearchEngine 包装成 play_game 能用的玩家；给了 book（OpeningBook）就先查开局库，搜完再收录"""
+
+    def __init__(self, engine=None, time_limit=None, verbose=False, book=None):
+        self.engine = engine if engine is not None else SearchEngine()
+        self.time_limit = time_limit
+        self.verbose = verbose
+        self.book = book
+
+    def __call__(self, game):
+        if self.book is not None:
+            entry = self.book.lookup(game.position, game.player)
+            if entry is not None:
+                if self.verbose:
+                    print(f"开局库落子 {entry.move}：深度 {entry.depth}，评分 {entry.score}")
+                return entry.move
+        result = self.engine.search(game.position, game.player, self.time_limit)
+        if self.book is not None:
+            self.book.store(game.position, game.player, result.move, result.score, result.depth)
+        if self.verbose:
+            print(f"引擎落子 {result.move}：深度 {result.depth}，{result.nodes} 个节点，"
+                  f"{result.nps:.0f} 节点/秒，评分 {result.score}")
+        return result.move
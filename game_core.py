@@ -0,0 +1,305 @@
+# game_core.py
+# 无界面的五子棋核心：棋盘、规则、轮换和走子记录都在这里，不依赖 Tkinter，
+# 可以在没有显示器的服务器或者子进程里直接 import，成千上万盘 AIvsAI 也能一口气跑完！(ง •̀_•́)ง
+import random
+import time
+
+from bitboard import BitBoard, BLACK, WHITE, EMPTY
+from board_encoding import get_encoding
+from move_metrics import count_trace_tokens
+from stream_parser import StreamMoveParser
+
+COLOR_NAMES = {BLACK: "Black", WHITE: "White"}
+MAX_LLM_RETRIES = 3  # LLM 连续犯错多少次就判投降
+
+
+def color_name(player):
+    return COLOR_NAMES[player]
+
+
+class GomokuGame:
+    """一盘棋的全部状态：位棋盘、当前行棋方、是否结束、赢家"""
+
+    def __init__(self, size=15):
+        self.size = size
+        self.prompt_hints = False  # 是否在 Prompt 里附上本地威胁分析的【局面提示】
+        self.prompt_relevant_cells = False  # 是否用“附近空位”列表代替整张棋盘发给 LLM
+        self.reset()
+
+    def reset(self):
+        self.position = BitBoard(self.size)
+        self.player = BLACK
+        self.game_over = False
+        self.winner = None  # BLACK / WHITE，平局为 EMPTY，未结束为 None
+
+    @property
+    def moves(self):
+        """走子记录 [(x, y, color), ...]"""
+        return self.position.history
+
+    @property
+    def current_color(self):
+        return color_name(self.player)
+
+    def is_legal(self, x, y):
+        return not self.game_over and self.position.in_bounds(x, y) and self.position.is_empty(x, y)
+
+    def play(self, x, y):
+        """当前行棋方在 (x, y) 落子，返回这一步是否结束了对局；非法落子抛出 ValueError"""
+        if self.game_over:
+            raise ValueError("对局已经结束了！")
+        self.position.make(x, y, self.player)
+        if self.position.check_win(x, y, self.player):
+            # 赢了就不再轮换，self.player 保持为赢家
+            self.game_over = True
+            self.winner = self.player
+            return True
+        if self.position.is_full():
+            self.game_over = True
+            self.winner = EMPTY
+            return True
+        self.player = 3 - self.player
+        return False
+
+    def undo(self):
+        """悔一步棋，返回被撤销的 (x, y, color)"""
+        x, y, color = self.position.unmake()
+        self.player = color
+        self.game_over = False
+        self.winner = None
+        return x, y, color
+
+    def resign(self):
+        """当前行棋方投降"""
+        self.game_over = True
+        self.winner = 3 - self.player
+
+    def get_board_state(self):
+        board_str = "   " + " ".join([str(i) if i < 10 else str(i)[0] for i in range(self.size)]) + "\n"
+        board_str += "   " + " ".join([str(i)[1] if i >= 10 else " " for i in range(self.size)]) + "\n"
+        board_str = board_str.replace(" ", "  ")
+
+        piece_map = {0: "空", 1: "黑", 2: "白"}
+        for row_index in range(self.size):
+            row_str = str(row_index) if row_index < 10 else str(row_index)[0]
+            row_str += str(row_index)[1] if row_index >= 10 else " "
+            row_str = row_str + "  "
+            for col_index in range(self.size):
+                row_str += piece_map[self.position.get(row_index, col_index)] + " "
+            board_str += row_str + "\n"
+        return board_str
+
+    def relevant_cells(self):
+        """已有棋子周围两格内的空位（BitBoard 增量维护的候选集）"""
+        return self.position.candidates()
+
+    def get_relevant_cells_state(self):
+        """只列出附近空位的简短局面描述，双方棋子位置由 Prompt 里的棋子列表给出"""
+        cells = self.relevant_cells()
+        if not cells:
+            center = self.size // 2
+            return f"(棋盘还是空的，建议下在天元 ({center},{center}))\n"
+        state = "(整张棋盘省略，双方棋子位置见下方列表)\n"
+        state += "【附近空位】(已有棋子周围两格内的空位，请只在这些位置中选择)：\n"
+        state += " ".join(f"({x},{y})" for x, y in cells) + "\n"
+        return state
+
+    def get_prompt_board_state(self, encoding=None):
+        """发给 LLM 的局面：按 encoding（见 board_encoding.py）编码整张棋盘，开启 prompt_relevant_cells 后换成附近空位列表"""
+        if self.prompt_relevant_cells:
+            return self.get_relevant_cells_state()
+        return get_encoding(encoding).encode(self)
+
+
+class MoveRequest:
+    """向 LLM 要一步棋的全过程（查开局库、生成 Prompt、逐段收流、解析坐标），同步和异步驱动共用
+
+    on_text(text, text_type) 用来把 Prompt 和流式输出转给界面或日志，text_type 是 "prompt" / "output"。
+    给了 book（OpeningBook）就先查开局库，命中时直接用库里的走法，不再请求 LLM。
+    给了 early_stop（EarlyStopper）就边收边解析，最终回答里的坐标定下来（后面一段没再改口）后提前关流。
+    给了 salvage（MoveSalvager）时，最终坐标无效或缺失就从思考过程里挑一个合法候选，不用重试。
+    给了 trace（move_metrics.MoveTrace）就在各阶段打点，并记下片段数、token 数和结果。
+    """
+
+    def __init__(self, llm, game, ai_color, on_text=None, book=None, early_stop=None, salvage=None, trace=None):
+        self.llm = llm
+        self.game = game
+        self.ai_color = ai_color
+        self.on_text = on_text
+        self.book = book
+        self.early_stop = early_stop
+        self.salvage = salvage
+        self.trace = trace
+        self.model = getattr(llm, "model_name", llm.__class__.__name__)
+        self.marker = getattr(llm, "final_answer_marker", None)
+        self.answer_at = None if self.marker else 0  # 最终回答在 response_text 里的起点，没有分界标记的模型全算回答
+        self.parser = StreamMoveParser(llm, game.is_legal, early_stop.settle_chars) if early_stop is not None else None
+        self.prompt = None
+        self.response_text = ""
+        self.detected_at = None
+        self.tail_chunks = 0
+
+    def emit(self, text, text_type="output"):
+        if self.on_text:
+            self.on_text(text, text_type)
+
+    def book_move(self):
+        """开局库命中时返回 (坐标, 说明文字)，否则返回 None"""
+        if self.book is None:
+            return None
+        entry = self.book.lookup(self.game.position, self.game.player)
+        if entry is None:
+            return None
+        text = f"开局库命中，直接下 ({entry.move[0]},{entry.move[1]})，省下一次 LLM 请求！(๑•̀ㅂ•́)و✧\n"
+        self.emit(text)
+        if self.trace is not None:
+            self.trace.outcome = "book"
+        return entry.move, text
+
+    def build_prompt(self):
+        board_state = self.game.get_prompt_board_state(getattr(self.llm, "board_encoding", None))
+        prompt = self.llm.create_prompt(board_state, self.ai_color)
+        self.prompt = prompt
+        self.mark("prompt")
+        self.emit(prompt, "prompt")
+        return prompt
+
+    def mark(self, phase):
+        if self.trace is not None:
+            self.trace.mark(phase)
+
+    def track(self, chunk):
+        """给 trace 区分思考片段和回答片段，记下各自第一次出现的时间"""
+        if self.answer_at is None:
+            tail = self.response_text[-(len(chunk) + len(self.marker)):]
+            index = tail.find(self.marker)
+            if index < 0:
+                self.trace.chunks["reasoning"] += 1
+                self.trace.mark("first_reasoning")
+                return
+            self.answer_at = len(self.response_text) - len(tail) + index + len(self.marker)
+            self.trace.mark("first_answer")
+            return
+        self.trace.chunks["answer"] += 1
+        self.trace.mark("first_answer")
+
+    def feed(self, chunk):
+        """收到一段流式输出，返回 True 表示坐标已定、应该马上关流"""
+        if not chunk:
+            return False
+        self.emit(chunk)
+        self.response_text += chunk
+        if self.trace is not None:
+            self.track(chunk)
+        if self.parser is None:
+            return False
+        if self.detected_at is not None:
+            self.tail_chunks += 1
+        elif self.parser.feed(chunk):
+            if self.early_stop.should_stop(self.model):
+                tokens, seconds = self.early_stop.record_stop(self.model)
+                self.emit(f"\n(坐标已定，提前结束输出，约省下 {tokens:.0f} 个 token、{seconds:.1f} 秒)\n")
+                return True
+            self.detected_at = time.perf_counter()
+        return False
+
+    def finish(self):
+        """流结束（或提前关闭）后解析坐标，返回 (坐标或 None, 收到的回复)"""
+        self.mark("stream_end")
+        if self.detected_at is not None:
+            self.early_stop.record_tail(self.model, self.tail_chunks, time.perf_counter() - self.detected_at)
+            self.detected_at = None
+        move = self.llm.parse_response(self.response_text)
+        outcome = "none" if move is None else ("legal" if self.game.is_legal(*move) else "illegal")
+        if self.salvage is not None and (move is None or not self.game.is_legal(*move)):
+            salvaged = self.salvage.salvage(self.game, self.response_text)
+            if salvaged is not None:
+                reason = "没给出最终坐标" if move is None else f"最终坐标 {move} 无效"
+                self.emit(f"\n({reason}，从思考过程里捡回了 ({salvaged[0]},{salvaged[1]})，省下一次重试)\n")
+                move = salvaged
+                outcome = "salvaged"
+        if self.trace is not None:
+            self.trace.mark("parsed")
+            self.trace.outcome = outcome
+            answer_at = len(self.response_text) if self.answer_at is None else self.answer_at
+            count_trace_tokens(self.trace, self.prompt, self.response_text[:answer_at], self.response_text[answer_at:])
+        session = getattr(self.llm, "session", None)
+        if session is not None and move is not None and self.game.is_legal(*move):
+            session.record(self.game, self.prompt, move)
+        return move, self.response_text
+
+
+def request_llm_move(llm, game, ai_color, on_text=None, book=None, early_stop=None, salvage=None, trace=None):
+    """向 LLM 要一步棋：生成 Prompt、读流、解析坐标，返回 (坐标或 None, 收到的回复)，参数含义见 MoveRequest"""
+    request = MoveRequest(llm, game, ai_color, on_text, book, early_stop, salvage, trace)
+    hit = request.book_move()
+    if hit is not None:
+        return hit
+    prompt = request.build_prompt()
+    request.mark("request")
+    stream = llm.get_llm_response_stream(prompt)
+    if stream:
+        for chunk in stream:
+            if request.feed(chunk):
+                stream.close()
+                break
+    return request.finish()
+
+
+def random_player(game):
+    """随机在空位落子的玩家"""
+    return random.choice(game.position.empty_cells())
+
+
+class LLMPlayer:
+    """把 LLMInterface 包装成无界面的玩家：坐标无效就重试，连续犯错 max_retries 次返回 None（投降）"""
+
+    def __init__(self, llm, max_retries=MAX_LLM_RETRIES, on_text=None, book=None, early_stop=None, salvage=None,
+                 metrics=None, provider=None):
+        self.llm = llm
+        self.max_retries = max_retries
+        self.on_text = on_text
+        self.book = book
+        self.early_stop = early_stop
+        self.salvage = salvage
+        self.metrics = metrics  # move_metrics.MetricsRecorder，每次尝试记一条
+        self.provider = provider or getattr(llm, "model_name", llm.__class__.__name__)
+        self.retry_count = 0
+
+    def __call__(self, game):
+        ai_color = game.current_color
+        self.retry_count = 0
+        while self.retry_count < self.max_retries:
+            trace = None
+            if self.metrics is not None:
+                trace = self.metrics.start(self.provider, ai_color, getattr(self.llm, "model_name", self.provider),
+                                           len(game.moves) + 1, self.retry_count)
+            move_coords, _ = request_llm_move(self.llm, game, ai_color, self.on_text, self.book,
+                                              self.early_stop, self.salvage, trace)
+            if self.metrics is not None:
+                self.metrics.record(trace)
+            if move_coords and game.is_legal(*move_coords):
+                return move_coords
+            self.retry_count += 1
+        return None
+
+
+def play_game(black_player, white_player, game=None, on_move=None):
+    """不带界面、不带延迟地下完一整盘，返回结束时的 GomokuGame
+
+    black_player / white_player 是 player(game) -> (x, y) 的可调用对象，返回 None 表示投降；
+    on_move(game, x, y) 在每步合法落子后调用。
+    """
+    if game is None:
+        game = GomokuGame()
+    players = {BLACK: black_player, WHITE: white_player}
+    while not game.game_over:
+        move = players[game.player](game)
+        if move is None:
+            game.resign()
+            break
+        x, y = move
+        game.play(x, y)
+        if on_move:
+            on_move(game, x, y)
+    return game
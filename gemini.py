@@ -1,53 +1,91 @@
 # gemini.py
-import google.generativeai as genai
 import re
 
 from llm_interface import LLMInterface
+from llm_clients import gemini_model
+from board_encoding import encoding_legend, needs_stone_lists
+from prompt_session import gemini_contents
+from threat_solver import prompt_hint_section
 
 class GeminiLLM(LLMInterface):
-    def __init__(self, config, gomoku_game):
+    def __init__(self, config, gomoku_game, model_name=None, api_key_section=None):
         self.config = config
         self.gomoku_game = gomoku_game
-        self.gemini_api_key = self.config.get('Gemini', 'api_key')
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash') #  提前加载模型
+        self.model_name = model_name or 'gemini-2.0-flash'
+        self.api_key_section = api_key_section or 'Gemini'
 
-    def create_prompt(self, board_state, ai_color): #  新增 ai_color 参数，但这里 ai_color 参数其实用不上，因为是白棋版本
+    @property
+    def model(self):
+        """第一次请求时才配置 genai、创建模型，黑白两边共用同一个"""
+        return gemini_model(self.config, self.model_name, self.api_key_section)
+
+    def prompt_rules(self):
         prompt = f"【五子棋指令】你现在是白棋AI (玩家2)，目标是赢下这场五子棋对决！<(￣︶￣)> \n"
         prompt += "棋盘大小是 15x15，坐标从 0 到 14，要记清楚哦！(눈\_눈)\n"
         prompt += "【重要规则】五子棋的目标是在横向、纵向或斜向的任意方向上，率先连成五个棋子！ (ง •̀\_•́)ง 记住是**任意方向**！ (╬￣皿￣)\n"
-        prompt += "【重要说明】当前棋盘状态使用汉字表示：'空'代表空格，'黑'代表黑棋，'白'代表白棋，不要搞错了！(╯▔皿▔)╯\n"
+        prompt += encoding_legend(self.board_encoding) or "【重要说明】当前棋盘状态使用汉字表示：'空'代表空格，'黑'代表黑棋，'白'代表白棋，不要搞错了！(╯▔皿▔)╯\n"
         prompt += "坐标系统：横向是**列**（坐标的**第二个数字**），纵向是**行**（坐标的**第一个数字**）。 比如[2,0]表示第3行第1列，搞不清楚就等着输吧！(¬‿¬)\n"
         prompt += "棋盘顶部和左侧有坐标轴，看不懂自己对照！(翻白眼)\n"
-        prompt += "当前棋盘状态：\n" + board_state + "\n"
-
-        #  记录黑白棋子的位置 (使用旧代码逻辑! 直接从 self.gomoku_game.board 读取!)
-        black_pieces = []
-        white_pieces = []
-        for x in range(self.gomoku_game.size):
-            for y in range(self.gomoku_game.size):
-                if self.gomoku_game.board[x][y] == 1:
-                    black_pieces.append((x, y))
-                elif self.gomoku_game.board[x][y] == 2:
-                    white_pieces.append((x, y))
-
-        prompt += "\n【黑棋位置】：(黑棋就是你的对手哦！要小心！) " + str(black_pieces) + "\n"
-        prompt += "\n【白棋位置】：(这些都是你下的棋子！要记住！) " + str(white_pieces) + "\n"
+        return prompt
 
-        prompt += "【核心规则】只能在'空'的位置下棋！不遵守规则就判你输！(╬￣皿￣)\n"
+    def prompt_instructions(self):
+        prompt = "【核心规则】只能在'空'的位置下棋！不遵守规则就判你输！(╬￣皿￣)\n"
         prompt += "\n给我认真思考一步最佳落子位置！不要瞎蒙！(눈\_눈) 否则有你好看！(╬￣皿￣)\n"
         prompt += "\n但是思考时间不要过长，不然耽误别人的时间，你要快速思考，最多思考90秒！别磨磨蹭蹭！(눈_눈)\n"
         prompt += "思考时，用()标出考虑的坐标。 示例：(3,5) 哼，本AI考虑这里怎么样... \n"
         prompt += "【最终指令】用[]标出最终确定的坐标！只能有一个！示例：[4,7] 就决定是你了！\n"
         prompt += "除了()和[]，可以写一些理由，但坐标格式必须正确！不然...哼哼！(ಡωಡ)\n"
+        return prompt
+
+    def create_prompt(self, board_state, ai_color): #  新增 ai_color 参数，但这里 ai_color 参数其实用不上，因为是白棋版本
+        if self.session is not None and self.session.active:
+            # 会话模式：规则和要求在系统前缀里，这里只发这一步的增量
+            prompt = self.session.turn_prompt(self.gomoku_game, board_state, self.board_encoding)
+            print(prompt)
+            return prompt
+
+        prompt = self.prompt_rules()
+        prompt += "当前棋盘状态：\n" + board_state + "\n"
+
+        #  记录黑白棋子的位置 (直接从位棋盘 self.gomoku_game.position 读取!)
+        if needs_stone_lists(self.gomoku_game, self.board_encoding):
+            black_pieces = self.gomoku_game.position.stones(1)
+            white_pieces = self.gomoku_game.position.stones(2)
+
+            prompt += "\n【黑棋位置】：(黑棋就是你的对手哦！要小心！) " + str(black_pieces) + "\n"
+            prompt += "\n【白棋位置】：(这些都是你下的棋子！要记住！) " + str(white_pieces) + "\n"
+        if self.gomoku_game.prompt_hints:
+            prompt += prompt_hint_section(self.gomoku_game.position, 2)
+
+        prompt += self.prompt_instructions()
         print(prompt)
         return prompt
 
     def get_llm_response_stream(self, prompt): # 修改为 get_llm_response_stream, 返回生成器!
-        response_stream = self.model.generate_content(prompt, stream=True) #  获取流式 response
+        contents = prompt
+        if self.session is not None and self.session.active:
+            contents = gemini_contents(self.chat_messages(prompt))  # 系统前缀放在第一段，保证每步开头一样
+        response_stream = self.model.generate_content(contents, stream=True) #  获取流式 response
         for chunk in response_stream: # 迭代 stream, 逐段返回 text
              yield chunk.text
 
+    async def get_llm_response_astream(self, prompt, executor=None):
+        """gRPC 下用原生异步接口，期限到了任务被取消时调用跟着取消；配了 api_endpoint（走 REST）时没有异步接口，退回线程池"""
+        if self.config.get(self.api_key_section, 'api_endpoint', fallback="").strip():
+            stream = super().get_llm_response_astream(prompt, executor)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+            return
+        contents = prompt
+        if self.session is not None and self.session.active:
+            contents = gemini_contents(self.chat_messages(prompt))
+        response_stream = await self.model.generate_content_async(contents, stream=True)
+        async for chunk in response_stream:
+            yield chunk.text
+
     def parse_response(self, response_text):
         coord_pattern = r"\[(\d{1,2}),\s*(\d{1,2})\]" #  更加严格的正则匹配，确保坐标前后没有多余字符
         matches = re.findall(coord_pattern, response_text) # 找到所有匹配的坐标
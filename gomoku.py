@@ -1,18 +1,25 @@
 import tkinter as tk
 from tkinter import messagebox, LabelFrame, Radiobutton, StringVar, Text
 from tkinter.ttk import Combobox
-import random
 import re
 import configparser
 import os
-import threading  # 导入 threading 模块!
+import queue
+import time
 from llm_interface import LLMInterface
-from gemini import GeminiLLM
-from deepseek import DeepSeekLLM
-from gemini_black import GeminiBlackLLM  # 导入 黑棋 Gemini
-from deepseek_black import DeepSeekBlackLLM  # 导入 黑棋 DeepSeek
-from QWQ import QWQ
-from QWQ_black import QWQBlackLLM  # 导入 黑棋 QWQ
+from game_core import GomokuGame
+from async_driver import AsyncMoveDriver, DeadlineFallback, LLMMoveTimeout, RaceStats
+from engine import SearchEngine
+from opening_book import OpeningBook, DEFAULT_BOOK_PATH
+from llm_cache import LLMResponseCache, CachedLLM, DEFAULT_CACHE_PATH
+from stream_parser import EarlyStopper
+from move_salvage import MoveSalvager
+import llm_clients
+from providers import ProviderRegistry  # 各家模型按名字登记，选中时才导入
+from prompt_session import PromptSession
+from move_metrics import MetricsRecorder, DEFAULT_JSONL_PATH, DEFAULT_PROM_PATH
+from log_sink import LogSink, DEFAULT_LOG_PATH, move_text
+from response_pane import ResponsePane
 
 # os.environ["HTTP_PROXY"] = "http://127.0.0.1:10808"
 # os.environ["HTTPS_PROXY"] = "http://127.0.0.1:10808"
@@ -20,17 +27,17 @@ from QWQ_black import QWQBlackLLM  # 导入 黑棋 QWQ
 PROMPT_COLOR = "blue"   # prompt 的颜色
 OUTPUT_COLOR = "green"  # LLM 输出的颜色
 ERROR_COLOR = "red"     # 错误的颜色
+UI_POLL_MS = 33         # Tk 主线程处理后台消息的帧间隔（毫秒，约 30 帧/秒），一帧里同一窗口的流式文本合并成一次插入
 
 class Gomoku:
     def __init__(self, master):
         self.master = master
         master.title("五子棋 (真·LLM AI版)  <(￣︶￣)> 真正的AI来了！")
 
-        self.size = 15
+        # 棋盘、规则和轮换都在无界面的 GomokuGame 里，界面只负责显示和输入
+        self.game = GomokuGame(15)
+        self.size = self.game.size
         self.grid_size = 40
-        self.board = [[0 for _ in range(self.size)] for _ in range(self.size)]
-        self.player = 1
-        self.game_over = False
         self.game_mode = "PVP"
         self.llm_api_type = "Gemini"
         self.llm_ai_color = "White"  # 默认 AI 执白棋
@@ -44,31 +51,113 @@ class Gomoku:
         self.config = configparser.ConfigParser()
         self.config.read('config.ini')
 
-        self.llm_models = {
-            "Gemini": {
-                "White": GeminiLLM(self.config, self),
-                "Black": GeminiBlackLLM(self.config, self),
-            },
-            "DeepSeek": {
-                "White": DeepSeekLLM(self.config, self),
-                "Black": DeepSeekBlackLLM(self.config, self),
-            },
-            "QWQ": {
-                "White": QWQ(self.config, self),
-                "Black": QWQBlackLLM(self.config, self),
-            },
+        # PVE 模式的本地引擎：Alpha-Beta（进程数大于 1 时用多进程分根搜索）或 MCTS
+        engine_time = self.config.getfloat('engine', 'time_limit', fallback=1.0)
+        engine_workers = self.config.getint('engine', 'workers', fallback=1)
+        if engine_workers > 1:
+            from parallel_search import ParallelSearchEngine  # 多进程相关的模块比较重，用到才导入
+
+            self.engine = ParallelSearchEngine(workers=engine_workers, time_limit=engine_time)
+        else:
+            self.engine = SearchEngine(time_limit=engine_time)
+        self.engine_time = engine_time
+        self.pve_engines = {
+            "AlphaBeta": self.engine,
+            "MCTS": None,  # 要用 NumPy，第一次选中时才创建
+        }
+        self.pve_engine_type = self.config.get('engine', 'pve_engine', fallback="AlphaBeta")
+
+        # 按对称标准形索引的开局库：引擎和 LLM 走棋前都先查一下，库文件第一次查询时才读盘
+        self.opening_book = OpeningBook(
+            self.config.get('opening_book', 'path', fallback=DEFAULT_BOOK_PATH),
+            self.config.getint('opening_book', 'max_stones', fallback=12),
+        )
+        self.llm_uses_book = self.config.getboolean('opening_book', 'use_for_llm', fallback=True)
+
+        # 内置模型加上 config.ini 里的 [provider:名字]，模块和 SDK 都等第一次用到时才导入
+        self.providers = ProviderRegistry(self.config)
+        self.llm_models = {}  # (模型名, "White"/"Black") -> 已创建（并套好缓存）的 LLM
+
+        # LLM 回复缓存：同一模型、同一方、同一局面问过一次就直接回放，不再调用 API
+        self.llm_cache = None
+        if self.config.getboolean('llm_cache', 'enabled', fallback=True):
+            self.llm_cache = LLMResponseCache(
+                self.config.get('llm_cache', 'path', fallback=DEFAULT_CACHE_PATH),
+                ttl=self.config.getfloat('llm_cache', 'ttl_hours', fallback=168) * 3600,
+                max_entries=self.config.getint('llm_cache', 'max_entries', fallback=5000),
+                max_bytes=self.config.getint('llm_cache', 'max_mb', fallback=64) << 20,
+            )
+        self.current_llm = None  # 开局时按选中的模型和颜色创建
+
+        # 所有 LLM 请求都交给后台事件循环，按提供方限制并发；结果和输出经队列回到 Tk 主线程
+        # 每步有硬性期限（可按模型单独设置），到期取消请求，由思考过程里的候选或本地引擎代下
+        default_limit = self.config.getint('llm_async', 'default_limit', fallback=4)
+        move_timeout = self.config.getfloat('llm_async', 'move_timeout', fallback=0) or None
+        fallback_mode = self.config.get('llm_async', 'deadline_fallback', fallback="candidates")
+        self.deadline_fallback = None
+        if fallback_mode != "none":
+            self.deadline_fallback = DeadlineFallback(
+                self.engine, self.config.getfloat('llm_async', 'fallback_time', fallback=1.0),
+                use_candidates=fallback_mode == "candidates",
+            )
+        self.llm_driver = AsyncMoveDriver(
+            provider_limits={name: self.config.getint('llm_async', f'limit_{name}', fallback=default_limit)
+                             for name in self.providers.names()},
+            default_limit=default_limit,
+            move_timeout=move_timeout,
+            provider_timeouts={name: self.config.getfloat('llm_async', f'timeout_{name}', fallback=move_timeout or 0) or None
+                               for name in self.providers.names()},
+            fallback=self.deadline_fallback,
+        )
+        # 人机对战（PVLLM）时的对冲请求：主模型迟迟不出第一个 token 就把同一局面再发给下一家，谁先给出合法坐标用谁
+        self.race_providers = []
+        if self.config.getboolean('llm_race', 'enabled', fallback=False):
+            self.race_providers = [name.strip() for name in self.config.get('llm_race', 'providers', fallback="").split(",")
+                                   if name.strip() in self.providers.specs]
+        self.hedge_delay = self.config.getfloat('llm_race', 'hedge_delay_ms', fallback=2000) / 1000
+        self.race_stats = RaceStats()
+        # 每步各阶段的耗时和 token 数：写进 metrics.jsonl，并刷新 Prometheus textfile（python move_metrics.py 看汇总）
+        self.metrics = None
+        if self.config.getboolean('metrics', 'enabled', fallback=True):
+            self.metrics = MetricsRecorder(
+                self.config.get('metrics', 'jsonl', fallback=DEFAULT_JSONL_PATH),
+                self.config.get('metrics', 'prometheus', fallback=DEFAULT_PROM_PATH),
+            )
+        self.ui_queue = queue.Queue()
+        self.llm_future = None
+        self.game_generation = 0  # 每次重新开局加一，旧请求迟到的结果据此丢弃
+
+        # 流式解析：最终回答里出现合法坐标就提前关流，每隔几步完整跑一次用来估计省下的量
+        self.early_stop = None
+        if self.config.getboolean('llm_stream', 'early_stop', fallback=True):
+            self.early_stop = EarlyStopper(self.config.getint('llm_stream', 'calibrate_every', fallback=10),
+                                           self.config.getint('llm_stream', 'settle_chars', fallback=80))
+
+        # 最终坐标无效时从思考过程里捡坐标的策略，按模型分别配置（off / recent / threat）
+        default_policy = self.config.get('llm_salvage', 'default', fallback="off")
+        self.salvagers = {
+            llm_type: MoveSalvager(self.config.get('llm_salvage', llm_type, fallback=default_policy))
+            for llm_type in self.providers.names()
         }
-        self.current_llm = self.llm_models[self.llm_api_type]["White"]  # 默认 Gemini 白棋
 
         # 设置画布大小
         self.canvas_width = self.size * self.grid_size + 30
         self.canvas_height = self.size * self.grid_size + 80
 
-        # 创建日志文件（追加模式），分别记录黑棋和白棋的输出
-        self.black_log_file = open("black_output.log", "a", encoding="utf-8")
-        self.white_log_file = open("white_output.log", "a", encoding="utf-8")
-        # 窗口关闭时关闭日志文件
+        # LLM 输出日志：每段输出一条 JSONL 记录（对局编号、第几手、模型、颜色），由后台线程批量写盘
+        self.log_sink = LogSink(
+            self.config.get('log', 'path', fallback=DEFAULT_LOG_PATH),
+            max_queue=self.config.getint('log', 'queue_size', fallback=10000),
+            batch_bytes=self.config.getint('log', 'batch_kb', fallback=64) * 1024,
+            flush_interval=self.config.getint('log', 'flush_ms', fallback=500) / 1000,
+            rotate_bytes=self.config.getint('log', 'rotate_mb', fallback=0) * 1024 * 1024,
+            keep=self.config.getint('log', 'keep', fallback=5),
+            compress=self.config.getboolean('log', 'gzip', fallback=True),
+        )
+        self.game_id = time.strftime("%Y%m%d-%H%M%S")  # 日志里的对局编号，每次重新开局换一个
+        # 窗口关闭时把日志写完
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.master.after(UI_POLL_MS, self.process_ui_queue)
 
         # 布局：采用三列布局
         # 第一列：黑棋窗口
@@ -92,6 +181,22 @@ class Gomoku:
         self.white_response_text.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
         tk.Grid.columnconfigure(white_response_frame, 0, weight=1)
         tk.Grid.rowconfigure(white_response_frame, 0, weight=1)
+        # 文字颜色按类型设置一次，之后插入时只带上 tag
+        for widget in (self.black_response_text, self.white_response_text):
+            widget.tag_configure("prompt", foreground=PROMPT_COLOR)
+            widget.tag_configure("output", foreground=OUTPUT_COLOR)
+            widget.tag_configure("error", foreground=ERROR_COLOR)
+        # 窗口里只留最近几手的完整输出，更早的折叠成摘要，点击后从日志里读出来
+        self.response_panes = {
+            color: ResponsePane(
+                widget,
+                max_chars=self.config.getint('ui', 'pane_max_chars', fallback=20000),
+                max_moves=self.config.getint('ui', 'pane_max_moves', fallback=4),
+                max_summaries=self.config.getint('ui', 'pane_max_summaries', fallback=100),
+                on_expand=lambda key, color=color: self.show_logged_move(color, key),
+            )
+            for color, widget in (("Black", self.black_response_text), ("White", self.white_response_text))
+        }
 
         # 模式选择框（跨三列）
         mode_frame = LabelFrame(master, text="选择对战模式 (你想和谁玩？)")
@@ -107,11 +212,17 @@ class Gomoku:
         aivai_radio = Radiobutton(mode_frame, text="AI对战 (AIvsAI)", variable=self.mode_var, value="AIvsAI", command=self.update_game_mode)
         aivai_radio.pack(side=tk.LEFT, padx=10)
 
+        # PVE 引擎选择
+        self.pve_engine_var = StringVar(value=self.pve_engine_type)
+        pve_engine_combobox = Combobox(mode_frame, textvariable=self.pve_engine_var, values=list(self.pve_engines), width=10)
+        pve_engine_combobox.pack(side=tk.LEFT, padx=10)
+        pve_engine_combobox.bind("<<ComboboxSelected>>", self.update_pve_engine)
+
         # LLM选择框（跨三列）
         pvllm_frame = LabelFrame(master, text="选择 LLM (你想和哪个AI玩？)")
         pvllm_frame.grid(row=2, column=0, columnspan=3, pady=5, padx=20, sticky="ew")
         self.llm_var = StringVar(value="Gemini")
-        llm_combobox = Combobox(pvllm_frame, textvariable=self.llm_var, values=list(self.llm_models.keys()))
+        llm_combobox = Combobox(pvllm_frame, textvariable=self.llm_var, values=self.providers.names())
         llm_combobox.pack(side=tk.LEFT, padx=10)
         llm_combobox.bind("<<ComboboxSelected>>", self.update_llm_api_type)
 
@@ -124,6 +235,16 @@ class Gomoku:
         black_radio = Radiobutton(llm_color_frame, text="黑棋", variable=self.llm_color_var, value="Black", command=self.update_llm_ai_color)
         black_radio.pack(side=tk.LEFT)
 
+        # 是否在 Prompt 里附带本地威胁分析的提示
+        self.hint_var = tk.BooleanVar(value=False)
+        hint_check = tk.Checkbutton(pvllm_frame, text="附带局面提示 (必胜手顺/棋型)", variable=self.hint_var, command=self.update_prompt_hints)
+        hint_check.pack(side=tk.LEFT, padx=10)
+
+        # 是否只把附近空位（而不是整张棋盘）发给 LLM
+        self.relevant_cells_var = tk.BooleanVar(value=False)
+        relevant_check = tk.Checkbutton(pvllm_frame, text="只发送附近空位", variable=self.relevant_cells_var, command=self.update_prompt_relevant_cells)
+        relevant_check.pack(side=tk.LEFT, padx=10)
+
         # AI对战设置框（跨三列）
         aivai_frame = LabelFrame(master, text="AI对战设置 (选择黑白方AI)")
         aivai_frame.grid(row=3, column=0, columnspan=3, pady=5, sticky="ew")
@@ -132,7 +253,7 @@ class Gomoku:
         black_ai_frame = LabelFrame(aivai_frame, text="黑棋AI")
         black_ai_frame.pack(side=tk.LEFT, padx=20)
         self.black_llm_var = StringVar(value="Gemini")
-        black_llm_combobox = Combobox(black_ai_frame, textvariable=self.black_llm_var, values=list(self.llm_models.keys()))
+        black_llm_combobox = Combobox(black_ai_frame, textvariable=self.black_llm_var, values=self.providers.names())
         black_llm_combobox.pack(side=tk.LEFT, padx=10)
         black_llm_combobox.bind("<<ComboboxSelected>>", self.update_black_llm_type)
 
@@ -140,7 +261,7 @@ class Gomoku:
         white_ai_frame = LabelFrame(aivai_frame, text="白棋AI")
         white_ai_frame.pack(side=tk.LEFT, padx=20)
         self.white_llm_var = StringVar(value="DeepSeek")
-        white_llm_combobox = Combobox(white_ai_frame, textvariable=self.white_llm_var, values=list(self.llm_models.keys()))
+        white_llm_combobox = Combobox(white_ai_frame, textvariable=self.white_llm_var, values=self.providers.names())
         white_llm_combobox.pack(side=tk.LEFT, padx=10)
         white_llm_combobox.bind("<<ComboboxSelected>>", self.update_white_llm_type)
 
@@ -163,12 +284,52 @@ class Gomoku:
         restart_button = tk.Button(button_frame, text="重新开始", command=self.restart_game)
         restart_button.pack(side=tk.LEFT, padx=10)
 
+    @property
+    def position(self):
+        return self.game.position
+
+    @property
+    def player(self):
+        return self.game.player
+
+    @property
+    def game_over(self):
+        return self.game.game_over
+
+    @game_over.setter
+    def game_over(self, value):
+        self.game.game_over = value
+
     def on_closing(self):
+        self.cancel_llm_request()
+        self.llm_driver.shutdown()
+        if hasattr(self.engine, "shutdown"):
+            self.engine.shutdown()
         try:
-            self.black_log_file.close()
-            self.white_log_file.close()
+            self.opening_book.save()
+            print(self.opening_book.stats_text())
         except Exception as e:
-            print("关闭日志文件时出错:", e)
+            print("保存开局库时出错:", e)
+        llm_clients.close_all()
+        if self.early_stop is not None:
+            print(self.early_stop.stats_text())
+        if self.deadline_fallback is not None:
+            print(self.deadline_fallback.stats_text())
+        if self.race_providers:
+            print(self.race_stats.stats_text())
+        for llm_type, salvager in self.salvagers.items():
+            if salvager.policy != "off":
+                print(f"{llm_type}：{salvager.stats_text()}")
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.llm_cache is not None:
+            try:
+                print(self.llm_cache.stats_text())
+                self.llm_cache.close()
+            except Exception as e:
+                print("关闭 LLM 回复缓存时出错:", e)
+        self.log_sink.close()
+        print(self.log_sink.stats_text())
         self.master.destroy()
 
     def update_black_llm_type(self, event):
@@ -205,7 +366,7 @@ class Gomoku:
         current_llm_type = self.black_llm_type if self.player == 1 else self.white_llm_type
 
         # 设置当前LLM
-        self.current_llm = self.llm_models[current_llm_type][current_color]
+        self.current_llm = self.get_llm(current_llm_type, current_color)
 
         # 黑棋和白棋的重试次数应该分开计算
         if self.llm_retry_count >= 3:
@@ -216,25 +377,29 @@ class Gomoku:
             self.game_over = True
             return
 
-        board_state = self.get_board_state()
-        prompt = self.current_llm.create_prompt(board_state, current_color)
-        self.display_llm_response(
-            f"发送给 {current_llm_type} ({current_color} 棋) 的 Prompt:\n{prompt}\n",
-            text_type="prompt", player_color=current_color
-        )
+        generation = self.game_generation
 
-        llm_response_text = ""  # 初始化完整回复字符串
+        def on_text(text, text_type):
+            # 在事件循环的线程里被调用，只能把显示操作排进队列交给 Tk 主线程
+            if generation != self.game_generation:
+                return
+            if text_type == "prompt":
+                text = f"发送给 {current_llm_type} ({current_color} 棋) 的 Prompt:\n{text}\n"
+            self.post_llm_text(text, text_type, current_color, generation)
 
-        def stream_llm_response():
-            nonlocal llm_response_text
+        def handle_result(future):
+            if future.cancelled() or generation != self.game_generation:
+                return  # 请求被取消了，或者棋局已经重新开始
             try:
-                stream = self.current_llm.get_llm_response_stream(prompt)
-                if stream:
-                    for chunk in stream:
-                        if chunk:
-                            response_part = chunk
-                            self.display_llm_response(response_part, player_color=current_color)
-                            llm_response_text += response_part  # 累加回复内容
+                move_coords, _ = future.result()
+            except LLMMoveTimeout as e:
+                self.llm_retry_count += 1
+                self.display_llm_response(
+                    f"{e}！这是第{self.llm_retry_count}次犯错了！重新思考！(눈_눈)\n",
+                    player_color=current_color
+                )
+                self.master.after(200, self.aivai_move)
+                return
             except Exception as e:
                 error_message = f"和 {current_llm_type} ({current_color} 棋) API 通信出错啦！ (*/ω＼*) 错误信息：{e}\n"
                 messagebox.showerror("API Error", error_message)
@@ -242,20 +407,14 @@ class Gomoku:
                 self.display_llm_response(error_message, text_type="error", player_color=current_color)
                 return
 
-            move_coords = self.current_llm.parse_response(llm_response_text)  # 在 stream 结束后解析完整回复
-
             if move_coords:
                 x, y = move_coords
 
-                if 0 <= x < self.size and 0 <= y < self.size and self.board[x][y] == 0:
-                    self.board[x][y] = self.player
-                    self.draw_piece(x, y)
-
-                    if self.check_win(x, y):
+                if self.game.is_legal(x, y):
+                    if self.apply_move(x, y):
                         self.announce_winner_aivai(current_llm_type, current_color)
                         return
 
-                    self.player = 3 - self.player
                     self.llm_retry_count = 0
 
                     # 一定延迟后，让另一个AI继续走棋
@@ -275,11 +434,14 @@ class Gomoku:
                 )
                 self.master.after(200, self.aivai_move)
 
-        threading.Thread(target=stream_llm_response).start()
+        self.submit_llm_request(current_llm_type, current_color, on_text, handle_result)
 
     def announce_winner_aivai(self, llm_type, color):
         """AI对战模式下的获胜公告"""
-        messagebox.showinfo("AI对战结束！", f"{llm_type} ({color} 棋) 赢了！ 哼！(＾▽＾)")
+        if self.game.winner == 0:
+            messagebox.showinfo("AI对战结束！", "棋盘下满了，平局！(￣ー￣)")
+        else:
+            messagebox.showinfo("AI对战结束！", f"{llm_type} ({color} 棋) 赢了！ 哼！(＾▽＾)")
         self.game_over = True
 
     def draw_board(self):
@@ -306,6 +468,10 @@ class Gomoku:
         self.game_mode = self.mode_var.get()
         # 模式切换后不自动重启游戏
 
+    def update_pve_engine(self, event):
+        self.pve_engine_type = self.pve_engine_var.get()
+        print(f"PVE 引擎已设置为: {self.pve_engine_type}")
+
     def update_llm_api_type(self, event):
         self.llm_api_type = self.llm_var.get()
         self.update_current_llm()
@@ -318,11 +484,44 @@ class Gomoku:
         print(f"已选择 LLM: {self.llm_api_type}, 颜色: {self.llm_ai_color}")
         # 颜色切换后不自动重启游戏
 
+    def update_prompt_hints(self):
+        self.game.prompt_hints = self.hint_var.get()
+        print(f"局面提示已{'开启' if self.game.prompt_hints else '关闭'}")
+
+    def update_prompt_relevant_cells(self):
+        self.game.prompt_relevant_cells = self.relevant_cells_var.get()
+        print(f"只发送附近空位已{'开启' if self.game.prompt_relevant_cells else '关闭'}")
+
+    def get_llm(self, llm_type, color):
+        """取 llm_type 模型执 color 的实例，第一次用到时才导入模块、套上回复缓存"""
+        llm = self.llm_models.get((llm_type, color))
+        if llm is None:
+            llm = self.providers.get(llm_type, color, self.config, self.game)
+            llm.board_encoding = self.config.get(
+                'prompt', f'encoding_{llm_type}', fallback=self.config.get('prompt', 'encoding', fallback="grid"))
+            session_mode = self.config.get('prompt', 'session', fallback="off")
+            if session_mode != "off":
+                llm.session = PromptSession(session_mode, self.config.getint('prompt', 'board_every', fallback=5))
+            if self.llm_cache is not None:
+                llm = CachedLLM(llm, self.llm_cache, llm_type)
+            self.llm_models[(llm_type, color)] = llm
+        return llm
+
+    def get_pve_engine(self):
+        engine = self.pve_engines[self.pve_engine_type]
+        if engine is None:
+            from mcts import MCTSEngine
+
+            engine = MCTSEngine(time_limit=self.engine_time)
+            self.pve_engines[self.pve_engine_type] = engine
+        return engine
+
     def update_current_llm(self):
-        self.current_llm = self.llm_models[self.llm_api_type][self.llm_ai_color]
+        self.current_llm = self.get_llm(self.llm_api_type, self.llm_ai_color)
 
     def start_game_llm(self):
         self.game_mode = "PVLLM"
+        self.update_current_llm()
         self.restart_game()
         self.game_over = False
         self.llm_retry_count = 0
@@ -331,55 +530,73 @@ class Gomoku:
             self.master.after(200, self.llm_move)
 
     def restart_game(self):
-        self.board = [[0 for _ in range(self.size)] for _ in range(self.size)]
-        self.player = 1
-        self.game_over = False
+        self.cancel_llm_request()
+        self.game.reset()
+        self.game_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.game_generation}"
+        for llm in self.llm_models.values():
+            if llm.session is not None:
+                llm.session.reset()
         self.canvas.delete("all")
         self.draw_board()
         self.clear_llm_response()
         self.llm_retry_count = 0
         if self.game_mode == "PVLLM" and self.llm_ai_color == "Black":  # 重新开始后，如果AI是黑棋，立即走一步
-            self.player = 1  # 确保是黑棋 (AI) 先走
             self.master.after(200, self.llm_move)
 
     def clear_llm_response(self):
-        self.black_response_text.config(state=tk.NORMAL)
-        self.black_response_text.delete("1.0", tk.END)
-        self.black_response_text.config(state=tk.DISABLED)
-        self.white_response_text.config(state=tk.NORMAL)
-        self.white_response_text.delete("1.0", tk.END)
-        self.white_response_text.config(state=tk.DISABLED)
+        for pane in self.response_panes.values():
+            pane.clear()
 
     def display_llm_response(self, text, text_type="output", player_color=None):
+        """Tk 主线程里直接显示一段文字（提示、报错之类），后台线程请用 post_llm_text"""
         if player_color is None:
             player_color = "Black" if self.player == 1 else "White"
-        if player_color == "Black":
-            widget = self.black_response_text
-            # 写入黑棋日志
-            self.black_log_file.write(text)
-            self.black_log_file.flush()
-        elif player_color == "White":
-            widget = self.white_response_text
-            # 写入白棋日志
-            self.white_log_file.write(text)
-            self.white_log_file.flush()
-        else:
-            widget = self.white_response_text
-            self.white_log_file.write(text)
-            self.white_log_file.flush()
-
-        widget.config(state=tk.NORMAL)
-        if text_type == "prompt":
-            color = PROMPT_COLOR
-        elif text_type == "error":
-            color = ERROR_COLOR
-        else:
-            color = OUTPUT_COLOR
-
-        widget.tag_configure(text_type, foreground=color)
-        widget.insert(tk.END, text, text_type)
-        widget.config(state=tk.DISABLED)
-        widget.see(tk.END)
+        self.log_llm_text(text, text_type, player_color)
+        self.insert_llm_text(player_color, [(text, text_type)])
+
+    def post_llm_text(self, text, text_type, player_color, generation):
+        """任何线程都可以调用：记日志，再把文字排进 UI 队列，等下一帧和同窗口的其他片段一起插入"""
+        self.log_llm_text(text, text_type, player_color)
+        self.ui_queue.put((None, (generation, player_color, text_type, text)))
+
+    def log_llm_text(self, text, text_type, player_color):
+        # 只是放进日志队列，写盘由后台线程批量完成
+        self.log_sink.log(game=self.game_id, move=len(self.game.moves) + 1, provider=self.llm_type_for(player_color),
+                          color=player_color, type=text_type, text=text)
+
+    def insert_llm_text(self, player_color, segments):
+        """把 [(文字, 类型), ...] 一次性追加到对应颜色窗口里当前这一手的末尾"""
+        pane = self.response_panes["Black" if player_color == "Black" else "White"]
+        pane.append((self.game_id, len(self.game.moves) + 1), segments)
+
+    def show_logged_move(self, player_color, key):
+        """点击折叠的摘要：从日志里读出那一手的完整输出，在新窗口里显示"""
+        game_id, move = key
+        self.log_sink.flush()
+        try:
+            text = move_text(self.log_sink.path, game_id, move, player_color)
+        except (OSError, ValueError) as e:
+            text = f"读取日志时出错: {e}"
+        if not text:
+            messagebox.showinfo("找不到记录", f"日志里没有第 {move} 手的输出 (´･ω･`)")
+            return
+        window = tk.Toplevel(self.master)
+        window.title(f"{player_color} 第 {move} 手的完整输出")
+        viewer = Text(window, height=30, width=90, wrap=tk.WORD)
+        scrollbar = tk.Scrollbar(window, command=viewer.yview)
+        viewer.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        viewer.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        viewer.insert(tk.END, text)
+        viewer.config(state=tk.DISABLED)
+
+    def llm_type_for(self, color):
+        """当前模式下执 color 的 LLM 名字（日志用），这一方不是 LLM 时返回 None"""
+        if self.game_mode == "AIvsAI":
+            return self.black_llm_type if color == "Black" else self.white_llm_type
+        if self.game_mode == "PVLLM" and color == self.llm_ai_color:
+            return self.llm_api_type
+        return None
 
     def on_click(self, event):
         if self.game_over:
@@ -399,16 +616,11 @@ class Gomoku:
         if x < 0 or x >= self.size or y < 0 or y >= self.size:
             return
 
-        if self.board[x][y] == 0:
-            self.board[x][y] = self.player
-            self.draw_piece(x, y)
-
-            if self.check_win(x, y):
+        if self.game.is_legal(x, y):
+            if self.apply_move(x, y):
                 self.announce_winner()
                 return
 
-            self.player = 3 - self.player
-
             if self.game_mode == "PVE" and self.player == 2 and not self.game_over:
                 self.master.after(200, self.ai_move)
             elif self.game_mode == "PVLLM" and self.player == 2 and not self.game_over:
@@ -417,54 +629,57 @@ class Gomoku:
                 self.master.after(200, self.llm_move)
 
     def ai_move(self):
-        possible_moves = []
-        for i in range(self.size):
-            for j in range(self.size):
-                if self.board[i][j] == 0:
-                    possible_moves.append((i, j))
-
-        if possible_moves:
-            x, y = random.choice(possible_moves)
-            self.board[x][y] = self.player
-            self.draw_piece(x, y)
-
-            if self.check_win(x, y):
-                self.announce_winner()
-                return
-
-            self.player = 3 - self.player
+        if self.game_over:
+            return
+        entry = self.opening_book.lookup(self.position, self.player)
+        if entry is not None:
+            print(f"开局库落子 {entry.move}（来源 {entry.source}，深度 {entry.depth}）")
+            x, y = entry.move
         else:
-            messagebox.showinfo("游戏结束", "平局！")
-            self.game_over = True
+            result = self.get_pve_engine().search(self.position, self.player)
+            if self.pve_engine_type == "MCTS":
+                print(f"MCTS 落子 {result.move}：{result.nodes} 次 playout，{result.nps:.0f} playout/秒，胜率 {result.score:.2f}")
+                self.opening_book.store(self.position, self.player, result.move, result.score, 0, "mcts")
+            else:
+                print(f"引擎落子 {result.move}：深度 {result.depth}，{result.nodes} 个节点，{result.nps:.0f} 节点/秒")
+                self.opening_book.store(self.position, self.player, result.move, result.score, result.depth)
+            x, y = result.move
+        if self.apply_move(x, y):
+            self.announce_winner()
 
     def llm_move(self):
+        if self.current_llm is None:
+            self.update_current_llm()
         if self.llm_retry_count >= 3:
             self.display_llm_response(
-                f"{self.current_llm.__class__.__name__} 连续犯错太多次了！哼！(눈_눈) 小鬼AI决定直接投降！\n",
+                f"{self.llm_api_type} 连续犯错太多次了！哼！(눈_눈) 小鬼AI决定直接投降！\n",
                 player_color=self.llm_ai_color
             )
             self.game_over = True
             return
 
-        board_state = self.get_board_state()
-        prompt = self.current_llm.create_prompt(board_state, self.llm_ai_color)
-        self.display_llm_response(
-            f"发送给 {self.llm_api_type} ({self.llm_ai_color} 棋) 的 Prompt:\n{prompt}\n",
-            text_type="prompt", player_color=self.llm_ai_color
-        )
+        generation = self.game_generation
 
-        llm_response_text = ""  # 初始化 llm_response_text 变量！
+        def on_text(text, text_type):
+            if generation != self.game_generation:
+                return
+            if text_type == "prompt":
+                text = f"发送给 {self.llm_api_type} ({self.llm_ai_color} 棋) 的 Prompt:\n{text}\n"
+            self.post_llm_text(text, text_type, self.llm_ai_color, generation)
 
-        def stream_llm_response():
-            nonlocal llm_response_text
+        def handle_result(future):
+            if future.cancelled() or generation != self.game_generation:
+                return
             try:
-                stream = self.current_llm.get_llm_response_stream(prompt)
-                if stream:
-                    for chunk in stream:
-                        if chunk:
-                            response_part = chunk
-                            self.display_llm_response(response_part, player_color=self.llm_ai_color)
-                            llm_response_text += response_part  # 累加回复内容！
+                move_coords, _ = future.result()
+            except LLMMoveTimeout as e:
+                self.llm_retry_count += 1
+                self.display_llm_response(
+                    f"{e}！这是第{self.llm_retry_count}次犯错了！重新思考！(눈_눈)\n",
+                    player_color=self.llm_ai_color
+                )
+                self.master.after(200, self.llm_move)
+                return
             except Exception as e:
                 error_message = f"和 {self.llm_api_type} ({self.llm_ai_color} 棋) API 通信出错啦！ (*/ω＼*) 错误信息：{e}\n"
                 messagebox.showerror("API Error", error_message)
@@ -472,20 +687,14 @@ class Gomoku:
                 self.display_llm_response(error_message, text_type="error", player_color=self.llm_ai_color)
                 return
 
-            move_coords = self.current_llm.parse_response(llm_response_text)  # 在 stream 结束后解析完整回复！
-
             if move_coords:
                 x, y = move_coords
 
-                if 0 <= x < self.size and 0 <= y < self.size and self.board[x][y] == 0:
-                    self.board[x][y] = self.player
-                    self.draw_piece(x, y)
-
-                    if self.check_win(x, y):
+                if self.game.is_legal(x, y):
+                    if self.apply_move(x, y):
                         self.announce_winner()
                         return
 
-                    self.player = 3 - self.player
                     self.llm_retry_count = 0
                 else:
                     self.llm_retry_count += 1
@@ -502,103 +711,131 @@ class Gomoku:
                 )
                 self.master.after(200, self.llm_move)
 
-        threading.Thread(target=stream_llm_response).start()
-
-    def get_board_state(self):
-        board_str = "   " + " ".join([str(i) if i < 10 else str(i)[0] for i in range(self.size)]) + "\n"
-        board_str += "   " + " ".join([str(i)[1] if i >= 10 else " " for i in range(self.size)]) + "\n"
-        board_str = board_str.replace(" ", "  ")
-
-        piece_map = {0: "空", 1: "黑", 2: "白"}
-        for row_index, row in enumerate(self.board):
-            row_str = str(row_index) if row_index < 10 else str(row_index)[0]
-            row_str += str(row_index)[1] if row_index >= 10 else " "
-            row_str = row_str + "  "
-            for piece in row:
-                row_str += piece_map[piece] + " "
-            board_str += row_str + "\n"
-        return board_str
+        self.submit_llm_request(self.llm_api_type, self.llm_ai_color, on_text, handle_result, race=True)
+
+    def submit_llm_request(self, llm_type, color, on_text, handle_result, race=False):
+        """把要棋请求交给异步驱动，结果回到 Tk 主线程后交给 handle_result(future)
+
+        race=True 且 [llm_race] 开启时，同一局面会按对冲延迟再发给其他模型，谁先给出合法坐标用谁。
+        """
+        book = self.opening_book if self.llm_uses_book else None
+        trace = None
+        entries = [(llm_type, self.current_llm)]
+        if race:
+            for name in self.race_providers:
+                if name == llm_type:
+                    continue
+                try:
+                    entries.append((name, self.get_llm(name, color)))
+                except Exception as e:
+                    print(f"对冲模型 {name} 创建失败，跳过：{e}")
+        if len(entries) > 1:
+            coro = self.llm_driver.race_move(
+                entries, self.game, color, self.hedge_delay, on_text=on_text, book=book,
+                early_stop=self.early_stop, salvagers=self.salvagers, stats=self.race_stats, metrics=self.metrics,
+            )
+        else:
+            if self.metrics is not None:
+                trace = self.metrics.start(llm_type, color, getattr(self.current_llm, "model_name", llm_type),
+                                           len(self.game.moves) + 1, self.llm_retry_count)
+            coro = self.llm_driver.request_move(
+                self.current_llm, self.game, color, llm_type, on_text=on_text, book=book,
+                early_stop=self.early_stop, salvage=self.salvagers[llm_type], trace=trace,
+            )
+        future = self.llm_driver.submit(coro)
+        self.llm_future = future
+
+        def done(future):
+            handle_result(future)
+            if trace is not None:
+                # handle_result 里已经落子、重绘，这段时间算作 apply
+                if future.cancelled():
+                    trace.outcome = "cancelled"
+                elif trace.outcome is None:
+                    trace.outcome = "error"
+                elif trace.outcome in ("legal", "salvaged", "book"):
+                    trace.mark("applied")
+                self.metrics.record(trace)
+
+        future.add_done_callback(lambda finished: self.call_in_ui(done, finished))
+
+    def call_in_ui(self, func, *args):
+        """任何线程都可以调用：把 func(*args) 排进队列，由 Tk 主线程在 process_ui_queue 里执行"""
+        self.ui_queue.put((func, args))
+
+    def process_ui_queue(self):
+        """每帧执行一次：只处理这一帧开始时已经排队的消息，连续的流式文本按窗口攒起来一次插入
+
+        普通回调执行前先把攒着的文本插进去，保证显示顺序和排队顺序一致；已经重新开局的旧文本直接丢掉。
+        """
+        pending = {}  # 颜色 -> [(文字, 类型), ...]
+        for _ in range(self.ui_queue.qsize()):
+            try:
+                func, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if func is None:
+                generation, player_color, text_type, text = args
+                if generation != self.game_generation:
+                    continue
+                segments = pending.setdefault(player_color, [])
+                if segments and segments[-1][1] == text_type:
+                    segments[-1] = (segments[-1][0] + text, text_type)
+                else:
+                    segments.append((text, text_type))
+                continue
+            self.flush_llm_text(pending)
+            try:
+                func(*args)
+            except Exception as e:
+                print("处理界面消息时出错:", e)
+        self.flush_llm_text(pending)
+        self.master.after(UI_POLL_MS, self.process_ui_queue)
+
+    def flush_llm_text(self, pending):
+        for player_color, segments in pending.items():
+            self.insert_llm_text(player_color, segments)
+        pending.clear()
+
+    def cancel_llm_request(self):
+        """取消进行中的要棋请求，之后到达的输出和结果都会被丢掉"""
+        self.game_generation += 1
+        if self.llm_future is not None:
+            self.llm_future.cancel()
+            self.llm_future = None
+
+    def apply_move(self, x, y):
+        """把一步合法落子交给 GomokuGame 并画出来，返回对局是否就此结束"""
+        finished = self.game.play(x, y)
+        self.draw_piece(x, y)
+        return finished
 
     def draw_piece(self, x, y):
         x1 = y * self.grid_size - self.grid_size // 2 + 30
         y1 = x * self.grid_size - self.grid_size // 2 + 30 + 30
         x2 = y * self.grid_size + self.grid_size // 2 + 30
         y2 = x * self.grid_size + self.grid_size // 2 + 30 + 30
-        color = "black" if self.player == 1 else "white"
+        color = "black" if self.position.get(x, y) == 1 else "white"
         self.canvas.create_oval(x1, y1, x2, y2, fill=color)
 
-    def check_win(self, x, y):
-        # 检查横向
-        count = 1
-        for i in range(1, 5):
-            if y + i < self.size and self.board[x][y + i] == self.player:
-                count += 1
-            else:
-                break
-        for i in range(1, 5):
-            if y - i >= 0 and self.board[x][y - i] == self.player:
-                count += 1
-            else:
-                break
-        if count >= 5:
-            return True
-
-        # 检查纵向
-        count = 1
-        for i in range(1, 5):
-            if x + i < self.size and self.board[x + i][y] == self.player:
-                count += 1
-            else:
-                break
-        for i in range(1, 5):
-            if x - i >= 0 and self.board[x - i][y] == self.player:
-                count += 1
-            else:
-                break
-        if count >= 5:
-            return True
-
-        # 检查对角线（左上到右下）
-        count = 1
-        for i in range(1, 5):
-            if x + i < self.size and y + i < self.size and self.board[x + i][y + i] == self.player:
-                count += 1
-            else:
-                break
-        for i in range(1, 5):
-            if x - i >= 0 and y - i >= 0 and self.board[x - i][y - i] == self.player:
-                count += 1
-            else:
-                break
-        if count >= 5:
-            return True
-
-        # 检查对角线（右上到左下）
-        count = 1
-        for i in range(1, 5):
-            if x + i < self.size and y - i >= 0 and self.board[x + i][y - i] == self.player:
-                count += 1
-            else:
-                break
-        for i in range(1, 5):
-            if x - i >= 0 and y + i < self.size and self.board[x - i][y + i] == self.player:
-                count += 1
-            else:
-                break
-        if count >= 5:
-            return True
-
-        return False
-
     def announce_winner(self):
-        winner = "黑棋" if self.player == 1 else "白棋"
-        messagebox.showinfo("游戏结束！", f"{winner} 赢了！ 略略略~ (这次{self.current_llm.__class__.__name__}也没赢过你！ 哼！)")
+        if self.game.winner == 0:
+            messagebox.showinfo("游戏结束", "平局！")
+            self.game_over = True
+            return
+        winner = "黑棋" if self.game.winner == 1 else "白棋"
+        messagebox.showinfo("游戏结束！", f"{winner} 赢了！ 略略略~ (这次{self.llm_api_type}也没赢过你！ 哼！)")
         self.game_over = True
 
-root = tk.Tk()
-# 设置三列布局的权重，保证棋盘区域自适应
-root.columnconfigure(0, weight=0)
-root.columnconfigure(1, weight=1)
-root.columnconfigure(2, weight=0)
-gomoku = Gomoku(root)
-root.mainloop()
+def main():
+    root = tk.Tk()
+    # 设置三列布局的权重，保证棋盘区域自适应
+    root.columnconfigure(0, weight=0)
+    root.columnconfigure(1, weight=1)
+    root.columnconfigure(2, weight=0)
+    gomoku = Gomoku(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
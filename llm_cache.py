@@ -0,0 +1,212 @@
+# llm_cache.py
+# LLM 回复缓存：同一个模型、同一方、同一个局面（Zobrist 哈希）、同一份 Prompt 只问一次，
+# 回复的每个流式片段都存进本地 SQLite，下次遇到直接原样“回放”，基准测试重跑几乎不花时间和额度！(ง •̀_•́)ง
+# 条目有过期时间（TTL），超过条数或总字节数上限时按最久没用到的顺序淘汰。
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from llm_interface import LLMInterface
+
+DEFAULT_CACHE_PATH = "llm_cache.sqlite3"
+
+
+class LLMResponseCache:
+    """SQLite 存储的回复缓存，多个线程共用一个连接，靠锁串行化"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_entries=5000, max_bytes=64 << 20):
+        self.path = path
+        self.ttl = ttl                  # 条目存活秒数，0 或 None 表示永不过期
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes      # 所有回复文本的总字节数上限
+        self.lock = threading.Lock()
+        self.conn = None  # 第一次用到才打开数据库
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, provider TEXT, model TEXT, color TEXT, board_hash TEXT,"
+                " chunks TEXT, size INTEGER, created REAL, last_used REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        return self.conn
+
+    @staticmethod
+    def make_key(provider, model, color, board_hash, prompt):
+        """缓存键：提供方、模型、执棋颜色、局面哈希，再加 Prompt 摘要（开没开提示、附近空位都会改变 Prompt）"""
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:16]
+        return f"{provider}|{model}|{color}|{board_hash:x}|{digest}"
+
+    def get(self, key):
+        """命中返回流式片段列表，没命中或已过期返回 None"""
+        now = time.time()
+        with self.lock:
+            db = self._db()
+            row = db.execute("SELECT chunks, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, provider, model, color, board_hash, chunks):
+        data = json.dumps(chunks, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, color, f"{board_hash:x}", data, len(data.encode("utf-8")), now, now),
+            )
+            self._evict(db, now)
+            db.commit()
+
+    def discard(self, key):
+        with self.lock:
+            db = self._db()
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            db.commit()
+
+    def _evict(self, db, now):
+        if self.ttl:
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 从最久没用到的开始删，直到条数和字节数都回到上限以内
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def __len__(self):
+        with self.lock:
+            return self._db().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats_text(self):
+        return (f"LLM 回复缓存：{len(self)} 条，命中 {self.hits} 次，未命中 {self.misses} 次，"
+                f"命中率 {self.hit_rate():.0%}")
+
+
+class CachedLLM(LLMInterface):
+    """给任意 LLMInterface 套一层回复缓存，对外接口不变
+
+    只有解析出合法坐标的回复才会写入缓存；回放出来的回复如果不合法（比如局面哈希碰撞），
+    会把这条缓存删掉，重试时重新请求 API。
+    """
+
+    def __init__(self, llm, cache, provider):
+        self.llm = llm
+        self.cache = cache
+        self.provider = provider
+        self.model_name = getattr(llm, "model_name", llm.__class__.__name__)
+        self.final_answer_marker = getattr(llm, "final_answer_marker", None)
+        self.gomoku_game = llm.gomoku_game
+        self.ai_color = None
+        self.pending = None  # (缓存键, 片段列表, 是否来自缓存)，parse_response 时决定存还是删
+
+    @property
+    def board_encoding(self):
+        return self.llm.board_encoding
+
+    @property
+    def session(self):
+        return self.llm.session
+
+    def create_prompt(self, board_state, ai_color):
+        self.ai_color = ai_color
+        return self.llm.create_prompt(board_state, ai_color)
+
+    def _key(self, prompt):
+        return self.cache.make_key(self.provider, self.model_name, self.ai_color, self.gomoku_game.position.hash, prompt)
+
+    def get_llm_response_stream(self, prompt):
+        key = self._key(prompt)
+        chunks = self.cache.get(key)
+        if chunks is not None:
+            self.pending = (key, chunks, True)
+            yield from chunks
+            return
+        chunks = []
+        self.pending = None
+        stream = self.llm.get_llm_response_stream(prompt)
+        try:
+            for chunk in stream:
+                if chunk:
+                    chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # 拿到最终坐标后提前关流：已收到的部分就够解析出这步棋，照样可以缓存
+            self.pending = (key, chunks, False)
+            raise
+        finally:
+            stream.close()
+        # 半路出错的回复走不到这里，不会被缓存
+        self.pending = (key, chunks, False)
+
+    async def get_llm_response_astream(self, prompt, executor=None):
+        """异步版，存取规则同上；没命中时走被包装模型自己的异步流，期限到了取消时它能马上断开连接"""
+        key = self._key(prompt)
+        chunks = self.cache.get(key)
+        if chunks is not None:
+            self.pending = (key, chunks, True)
+            for chunk in chunks:
+                yield chunk
+            return
+        chunks = []
+        self.pending = None
+        stream = self.llm.get_llm_response_astream(prompt, executor)
+        try:
+            async for chunk in stream:
+                if chunk:
+                    chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            self.pending = (key, chunks, False)
+            raise
+        finally:
+            await stream.aclose()
+        self.pending = (key, chunks, False)
+
+    def peek_move(self, response_text):
+        """只解析不动缓存：流还没收完时（StreamMoveParser）用这个，存还是删留给收完后的 parse_response"""
+        return self.llm.parse_response(response_text)
+
+    def parse_response(self, response_text):
+        move = self.llm.parse_response(response_text)
+        if self.pending is not None:
+            key, chunks, from_cache = self.pending
+            self.pending = None
+            legal = move is not None and self.gomoku_game.is_legal(*move)
+            if from_cache and not legal:
+                self.cache.discard(key)
+            elif not from_cache and legal:
+                self.cache.put(key, self.provider, self.model_name, self.ai_color,
+                               self.gomoku_game.position.hash, chunks)
+        return move
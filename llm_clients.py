@@ -0,0 +1,130 @@
+# llm_clients.py
+# 共享的 API 客户端：第一次真正发请求时才创建，同一个 base_url + key 只建一个 OpenAI 客户端，
+# 底下是一个带连接池、keep-alive（装了 h2 就用 HTTP/2）的 httpx.Client，黑白两边和后面的每一盘都复用热连接！(ง •̀_•́)ง
+# 异步驱动用同样配置的 AsyncOpenAI（底下是 httpx.AsyncClient），期限到了取消任务时连接立刻关掉。
+# Gemini 的 genai.configure 是全局的，同一个 key 只配置一次，GenerativeModel 也按模型名共享。
+# config.ini 里 key 留空也能正常启动，只有真的选了这个模型去请求时才报错。
+import asyncio
+import importlib.util
+import threading
+
+_lock = threading.Lock()
+_http_clients = {}   # base_url -> httpx.Client
+_openai_clients = {}  # (base_url, api_key) -> OpenAI
+_async_openai_clients = {}  # (事件循环, base_url, api_key) -> AsyncOpenAI
+_gemini_models = {}  # (api_key, api_endpoint, 模型名) -> GenerativeModel
+_gemini_key = None
+
+
+class MissingAPIKeyError(RuntimeError):
+    """config.ini 里没填这个模型的 api_key"""
+
+
+def _api_key(config, section):
+    api_key = config.get(section, 'api_key', fallback="").strip()
+    if not api_key:
+        raise MissingAPIKeyError(f"config.ini 里 [{section}] 的 api_key 还是空的，先填上再选这个模型吧！(；′⌒`)")
+    return api_key
+
+
+def _http_options(config):
+    """httpx 客户端的参数：池大小和超时从 config.ini 的 [http] 读，装了 h2 就开 HTTP/2"""
+    import httpx
+
+    pool_size = config.getint('http', 'pool_size', fallback=10)
+    return dict(
+        http2=config.getboolean('http', 'http2', fallback=True) and importlib.util.find_spec("h2") is not None,
+        timeout=httpx.Timeout(
+            config.getfloat('http', 'read_timeout', fallback=120.0),
+            connect=config.getfloat('http', 'connect_timeout', fallback=10.0),
+        ),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+
+
+def _http_client(config, base_url):
+    """每个 base_url 一个带连接池的 httpx.Client"""
+    import httpx
+
+    client = _http_clients.get(base_url)
+    if client is None:
+        client = httpx.Client(**_http_options(config))
+        _http_clients[base_url] = client
+    return client
+
+
+def openai_client(config, section, base_url):
+    """OpenAI 兼容接口的共享客户端，section 是 config.ini 里存 api_key 的小节"""
+    api_key = _api_key(config, section)
+    with _lock:
+        client = _openai_clients.get((base_url, api_key))
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=_http_client(config, base_url),
+                            max_retries=config.getint('http', 'max_retries', fallback=2))
+            _openai_clients[(base_url, api_key)] = client
+    return client
+
+
+def async_openai_client(config, section, base_url):
+    """OpenAI 兼容接口的异步客户端，异步驱动里用：期限到了取消任务时，正在等的读操作马上被取消、连接跟着关掉，
+    不会像线程里的同步流那样一直占着线程和连接，等到 read_timeout 才放手
+
+    httpx.AsyncClient 只能在创建它的事件循环里用，所以按事件循环分别缓存，必须在事件循环里调用。
+    """
+    api_key = _api_key(config, section)
+    key = (asyncio.get_running_loop(), base_url, api_key)
+    with _lock:
+        client = _async_openai_clients.get(key)
+        if client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=httpx.AsyncClient(**_http_options(config)),
+                                 max_retries=config.getint('http', 'max_retries', fallback=2))
+            _async_openai_clients[key] = client
+    return client
+
+
+async def close_async_clients():
+    """关闭当前事件循环里建的异步客户端（异步驱动停下前调用）"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        keys = [key for key in _async_openai_clients if key[0] is loop]
+        clients = [_async_openai_clients.pop(key) for key in keys]
+    for client in clients:
+        await client.close()
+
+
+def gemini_model(config, model_name, section='Gemini'):
+    """共享的 Gemini GenerativeModel，genai.configure 只在 key（或 api_endpoint）变化时调用
+
+    小节里写了 api_endpoint（例如本地的 mock_llm_server.py）时改走 REST，请求发到那个地址。
+    """
+    global _gemini_key
+    api_key = _api_key(config, section)
+    endpoint = config.get(section, 'api_endpoint', fallback="").strip()
+    with _lock:
+        model = _gemini_models.get((api_key, endpoint, model_name))
+        if model is None:
+            import google.generativeai as genai
+
+            if _gemini_key != (api_key, endpoint):
+                if endpoint:
+                    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+                else:
+                    genai.configure(api_key=api_key)
+                _gemini_key = (api_key, endpoint)
+            model = genai.GenerativeModel(model_name)
+            _gemini_models[(api_key, endpoint, model_name)] = model
+    return model
+
+
+def close_all():
+    """关闭所有连接池（程序退出时调用）"""
+    with _lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _openai_clients.clear()
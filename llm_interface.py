@@ -1,8 +1,16 @@
 # llm_interface.py
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 
+_STREAM_END = object()
+
+
 class LLMInterface(ABC):
+    board_encoding = None  # 发给它的局面编码（见 board_encoding.py），None 为原来的汉字棋盘
+    session = None  # PromptSession（见 prompt_session.py），开启后每步只发增量，规则放进固定的系统前缀
+
     @abstractmethod
     def create_prompt(self, board_state):
         """创建发送给 LLM 的 Prompt"""
@@ -18,3 +26,53 @@ class LLMInterface(ABC):
         """解析 LLM 的回复，提取坐标"""
         pass
 
+    def prompt_rules(self):
+        """Prompt 开头每步都不变的规则说明"""
+        return ""
+
+    def prompt_instructions(self):
+        """Prompt 结尾每步都不变的作答要求"""
+        return ""
+
+    def create_system_prompt(self):
+        """会话模式下的系统前缀：规则说明 + 作答要求，每步一字不差，服务端的 Prompt 缓存才能命中"""
+        return self.prompt_rules() + self.prompt_instructions()
+
+    def chat_messages(self, prompt):
+        """发给 OpenAI 兼容接口的消息列表，开了会话时带上系统前缀和历史"""
+        if self.session is not None and self.session.active:
+            return self.session.messages(self.create_system_prompt(), prompt)
+        return [{"role": "user", "content": prompt}]
+
+    async def get_llm_response_astream(self, prompt, executor=None):
+        """异步版的流式回复：默认在线程池里逐段推进同步的 get_llm_response_stream
+
+        有原生异步 SDK 的模型应该重写这个方法（QwQ / DeepSeek 用 AsyncOpenAI，Gemini 用 gRPC 异步接口）：
+        这里被取消时，线程里正卡在读网络的 next() 打断不了，底层的流要等它返回后才关，卡住的连接会一直占到 read_timeout。
+        """
+        executor = executor or _default_executor()
+        stream = self.get_llm_response_stream(prompt)
+        pending = None
+        try:
+            while True:
+                pending = executor.submit(next, stream, _STREAM_END)
+                chunk = await asyncio.wrap_future(pending)
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+        finally:
+            if pending is not None and not pending.done():
+                # 线程里的 next() 还没返回，这时 close 会报“生成器正在运行”，等它返回后再关
+                pending.add_done_callback(lambda _: stream.close())
+            else:
+                stream.close()
+
+
+_executor = None
+
+
+def _default_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-stream")
+    return _executor
@@ -0,0 +1,158 @@
+# log_sink.py
+# 批量、后台写日志：以前每收到一个流式片段就 write() + flush() 一次，一个 token 一次系统调用，
+# 长时间的 AIvsAI 全卡在刷日志上！(╯▔皿▔)╯
+# 现在 log() 只把一条结构化记录放进有界队列就返回，后台线程攒够一定字节数或时间就一次写出去（JSONL，每行一条），
+# 文件太大时按序号轮转并用 gzip 压缩旧文件。关闭窗口时 close() 会把队列里剩下的都写完。(ง •̀_•́)ง
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+DEFAULT_LOG_PATH = "llm_output.jsonl"
+_STOP = object()
+
+
+class LogSink:
+    """后台批量写 JSONL 的日志：队列满了就丢弃并计数，绝不阻塞调用方（流式线程或 Tk 主线程）
+
+    batch_bytes / flush_interval：攒够这么多字节或等了这么久就写一次；
+    rotate_bytes 为 0 时不轮转，否则超过后改名为 path.1(.gz)，最多保留 keep 个旧文件。
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH, max_queue=10000, batch_bytes=64 << 10, flush_interval=0.5,
+                 rotate_bytes=0, keep=5, compress=True):
+        self.path = path
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.keep = keep
+        self.compress = compress
+        self.dropped = 0
+        self.written = 0
+        self.writes = 0  # 实际 write() 的次数
+        self.file = None
+        self.thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self.thread.start()
+
+    def log(self, **record):
+        """放一条记录进队列（自动加上时间戳），马上返回"""
+        record.setdefault("ts", round(time.time(), 3))
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=2.0):
+        """等队列里已有的记录都写进文件再返回（比如要从日志里读回某一手的时候）"""
+        if not self.thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """写完队列里剩下的记录再关文件（窗口关闭时调用）"""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+
+    def stats_text(self):
+        text = f"日志：写出 {self.written} 条记录，共 {self.writes} 次写入"
+        if self.dropped:
+            text += f"，队列满丢弃 {self.dropped} 条"
+        return text
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        lines = []
+        size = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                self._write(lines)
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                return
+            if isinstance(record, threading.Event):
+                self._write(lines)
+                lines = []
+                size = 0
+                record.set()
+                continue
+            if record is not None:
+                line = json.dumps(record, ensure_ascii=False) + "\n"
+                lines.append(line)
+                size += len(line)
+            if size >= self.batch_bytes or time.monotonic() >= deadline:
+                self._write(lines)
+                lines = []
+                size = 0
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, lines):
+        if not lines:
+            return
+        try:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write("".join(lines))
+            self.file.flush()
+            self.written += len(lines)
+            self.writes += 1
+            if self.rotate_bytes and self.file.tell() >= self.rotate_bytes:
+                self._rotate()
+        except OSError as e:
+            print("写日志时出错:", e)
+
+    def _rotate(self):
+        """path -> path.1(.gz)，旧的依次往后挪，超过 keep 个的删掉"""
+        self.file.close()
+        self.file = None
+        suffix = ".gz" if self.compress else ""
+        oldest = f"{self.path}.{self.keep}{suffix}"
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.keep - 1, 0, -1):
+            source = f"{self.path}.{index}{suffix}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}{suffix}")
+        if self.compress:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, f"{self.path}.1")
+
+
+def read_log(path=DEFAULT_LOG_PATH):
+    """按顺序读出一个日志文件（.gz 也行）里的全部记录"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def log_files(path=DEFAULT_LOG_PATH):
+    """当前日志和轮转出来的旧日志，从旧到新"""
+    rotated = [name for name in glob.glob(glob.escape(path) + ".*") if name[len(path) + 1:].split(".")[0].isdigit()]
+    rotated.sort(key=lambda name: int(name[len(path) + 1:].split(".")[0]), reverse=True)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def move_text(path, game, move, color):
+    """从日志里拼出某盘某一手某一方的完整输出（窗口里折叠掉的内容靠它展开）"""
+    parts = []
+    for name in log_files(path):
+        parts += [record["text"] for record in read_log(name)
+                  if record.get("game") == game and record.get("move") == move and record.get("color") == color]
+    return "".join(parts)
@@ -0,0 +1,270 @@
+# mcts.py
+# 蒙特卡洛树搜索：UCT 选点 + 渐进加宽，叶子节点攒成一批后用 NumPy 一起随机下完（批量 rollout），
+# rollout 只在已有棋子周围一格内落子。树在两步之间可以复用，固定种子就能复现基准结果！(ง •̀_•́)ง
+import math
+import random
+import time
+
+import numpy as np
+
+from bitboard import BitBoard, DIRECTIONS
+from engine import SearchResult
+from patterns import CLASS_SCORES, cell_threats
+
+
+def _priority(board, x, y, color):
+    """子节点展开顺序：进攻棋型 + 防守棋型"""
+    attack = sum(CLASS_SCORES[c] for c in cell_threats(board, x, y, color))
+    defend = sum(CLASS_SCORES[c] for c in cell_threats(board, x, y, 3 - color))
+    return attack + defend
+
+
+class MCTSNode:
+    __slots__ = ("move", "color", "parent", "children", "untried", "visits", "wins", "winner")
+
+    def __init__(self, move, color, parent):
+        self.move = move        # 走到这个节点的那一步 (x, y)，根节点为 None
+        self.color = color      # 走这一步的一方
+        self.parent = parent
+        self.children = []
+        self.untried = None     # 还没展开的走法，按优先级从高到低
+        self.visits = 0
+        self.wins = 0.0         # 站在 self.color 一方累计的得分（赢 1、平 0.5）
+        self.winner = None      # 这一步直接连五/下满时的结果（终局节点）
+
+
+def _dilate(occupied, radius):
+    """(B, S, S) 布尔数组向四周扩张 radius 格"""
+    n, size, _ = occupied.shape
+    padded = np.zeros((n, size + 2 * radius, size + 2 * radius), dtype=bool)
+    padded[:, radius:radius + size, radius:radius + size] = occupied
+    result = np.zeros_like(occupied)
+    for dx in range(2 * radius + 1):
+        for dy in range(2 * radius + 1):
+            result |= padded[:, dx:dx + size, dy:dy + size]
+    return result
+
+
+def _wins_at(boards, rows, cols, colors):
+    """每个棋盘刚在 (rows[i], cols[i]) 落下 colors[i] 之后是否连五"""
+    n, size, _ = boards.shape
+    batch = np.arange(n)
+    won = np.zeros(n, dtype=bool)
+    for dx, dy in DIRECTIONS:
+        count = np.ones(n, dtype=np.int8)
+        for sign in (1, -1):
+            alive = np.ones(n, dtype=bool)
+            for k in range(1, 5):
+                rr = rows + sign * k * dx
+                cc = cols + sign * k * dy
+                inside = (rr >= 0) & (rr < size) & (cc >= 0) & (cc < size)
+                same = inside & (boards[batch, rr.clip(0, size - 1), cc.clip(0, size - 1)] == colors)
+                alive &= same
+                count += alive
+        won |= count >= 5
+    return won
+
+
+def batch_rollouts(boards, to_move, rng, max_moves=60, radius=1):
+    """把一批局面同时随机下完：boards 形状 (B, S, S)，to_move 形状 (B,)，原地修改，返回每盘赢家（0 平局）"""
+    n, size, _ = boards.shape
+    winners = np.zeros(n, dtype=np.int8)
+    active = np.ones(n, dtype=bool)
+    to_move = to_move.astype(np.int8).copy()
+    for _ in range(max_moves):
+        idx = np.nonzero(active)[0]
+        if len(idx) == 0:
+            break
+        sub = boards[idx]
+        occupied = sub != 0
+        candidates = _dilate(occupied, radius) & ~occupied
+        flat = candidates.reshape(len(idx), -1)
+        has_move = flat.any(axis=1)
+        noise = rng.random(flat.shape)
+        noise[~flat] = -1.0
+        choice = noise.argmax(axis=1)
+        rows, cols = np.divmod(choice, size)
+        colors = to_move[idx]
+        playing = idx[has_move]
+        boards[playing, rows[has_move], cols[has_move]] = colors[has_move]
+        won = np.zeros(len(idx), dtype=bool)
+        won[has_move] = _wins_at(boards[playing], rows[has_move], cols[has_move], colors[has_move])
+        winners[idx[won]] = colors[won]
+        active[idx[won | ~has_move]] = False
+        to_move[idx] = 3 - colors
+    return winners
+
+
+class MCTSEngine:
+    """批量 rollout 的 MCTS，search() 接口与 SearchEngine 一致（nodes 为 playout 数，score 为胜率）"""
+
+    def __init__(self, time_limit=1.0, max_playouts=None, batch_size=64, exploration=1.2,
+                 widening_c=2.0, widening_alpha=0.5, rollout_moves=60, seed=None):
+        self.time_limit = time_limit      # 每步时间预算（秒）
+        self.max_playouts = max_playouts  # 每步 playout 预算，给了就优先按数量停
+        self.batch_size = batch_size
+        self.exploration = exploration
+        self.widening_c = widening_c      # 渐进加宽：最多展开 c * N^alpha 个子节点
+        self.widening_alpha = widening_alpha
+        self.rollout_moves = rollout_moves
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.tie_rng = random.Random(seed)
+        self.root = None
+        self.root_history = ()
+        self.playouts = 0
+        self.last_result = None
+
+    # ---------- 树复用 ----------
+
+    def _reuse_root(self, position, color):
+        history = tuple(position.history)
+        root = self.root
+        if root is not None and history[:len(self.root_history)] == self.root_history:
+            for x, y, _ in history[len(self.root_history):]:
+                root = next((child for child in root.children if child.move == (x, y)), None)
+                if root is None:
+                    break
+        else:
+            root = None
+        if root is None:
+            root = MCTSNode(history[-1][:2] if history else None, 3 - color, None)
+        root.parent = None
+        self.root = root
+        self.root_history = history
+        return root
+
+    # ---------- 选点和展开 ----------
+
+    def _widening_limit(self, node):
+        return max(1, int(self.widening_c * (node.visits + 1) ** self.widening_alpha))
+
+    def _ucb_child(self, node):
+        log_n = math.log(node.visits + 1)
+        best, best_value = None, -1.0
+        for child in node.children:
+            if child.visits == 0:
+                value = float("inf")
+            else:
+                value = child.wins / child.visits + self.exploration * math.sqrt(log_n / child.visits)
+            if value > best_value or (value == best_value and self.tie_rng.random() < 0.5):
+                best, best_value = child, value
+        return best
+
+    def _expand(self, node, board):
+        color = 3 - node.color
+        if node.untried is None:
+            cells = board.candidates() or [(board.size // 2, board.size // 2)]
+            cells.sort(key=lambda cell: -_priority(board, cell[0], cell[1], color))
+            node.untried = cells
+        x, y = node.untried.pop(0)
+        child = MCTSNode((x, y), color, node)
+        board.make(x, y, color)
+        if board.check_win(x, y, color):
+            child.winner = color
+        elif board.is_full():
+            child.winner = 0
+        node.children.append(child)
+        return child
+
+    def _select(self, root, board):
+        """从根走到一个叶子，沿途落子并加虚拟损失，返回叶子节点"""
+        node = root
+        node.visits += 1
+        while node.winner is None:
+            can_widen = node.untried is None or (node.untried and len(node.children) < self._widening_limit(node))
+            if can_widen:
+                node = self._expand(node, board)
+                node.visits += 1
+                break
+            if not node.children:
+                break
+            node = self._ucb_child(node)
+            board.make(node.move[0], node.move[1], node.color)
+            node.visits += 1
+        return node
+
+    def _backpropagate(self, node, winner):
+        while node is not None:
+            if winner == 0:
+                node.wins += 0.5
+            elif winner == node.color:
+                node.wins += 1.0
+            node = node.parent
+
+    # ---------- 搜索 ----------
+
+    def search(self, position, color, time_limit=None, max_playouts=None):
+        if time_limit is None:
+            time_limit = self.time_limit
+        if max_playouts is None:
+            max_playouts = self.max_playouts
+        start = time.perf_counter()
+        deadline = start + time_limit
+
+        if position.move_count() == 0:
+            center = position.size // 2
+            result = SearchResult((center, center), 0.5, 0, 0, 0.0, 0.0)
+            self.last_result = result
+            return result
+
+        root = self._reuse_root(position, color)
+        root_array = np.asarray(position.to_list(), dtype=np.int8)
+        playouts = 0
+        max_depth = 0
+        while True:
+            if max_playouts is not None and playouts >= max_playouts:
+                break
+            if max_playouts is None and time.perf_counter() > deadline:
+                break
+            leaves = []
+            boards = []
+            to_move = []
+            batch = self.batch_size if max_playouts is None else min(self.batch_size, max_playouts - playouts)
+            for _ in range(batch):
+                board = position.copy()
+                leaf = self._select(root, board)
+                depth = board.move_count() - position.move_count()
+                max_depth = max(max_depth, depth)
+                if leaf.winner is not None:
+                    self._backpropagate(leaf, leaf.winner)
+                    continue
+                array = root_array.copy()
+                for x, y, c in board.history[position.move_count():]:
+                    array[x, y] = c
+                leaves.append(leaf)
+                boards.append(array)
+                to_move.append(3 - leaf.color)
+            playouts += batch
+            if leaves:
+                winners = batch_rollouts(np.stack(boards), np.asarray(to_move), self.rng, self.rollout_moves)
+                for leaf, winner in zip(leaves, winners):
+                    self._backpropagate(leaf, int(winner))
+
+        if not root.children:
+            board = position.copy()
+            self._expand(root, board)
+        best = max(root.children, key=lambda child: child.visits)
+        elapsed = time.perf_counter() - start
+        self.playouts = playouts
+        win_rate = best.wins / best.visits if best.visits else 0.5
+        result = SearchResult(best.move, win_rate, max_depth, playouts, elapsed,
+                              playouts / elapsed if elapsed > 0 else 0.0)
+        self.last_result = result
+        return result
+
+    def best_move(self, game, time_limit=None):
+        return self.search(game.position, game.player, time_limit).move
+
+
+if __name__ == "__main__":
+    # 固定种子、固定 playout 数的基准测试
+    board = BitBoard()
+    color = 1
+    for x, y in [(7, 7), (7, 8), (8, 8), (6, 6), (8, 7), (9, 9), (6, 8), (8, 6)]:
+        board.make(x, y, color)
+        color = 3 - color
+    engine = MCTSEngine(seed=0)
+    result = engine.search(board, color, max_playouts=2000)
+    print(f"MCTS 落子 {result.move}，胜率 {result.score:.2f}，{result.nodes} 次 playout，"
+          f"{result.nps:.0f} playout/秒，树深 {result.depth}")
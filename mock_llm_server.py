@@ -0,0 +1,425 @@
+# mock_llm_server.py
+# 本地的假 LLM 服务：说 OpenAI 兼容的流式 chat.completions（带 reasoning_content 增量，DeepSeekLLM / QWQ 用的那种），
+# 也有一个 Gemini 风格的 streamGenerateContent 替身。不花额度、延迟可控，整条走棋流水线和锦标赛都能离线测！(ง •̀_•́)ง
+# 首 token 延迟、吐字速度、思考长度、出错率、非法坐标率都在 config.ini 的 [mock_server] 里配，也可以回放录好的对话。
+#
+#   python mock_llm_server.py            启动服务（默认 http://127.0.0.1:8765）
+#   python mock_llm_server.py bench 8    起服务，8 盘 Mock 对 Mock 同时跑，报告流水线吞吐
+#
+# 接到游戏里：在 config.ini 加 [provider:Mock]（type = openai，base_url = http://127.0.0.1:8765/v1/，api_key_section = mock_server），
+# Gemini 则在 [Gemini] 里写 api_endpoint = http://127.0.0.1:8765（走 REST）。
+import configparser
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bitboard import BitBoard, BLACK, WHITE
+from engine import ATTACK_WEIGHT, DEFEND_WEIGHT
+from patterns import CLASS_SCORES, cell_threats
+from prompt_session import PrefixCache
+
+COLOR_CHARS = {"黑": BLACK, "白": WHITE, "X": BLACK, "O": WHITE}
+# 把文本切成“token”：坐标整体算一个，其余每个汉字、每段字母数字、每个符号各算一个
+_TOKEN_PATTERN = re.compile(r"[\[(]\d+,\s*\d+[\])]|[A-Za-z0-9]+|\s+|.")
+_COORD = re.compile(r"\((\d+),\s*(\d+)\)")
+
+
+def split_tokens(text):
+    return _TOKEN_PATTERN.findall(text)
+
+
+# ---------- 从 Prompt 里还原局面（各种局面编码和会话增量都认） ----------
+
+def read_position(texts, answers=(), size=15):
+    """texts 是所有用户 / 系统消息，answers 是历史里模型自己给出的坐标文本；返回 ({(x, y): 颜色}, 轮到谁)"""
+    stones = {}
+    ai_color = None
+    for text in texts:
+        for line in text.splitlines():
+            line = line.rstrip()
+            m = re.match(r"【([黑白])棋位置】", line) or re.match(r"([黑白])：", line)
+            if m:
+                for x, y in _COORD.findall(line):
+                    stones[(int(x), int(y))] = COLOR_CHARS[m.group(1)]
+                continue
+            if line.startswith("新落子："):
+                for color, x, y in re.findall(r"([黑白]) \((\d+),(\d+)\)", line):
+                    stones[(int(x), int(y))] = COLOR_CHARS[color]
+                continue
+            m = re.match(rf"\s*(\d+) ([.XO]{{{size}}})$", line)  # compact
+            if m:
+                for y, ch in enumerate(m.group(2)):
+                    if ch != ".":
+                        stones[(int(m.group(1)), y)] = COLOR_CHARS[ch]
+                continue
+            m = re.match(r"(\d+): ([\d.XO]+)$", line)  # rle
+            if m:
+                y = 0
+                for count, ch in re.findall(r"(\d*)([.XO])", m.group(2)):
+                    for _ in range(int(count or 1)):
+                        if ch != ".":
+                            stones[(int(m.group(1)), y)] = COLOR_CHARS[ch]
+                        y += 1
+                continue
+            m = re.match(r"(\d{1,2})\s+([空黑白](?: [空黑白]){%d})" % (size - 1), line)  # 汉字棋盘
+            if m:
+                for y, ch in enumerate(m.group(2).split(" ")):
+                    if ch != "空":
+                        stones[(int(m.group(1)), y)] = COLOR_CHARS[ch]
+                continue
+        m = re.findall(r"轮到你执([黑白])|你现在是([黑白])棋AI", text)
+        if m:
+            ai_color = COLOR_CHARS[m[-1][0] or m[-1][1]]
+    if ai_color is not None:
+        for answer in answers:
+            for x, y in re.findall(r"\[(\d+),\s*(\d+)\]", answer):
+                stones.setdefault((int(x), int(y)), ai_color)
+    if ai_color is None:
+        blacks = sum(1 for color in stones.values() if color == BLACK)
+        ai_color = BLACK if blacks == len(stones) - blacks else WHITE
+    return stones, ai_color
+
+
+def build_board(stones, size=15):
+    board = BitBoard(size)
+    for (x, y), c in stones.items():
+        if board.in_bounds(x, y) and board.is_empty(x, y):
+            board.make(x, y, c)
+    return board
+
+
+def choose_move(stones, color, rng, size=15):
+    """一步贪心：按引擎走法排序的进攻 / 防守分挑最好的空位，同分随机，空棋盘下天元"""
+    board = build_board(stones, size)
+    candidates = board.candidates()
+    if not candidates:
+        return size // 2, size // 2
+
+    def score(cell):
+        attack = sum(CLASS_SCORES[c] for c in cell_threats(board, cell[0], cell[1], color))
+        defend = sum(CLASS_SCORES[c] for c in cell_threats(board, cell[0], cell[1], 3 - color))
+        return ATTACK_WEIGHT * attack + DEFEND_WEIGHT * defend, rng.random()
+
+    return max(candidates, key=score)
+
+
+# ---------- 回复内容和节奏 ----------
+
+class MockBehavior:
+    """假服务的行为：多久吐第一个 token、每秒几个 token、思考多长、多大概率报错 / 给非法坐标、回放哪些录音"""
+
+    def __init__(self, ttft=0.5, tokens_per_sec=50.0, reasoning_tokens=200, error_rate=0.0, illegal_rate=0.0,
+                 replay=None, prefix_cache=False, seed=None):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.reasoning_tokens = reasoning_tokens
+        self.error_rate = error_rate
+        self.illegal_rate = illegal_rate
+        self.replay = load_transcripts(replay) if replay else []
+        self.prefix_cache = PrefixCache(base=ttft) if prefix_cache else None  # 按 Prompt 前缀命中情况模拟首 token 延迟
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.replay_index = 0
+        self.stats = {"requests": 0, "errors": 0, "illegal": 0, "tokens": 0}
+
+    @classmethod
+    def from_config(cls, config, section="mock_server"):
+        return cls(
+            ttft=config.getfloat(section, 'ttft', fallback=0.5),
+            tokens_per_sec=config.getfloat(section, 'tokens_per_sec', fallback=50.0),
+            reasoning_tokens=config.getint(section, 'reasoning_tokens', fallback=200),
+            error_rate=config.getfloat(section, 'error_rate', fallback=0.0),
+            illegal_rate=config.getfloat(section, 'illegal_rate', fallback=0.0),
+            replay=config.get(section, 'replay', fallback="") or None,
+            prefix_cache=config.getboolean(section, 'prefix_cache', fallback=False),
+            seed=config.getint(section, 'seed', fallback=None),
+        )
+
+    def first_token_delay(self, prompt_text):
+        if self.prefix_cache is None:
+            return self.ttft
+        with self.lock:
+            return self.prefix_cache.request(prompt_text)[0]
+
+    def should_fail(self):
+        with self.lock:
+            self.stats["requests"] += 1
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+            return failed
+
+    def reply(self, texts, answers):
+        """返回 (思考过程, 最终回答)；有录音时按顺序循环回放"""
+        with self.lock:
+            if self.replay:
+                record = self.replay[self.replay_index % len(self.replay)]
+                self.replay_index += 1
+                return record.get("reasoning", ""), record.get("content", "")
+            rng = random.Random(self.rng.random())
+            illegal = rng.random() < self.illegal_rate
+            if illegal:
+                self.stats["illegal"] += 1
+        stones, color = read_position(texts, answers)
+        move = choose_move(stones, color, rng)
+        if illegal:
+            move = rng.choice(sorted(stones)) if stones else (15, 15)
+        nearby = [cell for cell in build_board(stones).candidates() if cell != move] or [move]
+        reasoning = []
+        count = 0
+        while count < self.reasoning_tokens:
+            x, y = rng.choice(nearby)
+            phrase = f"考虑 ({x},{y})，这里能不能成型、会不会被对手利用？"
+            reasoning.append(phrase)
+            count += len(split_tokens(phrase))
+        reasoning.append(f"综合比较，({move[0]},{move[1]}) 最好。")
+        return "".join(reasoning), f"我选择落在 [{move[0]},{move[1]}]。"
+
+    def pace(self, tokens):
+        """按设定的速度逐个交出 token"""
+        delay = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+        for token in tokens:
+            if delay:
+                time.sleep(delay)
+            with self.lock:
+                self.stats["tokens"] += 1
+            yield token
+
+    def stats_text(self):
+        s = self.stats
+        return f"假 LLM 服务：{s['requests']} 个请求，报错 {s['errors']} 次，故意给非法坐标 {s['illegal']} 次，共吐出 {s['tokens']} 个 token"
+
+
+def load_transcripts(path):
+    """录音文件是 JSONL，每行 {"reasoning": 思考过程, "content": 最终回答}（只有 "text" 时当作最终回答）"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if "text" in record and "content" not in record:
+                    record["content"] = record["text"]
+                records.append(record)
+    return records
+
+
+# ---------- HTTP 协议 ----------
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # 不刷屏
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        behavior = self.server.behavior
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            handler = self.openai_chat
+        elif ":streamGenerateContent" in self.path or ":generateContent" in self.path:
+            handler = self.gemini_generate
+        else:
+            self.send_json(404, {"error": {"message": f"没有这个接口：{self.path}"}})
+            return
+        if behavior.should_fail():
+            self.send_json(500, {"error": {"message": "mock server error", "type": "server_error", "code": 500}})
+            return
+        handler(body, behavior)
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def send_event(self, payload):
+        data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def openai_chat(self, body, behavior):
+        texts, answers = [], []
+        for message in body.get("messages", []):
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content)
+            (answers if message.get("role") == "assistant" else texts).append(content)
+        reasoning, answer = behavior.reply(texts, answers)
+        delay = behavior.first_token_delay(PrefixCache.serialize(body.get("messages", [])))
+        model = body.get("model", "mock")
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None):
+            return {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        if not body.get("stream"):
+            time.sleep(delay)
+            self.send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer, "reasoning_content": reasoning}}],
+            })
+            return
+        try:
+            self.start_events()
+            time.sleep(delay)
+            self.send_event(chunk({"role": "assistant", "content": None, "reasoning_content": None}))
+            for token in behavior.pace(split_tokens(reasoning)):
+                self.send_event(chunk({"content": None, "reasoning_content": token}))
+            for token in behavior.pace(split_tokens(answer)):
+                self.send_event(chunk({"content": token, "reasoning_content": None}))
+            self.send_event(chunk({}, "stop"))
+            self.send_event("[DONE]")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端提前关流（早停、取消）
+
+    def gemini_generate(self, body, behavior):
+        texts = []
+        answers = []
+        for content in body.get("contents", []):
+            text = "".join(part.get("text", "") for part in content.get("parts", []))
+            (answers if content.get("role") == "model" else texts).append(text)
+        reasoning, answer = behavior.reply(texts, answers)
+        delay = behavior.first_token_delay("".join(texts))
+
+        def chunk(text, finish_reason=None):
+            candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+            if finish_reason:
+                candidate["finishReason"] = finish_reason
+            return {"candidates": [candidate]}
+
+        if ":streamGenerateContent" not in self.path:
+            time.sleep(delay)
+            self.send_json(200, chunk(reasoning + "\n" + answer, "STOP"))
+            return
+        try:
+            self.start_events()
+            time.sleep(delay)
+            # Gemini 没有单独的思考字段，思考过程和最终回答都在 text 里，每几个 token 合成一段
+            tokens = split_tokens(reasoning + "\n" + answer)
+            piece = []
+            for token in behavior.pace(tokens):
+                piece.append(token)
+                if len(piece) >= 8:
+                    self.send_event(chunk("".join(piece)))
+                    piece = []
+            self.send_event(chunk("".join(piece), "STOP"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, behavior, host="127.0.0.1", port=8765):
+        super().__init__((host, port), MockLLMHandler)
+        self.behavior = behavior
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        """OpenAI 兼容接口的 base_url"""
+        return self.url + "/v1/"
+
+
+def start_mock_server(config=None, host=None, port=None):
+    """在后台线程启动假服务并返回它，port=0 时随机选一个空闲端口；用完调用 shutdown()"""
+    if config is None:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+    server = MockLLMServer(
+        MockBehavior.from_config(config),
+        host or config.get('mock_server', 'host', fallback="127.0.0.1"),
+        config.getint('mock_server', 'port', fallback=8765) if port is None else port,
+    )
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+# ---------- 流水线吞吐基准 ----------
+
+def pipeline_benchmark(games=8, config=None):
+    """起一个假服务，用真正的 OpenAI 兼容模型类（QWQ）同时跑 games 盘 Mock 对 Mock，报告吞吐和每步用时"""
+    from async_driver import AsyncMoveDriver, AsyncLLMPlayer, play_game_async
+    from game_core import GomokuGame
+    from providers import PROVIDER_TYPES, load_class
+
+    if config is None:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+    server = start_mock_server(config, port=0)
+    if not config.has_section('mock_server'):
+        config.add_section('mock_server')
+    config.set('mock_server', 'api_key', config.get('mock_server', 'api_key', fallback="") or "mock")
+    white, black = PROVIDER_TYPES["openai"]
+    options = {"model_name": "mock", "base_url": server.base_url, "api_key_section": "mock_server"}
+    driver = AsyncMoveDriver({"Mock": games * 2}).start()
+    latencies = []
+
+    def timed(player):
+        async def move(game):
+            start = time.perf_counter()
+            result = await player(game)
+            latencies.append(time.perf_counter() - start)
+            return result
+        return move
+
+    async def tournament():
+        import asyncio
+
+        matches = []
+        for _ in range(games):
+            game = GomokuGame()
+            matches.append(play_game_async(
+                timed(AsyncLLMPlayer(driver, load_class(black)(config, game, **options), "Mock")),
+                timed(AsyncLLMPlayer(driver, load_class(white)(config, game, **options), "Mock")),
+                game,
+            ))
+        return await asyncio.gather(*matches)
+
+    start = time.perf_counter()
+    try:
+        results = driver.run(tournament())
+    finally:
+        elapsed = time.perf_counter() - start
+        driver.shutdown()
+        server.shutdown()
+    moves = sum(len(game.moves) for game in results)
+    latencies.sort()
+    print(f"{games} 盘共 {moves} 步，用时 {elapsed:.1f} 秒，吞吐 {moves / elapsed:.1f} 步/秒；"
+          f"每步 p50 {latencies[len(latencies) // 2]:.2f} 秒 / 最慢 {latencies[-1]:.2f} 秒")
+    print(server.behavior.stats_text())
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        pipeline_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 8)
+    else:
+        mock = start_mock_server()
+        print(f"假 LLM 服务已启动：OpenAI 兼容接口 {mock.base_url}，Gemini 接口 {mock.url}，Ctrl+C 退出 (ง •̀_•́)ง")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(mock.behavior.stats_text())
+            mock.shutdown()
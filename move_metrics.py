@@ -0,0 +1,217 @@
+# move_metrics.py
+# 每步棋的耗时和 token 统计：以前只有往 black_output.log / white_output.log 里追加的原始文本，
+# 想知道“DeepSeek 首 token 的 p95 是多少”“拼 Prompt 花了多久”根本没法查！(╯▔皿▔)╯
+# 现在每次要棋都带一个 MoveTrace，在各个阶段打点：
+#   开始 -> prompt（Prompt 拼好）-> request（发出请求）-> first_reasoning / first_answer（第一个思考 / 回答片段）
+#   -> stream_end（流结束或提前关闭）-> parsed（解析完坐标）-> applied（落到棋盘上）
+# MetricsRecorder 把每次尝试写成一行 JSONL，同时刷新一个 Prometheus textfile（node_exporter 的 textfile collector 能直接收），
+# python move_metrics.py [metrics.jsonl] 打印按模型、颜色汇总的报告。(ง •̀_•́)ง
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from board_encoding import count_tokens
+
+# 阶段耗时：名字 -> (起点, 终点)
+PHASES = (
+    ("prompt_build", "start", "prompt"),
+    ("ttft_reasoning", "request", "first_reasoning"),
+    ("ttft_answer", "request", "first_answer"),
+    ("stream", "request", "stream_end"),
+    ("parse", "stream_end", "parsed"),
+    ("apply", "parsed", "applied"),
+)
+QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_JSONL_PATH = "metrics.jsonl"
+DEFAULT_PROM_PATH = "metrics.prom"
+
+
+def percentile(samples, q):
+    """最近秩法求百分位数，samples 为空时返回 None"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(len(ordered) * q + 0.999999) - 1))]
+
+
+class MoveTrace:
+    """一次要棋尝试的打点记录，由 MoveRequest 在各阶段调用 mark()，调用方补上 applied 和结果"""
+
+    def __init__(self, provider, color, model, move_number=None, attempt=0):
+        self.provider = provider
+        self.color = color
+        self.model = model
+        self.move_number = move_number
+        self.attempt = attempt  # 这一步第几次尝试（0 为第一次，之后的都是重试）
+        self.wall_time = time.time()
+        self.started = time.perf_counter()
+        self.marks = {"start": 0.0}
+        self.chunks = {"reasoning": 0, "answer": 0}
+        self.tokens = {"prompt": 0, "reasoning": 0, "answer": 0}
+        self.outcome = None  # legal / salvaged / illegal / none / book / timeout / cancelled / error
+        self.recorded = False
+
+    def mark(self, phase):
+        """记下 phase 的时间点，同一阶段只记第一次"""
+        self.marks.setdefault(phase, time.perf_counter() - self.started)
+
+    def durations(self):
+        return {name: self.marks[end] - self.marks[begin] for name, begin, end in PHASES
+                if begin in self.marks and end in self.marks}
+
+    def total(self):
+        return max(self.marks.values())
+
+    def to_record(self):
+        return {
+            "time": round(self.wall_time, 3),
+            "provider": self.provider,
+            "color": self.color,
+            "model": self.model,
+            "move": self.move_number,
+            "attempt": self.attempt,
+            "outcome": self.outcome,
+            "total": round(self.total(), 4),
+            "phases": {name: round(value, 4) for name, value in self.durations().items()},
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+        }
+
+
+class MetricsRecorder:
+    """收集 MoveTrace：每条写一行 JSONL，并重写 Prometheus textfile；最近 window 条样本用来算分位数"""
+
+    def __init__(self, jsonl_path=DEFAULT_JSONL_PATH, prom_path=DEFAULT_PROM_PATH, window=1000):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}  # (provider, color, phase) -> deque 耗时
+        self.phase_sums = {}  # (provider, color, phase) -> [总和, 次数]
+        self.attempts = {}  # (provider, color, outcome) -> 次数
+        self.retries = {}  # (provider, color) -> 次数
+        self.token_totals = {}  # (provider, color, kind) -> token 数
+        self.file = None
+
+    def start(self, provider, color, model, move_number=None, attempt=0):
+        return MoveTrace(provider, color, model, move_number, attempt)
+
+    def record(self, trace):
+        """一次尝试结束（落子、出错、被取消都算），重复调用只记一次"""
+        if trace is None or trace.recorded:
+            return
+        trace.recorded = True
+        record = trace.to_record()
+        key = (trace.provider, trace.color)
+        with self.lock:
+            for phase, value in list(record["phases"].items()) + [("total", record["total"])]:
+                samples = self.samples.setdefault(key + (phase,), deque(maxlen=self.window))
+                samples.append(value)
+                totals = self.phase_sums.setdefault(key + (phase,), [0.0, 0])
+                totals[0] += value
+                totals[1] += 1
+            outcome_key = key + (trace.outcome or "unknown",)
+            self.attempts[outcome_key] = self.attempts.get(outcome_key, 0) + 1
+            if trace.attempt:
+                self.retries[key] = self.retries.get(key, 0) + 1
+            for kind, count in trace.tokens.items():
+                self.token_totals[key + (kind,)] = self.token_totals.get(key + (kind,), 0) + count
+            if self.jsonl_path:
+                if self.file is None:
+                    self.file = open(self.jsonl_path, "a", encoding="utf-8")
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.file.flush()
+            if self.prom_path:
+                self.write_prometheus()
+
+    def prometheus_text(self):
+        def labels(**values):
+            return "{" + ",".join(f'{k}="{v}"' for k, v in values.items()) + "}"
+
+        lines = [
+            "# HELP gomoku_llm_phase_seconds Duration of each phase of an LLM move attempt.",
+            "# TYPE gomoku_llm_phase_seconds summary",
+        ]
+        for (provider, color, phase), samples in sorted(self.samples.items()):
+            for q in QUANTILES:
+                lines.append(f"gomoku_llm_phase_seconds{labels(provider=provider, color=color, phase=phase, quantile=q)} "
+                             f"{percentile(samples, q):.6f}")
+            total, count = self.phase_sums[(provider, color, phase)]
+            lines.append(f"gomoku_llm_phase_seconds_sum{labels(provider=provider, color=color, phase=phase)} {total:.6f}")
+            lines.append(f"gomoku_llm_phase_seconds_count{labels(provider=provider, color=color, phase=phase)} {count}")
+        lines += ["# HELP gomoku_llm_attempts_total LLM move attempts by outcome.",
+                  "# TYPE gomoku_llm_attempts_total counter"]
+        for (provider, color, outcome), count in sorted(self.attempts.items()):
+            lines.append(f"gomoku_llm_attempts_total{labels(provider=provider, color=color, outcome=outcome)} {count}")
+        lines += ["# HELP gomoku_llm_retries_total LLM move attempts that were retries.",
+                  "# TYPE gomoku_llm_retries_total counter"]
+        for (provider, color), count in sorted(self.retries.items()):
+            lines.append(f"gomoku_llm_retries_total{labels(provider=provider, color=color)} {count}")
+        lines += ["# HELP gomoku_llm_tokens_total Prompt, reasoning and answer tokens.",
+                  "# TYPE gomoku_llm_tokens_total counter"]
+        for (provider, color, kind), count in sorted(self.token_totals.items()):
+            lines.append(f"gomoku_llm_tokens_total{labels(provider=provider, color=color, kind=kind)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """先写临时文件再替换，采集器不会读到写了一半的文件"""
+        temp_path = self.prom_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, self.prom_path)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def count_trace_tokens(trace, prompt=None, reasoning=None, answer=None):
+    """收完一步后按分词器（见 board_encoding.count_tokens）补上 token 数"""
+    if prompt is not None:
+        trace.tokens["prompt"] = count_tokens(prompt)
+    if reasoning is not None:
+        trace.tokens["reasoning"] = count_tokens(reasoning)
+    if answer is not None:
+        trace.tokens["answer"] = count_tokens(answer)
+
+
+# ---------- 汇总报告 ----------
+
+def load_records(path=DEFAULT_JSONL_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summary_report(path=DEFAULT_JSONL_PATH, out=sys.stdout):
+    """按 (模型, 颜色) 汇总：尝试次数、重试、结果分布、各阶段 p50 / p95，平均 token 数"""
+    groups = {}
+    for record in load_records(path):
+        groups.setdefault((record["provider"], record["color"]), []).append(record)
+    if not groups:
+        print("还没有记录。", file=out)
+        return
+    for (provider, color), records in sorted(groups.items()):
+        outcomes = {}
+        for record in records:
+            outcomes[record["outcome"]] = outcomes.get(record["outcome"], 0) + 1
+        retries = sum(1 for record in records if record["attempt"])
+        print(f"== {provider} ({color})：{len(records)} 次尝试，重试 {retries} 次，"
+              + "，".join(f"{outcome} {count}" for outcome, count in sorted(outcomes.items(), key=str)), file=out)
+        for phase, _, _ in PHASES + (("total", None, None),):
+            values = [record["total"] if phase == "total" else record["phases"].get(phase) for record in records]
+            values = [value for value in values if value is not None]
+            if values:
+                print(f"   {phase:<15} p50 {percentile(values, 0.5):7.3f} 秒   p95 {percentile(values, 0.95):7.3f} 秒"
+                      f"   （{len(values)} 次）", file=out)
+        for kind in ("prompt", "reasoning", "answer"):
+            average = sum(record["tokens"][kind] for record in records) / len(records)
+            print(f"   平均 {kind} token {average:.0f}", file=out)
+
+
+if __name__ == "__main__":
+    summary_report(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_JSONL_PATH)
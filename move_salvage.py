@@ -0,0 +1,58 @@
+# move_salvage.py
+# 从思考过程里“捡”坐标：最终的 [x,y] 无效或者干脆没给时，不再整段重发 Prompt，
+# 而是把推理里提到过的 (x,y) 候选都找出来，挑一个合法的直接下，省下一次好几秒的推理调用！(ง •̀_•́)ง
+import re
+
+from patterns import CLASS_SCORES, cell_threats
+
+# 思考时的 (x,y) 和最终回答的 [x,y] 都算候选
+CANDIDATE_PATTERN = re.compile(r"[\(\[]\s*(\d{1,2})\s*,\s*(\d{1,2})\s*[\)\]]")
+
+SALVAGE_POLICIES = ("off", "recent", "threat")
+
+
+def extract_candidates(text):
+    """按出现顺序列出回复里提到的所有坐标（去重，保留最后一次出现的位置）"""
+    seen = {}
+    for order, match in enumerate(CANDIDATE_PATTERN.finditer(text)):
+        seen[(int(match.group(1)), int(match.group(2)))] = order
+    return sorted(seen, key=seen.get)
+
+
+class MoveSalvager:
+    """按策略从回复里挑一个合法候选
+
+    policy 为 "off"（不捡）、"recent"（最后提到的合法坐标）或 "threat"（按进攻 + 防守棋型打分，
+    同分时取后提到的），retries_avoided 记录靠捡坐标省下的重试次数。
+    """
+
+    def __init__(self, policy="recent"):
+        if policy not in SALVAGE_POLICIES:
+            raise ValueError(f"未知的捡坐标策略：{policy}，可选 {', '.join(SALVAGE_POLICIES)}")
+        self.policy = policy
+        self.retries_avoided = 0
+
+    def salvage(self, game, response_text):
+        """返回可以直接下的 (x, y)，没有合法候选或策略为 off 时返回 None"""
+        if self.policy == "off":
+            return None
+        legal = [cell for cell in extract_candidates(response_text) if game.is_legal(*cell)]
+        if not legal:
+            return None
+        if self.policy == "recent":
+            move = legal[-1]
+        else:
+            board, color = game.position, game.player
+            ranked = [(self._threat_score(board, x, y, color), order, (x, y)) for order, (x, y) in enumerate(legal)]
+            move = max(ranked)[2]
+        self.retries_avoided += 1
+        return move
+
+    @staticmethod
+    def _threat_score(board, x, y, color):
+        attack = sum(CLASS_SCORES[c] for c in cell_threats(board, x, y, color))
+        defend = sum(CLASS_SCORES[c] for c in cell_threats(board, x, y, 3 - color))
+        return attack + defend
+
+    def stats_text(self):
+        return f"从思考过程捡回坐标（策略 {self.policy}）：省下 {self.retries_avoided} 次重试"
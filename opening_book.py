@@ -0,0 +1,129 @@
+# opening_book.py
+# 开局库 + 局面缓存：先把局面在 8 种棋盘对称（旋转、翻转）下变成字典序最小的“标准形”，
+# 再用标准形当键存走法和评估分。AIvsAI 里反复出现的开局，不管转了多少度，都只需要算一次！(ง •̀_•́)ง
+# 库文件是 JSON，第一次查询时才读盘，关闭程序时写回。
+import json
+import os
+from collections import namedtuple
+
+DEFAULT_BOOK_PATH = "opening_book.json"
+
+# 8 种对称变换，(x, y, n) -> (x', y')，n 为 size - 1
+SYMMETRIES = (
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (y, n - x),
+    lambda x, y, n: (n - x, n - y),
+    lambda x, y, n: (n - y, x),
+    lambda x, y, n: (x, n - y),
+    lambda x, y, n: (n - x, y),
+    lambda x, y, n: (y, x),
+    lambda x, y, n: (n - y, n - x),
+)
+# 每种变换的逆变换在 SYMMETRIES 里的下标（旋转 90° 和 270° 互逆，其余都是自己的逆）
+INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)
+
+# move 为实际棋盘上的坐标，score / depth 为引擎给出的评估分和搜索深度，source 为来源（"engine" / "mcts" / ...）
+BookEntry = namedtuple("BookEntry", "move score depth source")
+
+
+def transform(x, y, size, symmetry):
+    return SYMMETRIES[symmetry](x, y, size - 1)
+
+
+def canonical_form(position, color):
+    """局面在 8 种对称下字典序最小的形式，返回 (键, 用到的变换下标)；color 为行棋方"""
+    size = position.size
+    stones = position.history
+    best_key, best_symmetry = None, 0
+    for symmetry in range(len(SYMMETRIES)):
+        cells = sorted(transform(x, y, size, symmetry) + (c,) for x, y, c in stones)
+        key = f"{size}/{color}/" + ";".join(f"{x},{y},{c}" for x, y, c in cells)
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+class OpeningBook:
+    """按标准形索引的开局库 / 评估缓存，只收录棋子数不超过 max_stones 的局面"""
+
+    def __init__(self, path=DEFAULT_BOOK_PATH, max_stones=12):
+        self.path = path
+        self.max_stones = max_stones
+        self.entries = None  # 标准形键 -> [标准形坐标 x, y, 分数, 深度, 来源]，第一次用到才读盘
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- 读写磁盘 ----------
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"开局库 {self.path} 读取失败，从空库开始 (；′⌒`)：{e}")
+
+    def save(self):
+        """有改动才写回磁盘，先写临时文件再替换，写到一半退出也不会弄坏旧库"""
+        if not self.dirty or not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __len__(self):
+        self._load()
+        return len(self.entries)
+
+    # ---------- 查询和收录 ----------
+
+    def covers(self, position):
+        return position.move_count() <= self.max_stones
+
+    def lookup(self, position, color):
+        """查 color 方在这个局面的库存走法，返回 BookEntry（坐标已换回实际棋盘）或 None"""
+        if not self.covers(position):
+            return None
+        self._load()
+        key, symmetry = canonical_form(position, color)
+        stored = self.entries.get(key)
+        if stored is None:
+            self.misses += 1
+            return None
+        cx, cy, score, depth, source = stored
+        x, y = transform(cx, cy, position.size, INVERSE[symmetry])
+        if not position.is_empty(x, y):
+            # 库文件被手改坏了之类的情况，当作没命中
+            self.misses += 1
+            return None
+        self.hits += 1
+        return BookEntry((x, y), score, depth, source)
+
+    def store(self, position, color, move, score=0, depth=0, source="engine"):
+        """收录一步走法；同一局面只有更深的搜索结果才会覆盖旧的"""
+        if not self.covers(position):
+            return
+        self._load()
+        key, symmetry = canonical_form(position, color)
+        old = self.entries.get(key)
+        if old is not None and old[3] > depth:
+            return
+        cx, cy = transform(move[0], move[1], position.size, symmetry)
+        self.entries[key] = [cx, cy, score, depth, source]
+        self.dirty = True
+
+    # ---------- 统计 ----------
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats_text(self):
+        return (f"开局库：{len(self)} 个局面，命中 {self.hits} 次，未命中 {self.misses} 次，"
+                f"命中率 {self.hit_rate():.0%}")
@@ -0,0 +1,188 @@
+# parallel_search.py
+# 多核并行搜索：把根节点的候选走法分给 ProcessPoolExecutor 的多个进程，各自跑迭代加深，
+# 最后在所有进程都搜完的最深一层里挑分数最高的走法（一层都没搜完的进程不算）。GIL 管不到子进程，32 核就能用上 32 核！(ง •̀_•́)ง
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitBoard
+from engine import SearchEngine, SearchResult, WIN_SCORE
+from threat_solver import ThreatSolver
+
+_worker_engine = None  # 每个子进程各自一个引擎，置换表在同一进程的多次搜索间保留
+
+
+def _init_worker(max_depth, max_width, tt_size):
+    global _worker_engine
+    _worker_engine = SearchEngine(max_depth=max_depth, max_width=max_width, tt_size=tt_size,
+                                  use_threat_solver=False)
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _search_subset(size, history, color, root_moves, time_limit):
+    """子进程里执行：只搜索分到的根节点走法，返回每个完成深度的结果和节点数"""
+    board = BitBoard(size)
+    for x, y, c in history:
+        board.make(x, y, c)
+    _worker_engine.search(board, color, time_limit, root_moves=root_moves)
+    results = [(depth, board.coords(idx), score) for depth, idx, score in _worker_engine.depth_results]
+    return results, _worker_engine.nodes
+
+
+def _pick_result(worker_results, fallback):
+    """从各进程的 [(深度, 走法, 分数), ...] 里挑最终走法，返回 (走法, 分数, 深度)
+
+    一层都没搜完的进程直接跳过；已经算出胜负的进程（提前停止加深）拿最后一层的结果参与比较，
+    其余进程在它们都搜完的最深一层比较。所有进程都没结果时返回 fallback（排序第一的走法）。
+    """
+    finished = [results for results in worker_results if results]
+    if not finished:
+        return fallback, 0, 0
+    decided = [results[-1] for results in finished if abs(results[-1][2]) >= WIN_SCORE - 100]
+    open_results = [results for results in finished if abs(results[-1][2]) < WIN_SCORE - 100]
+    candidates = list(decided)
+    if open_results:
+        depth = min(results[-1][0] for results in open_results)
+        candidates += [result for results in open_results for result in results if result[0] == depth]
+    result_depth, move, score = max(candidates, key=lambda result: result[2])
+    return move, score, result_depth
+
+
+class ParallelSearchEngine:
+    """根节点分割的多进程搜索，接口与 SearchEngine.search / best_move 一致"""
+
+    def __init__(self, workers=None, time_limit=1.0, max_depth=8, max_width=12, tt_size=1 << 17,
+                 use_threat_solver=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.max_width = max_width
+        self.tt_size = tt_size
+        # 主进程的引擎负责根节点走法排序，只有一个进程时直接用它搜索
+        self.engine = SearchEngine(max_depth=max_depth, max_width=max_width, tt_size=tt_size,
+                                   use_threat_solver=False)
+        self.solver = ThreatSolver() if use_threat_solver else None
+        self.executor = None
+        self.last_result = None
+
+    def _pool(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.max_depth, self.max_width, self.tt_size),
+            )
+        return self.executor
+
+    def warm_up(self):
+        """提前把所有子进程拉起来，第一步棋就不用等进程启动"""
+        if self.workers > 1:
+            list(self._pool().map(_ping, range(self.workers)))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def search(self, position, color, time_limit=None):
+        if time_limit is None:
+            time_limit = self.time_limit
+        start = time.perf_counter()
+
+        if position.move_count() == 0:
+            center = position.size // 2
+            result = SearchResult((center, center), 0, 0, 0, 0.0, 0.0)
+            self.last_result = result
+            return result
+
+        if self.solver is not None:
+            # 和 SearchEngine.search 一样先 VCF 再 VCT，子进程里不再重复求解
+            line = self.solver.find_vcf(position, color, time_limit * 0.1)
+            if line is None:
+                line = self.solver.find_vct(position, color, time_limit * 0.1)
+            if line:
+                elapsed = time.perf_counter() - start
+                result = SearchResult(line[0], WIN_SCORE, len(line), self.solver.nodes, elapsed,
+                                      self.solver.nodes / elapsed if elapsed > 0 else 0.0)
+                self.last_result = result
+                return result
+
+        board = position.copy()
+        root_moves = [board.coords(idx) for idx in self.engine.ordered_moves(board, color)]
+        if len(root_moves) <= 1 or self.workers == 1:
+            result = self.engine.search(position, color, time_limit - (time.perf_counter() - start))
+            self.last_result = result
+            return result
+
+        # 轮流发牌，每个进程都分到好坏搭配的走法
+        n = min(self.workers, len(root_moves))
+        subsets = [root_moves[i::n] for i in range(n)]
+        remaining = max(0.05, time_limit - (time.perf_counter() - start))
+        pool = self._pool()
+        futures = [pool.submit(_search_subset, board.size, list(board.history), color, subset, remaining)
+                   for subset in subsets]
+        outcomes = [future.result() for future in futures]
+
+        nodes = sum(worker_nodes for _, worker_nodes in outcomes)
+        best_move, best_score, depth = _pick_result([results for results, _ in outcomes], root_moves[0])
+        elapsed = time.perf_counter() - start
+        result = SearchResult(best_move, best_score, depth, nodes, elapsed, nodes / elapsed if elapsed > 0 else 0.0)
+        self.last_result = result
+        return result
+
+    def best_move(self, game, time_limit=None):
+        return self.search(game.position, game.player, time_limit).move
+
+
+# ---------- 基准测试：固定局面、固定深度，比较不同进程数的用时 ----------
+
+BENCHMARK_POSITIONS = [
+    [(7, 7), (7, 8), (8, 8), (6, 6), (8, 7), (9, 9), (6, 8), (8, 6)],
+    [(7, 7), (8, 8), (7, 8), (7, 9), (6, 7), (8, 7), (5, 7), (4, 7), (6, 8), (6, 9)],
+    [(7, 7), (6, 8), (8, 6), (6, 6), (8, 8), (8, 7), (6, 7), (9, 8), (7, 9), (7, 8)],
+    [(7, 7), (7, 6), (8, 8), (9, 9), (6, 6), (5, 5), (8, 6), (6, 8), (9, 7), (10, 6), (8, 9)],
+]
+
+
+def benchmark_positions(size=15):
+    boards = []
+    for moves in BENCHMARK_POSITIONS:
+        board = BitBoard(size)
+        color = 1
+        for x, y in moves:
+            board.make(x, y, color)
+            color = 3 - color
+        boards.append((board, color))
+    return boards
+
+
+def run_benchmark(worker_counts=None, depth=4):
+    """对每个进程数搜完全部基准局面到固定深度，返回 [(进程数, 用时, 加速比)]"""
+    if worker_counts is None:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, cpus + 1)))
+    rows = []
+    baseline = None
+    for workers in worker_counts:
+        engine = ParallelSearchEngine(workers=workers, max_depth=depth, use_threat_solver=False)
+        try:
+            engine.warm_up()  # 进程启动时间不计入
+            start = time.perf_counter()
+            for board, color in benchmark_positions():
+                engine.search(board, color, time_limit=3600)
+            elapsed = time.perf_counter() - start
+        finally:
+            engine.shutdown()
+        if baseline is None:
+            baseline = elapsed
+        rows.append((workers, elapsed, baseline / elapsed))
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"本机 CPU 核数：{os.cpu_count()}")
+    for workers, elapsed, speedup in run_benchmark():
+        print(f"{workers:>3} 个进程：{elapsed:7.2f} 秒，加速比 {speedup:.2f}x")
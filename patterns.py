@@ -0,0 +1,228 @@
+# patterns.py
+# 棋型查表：把一条线上以某格为中心的 9 格窗口编码成三进制数（0 空、1 己方、2 对方或棋盘外），
+# 预先算好全部 3^9 种窗口的棋型（连五、活四、冲四、活三……）和分数，评估时只查表不循环！(ง •̀_•́)ง
+# 评估器只在落子/悔棋后重算经过那一格的四条线。
+
+NONE, TWO, OPEN_TWO, THREE, OPEN_THREE, FOUR, OPEN_FOUR, FIVE = range(8)
+
+THREAT_NAMES = {
+    NONE: "无",
+    TWO: "眠二",
+    OPEN_TWO: "活二",
+    THREE: "眠三",
+    OPEN_THREE: "活三",
+    FOUR: "冲四",
+    OPEN_FOUR: "活四",
+    FIVE: "连五",
+}
+
+CLASS_SCORES = (0, 10, 100, 100, 1000, 1000, 10000, 100000)
+
+WINDOW = 9
+CENTER = 4
+N_CODES = 3 ** WINDOW
+
+# 降一级：补一子能成活四的是活三，能成冲四的是眠三……
+_DEMOTE = {OPEN_FOUR: OPEN_THREE, FOUR: THREE, OPEN_THREE: OPEN_TWO, THREE: TWO}
+
+# 9 位二进制掩码 -> 对应的三进制数（每位乘 3^i），用来把位掩码快速拼成窗口编码
+TERNARY = [0] * (1 << WINDOW)
+for _mask in range(1 << WINDOW):
+    _value = 0
+    for _i in range(WINDOW):
+        if _mask >> _i & 1:
+            _value += 3 ** _i
+    TERNARY[_mask] = _value
+
+
+def _decode(code):
+    cells = []
+    for _ in range(WINDOW):
+        cells.append(code % 3)
+        code //= 3
+    return cells
+
+
+def _five_spots(cells):
+    """再补一子就能连成经过中心的五子的空位"""
+    spots = set()
+    for start in range(CENTER - 4, CENTER + 1):
+        run = cells[start:start + 5]
+        if run.count(2) == 0 and run.count(1) == 4:
+            spots.add(start + run.index(0))
+    return spots
+
+
+def _classify(cells, memo):
+    key = tuple(cells)
+    cached = memo.get(key)
+    if cached is not None:
+        return cached
+    result = NONE
+    for start in range(CENTER - 4, CENTER + 1):
+        if cells[start:start + 5] == [1] * 5:
+            result = FIVE
+            break
+    else:
+        spots = _five_spots(cells)
+        if len(spots) >= 2:
+            result = OPEN_FOUR
+        elif spots:
+            result = FOUR
+        else:
+            for i in range(WINDOW):
+                if cells[i] != 0:
+                    continue
+                cells[i] = 1
+                demoted = _DEMOTE.get(_classify(cells, memo), NONE)
+                cells[i] = 0
+                if demoted > result:
+                    result = demoted
+    memo[key] = result
+    return result
+
+
+def _build_tables():
+    classes = bytearray(N_CODES)
+    memo = {}
+    for code in range(N_CODES):
+        cells = _decode(code)
+        if cells[CENTER] == 1:
+            classes[code] = _classify(cells, memo)
+    scores = [CLASS_SCORES[c] for c in classes]
+    return classes, scores
+
+
+# PATTERN_CLASS[code] / PATTERN_SCORE[code]：中心格是己方棋子时这条线的棋型和分数（中心不是己方则为 NONE）
+PATTERN_CLASS, PATTERN_SCORE = _build_tables()
+
+
+# ---------- 棋盘上的线 ----------
+
+_LINE_VALID = {}
+
+
+def line_valid_masks(size):
+    """每种线（行、列、主对角线、副对角线）上有效位置的掩码，与 BitBoard 的线掩码位序一致"""
+    masks = _LINE_VALID.get(size)
+    if masks is None:
+        full = (1 << size) - 1
+        diags = []
+        antis = []
+        for d in range(2 * size - 1):
+            lo = max(0, d - size + 1)
+            hi = min(size - 1, d)
+            diags.append(((1 << (hi + 1)) - 1) ^ ((1 << lo) - 1))  # x 从 lo 到 hi
+        for a in range(2 * size - 1):
+            lo = max(0, a - size + 1)
+            hi = min(size - 1, a)
+            antis.append(((1 << (hi + 1)) - 1) ^ ((1 << lo) - 1))
+        masks = ([full] * size, [full] * size, diags, antis)
+        _LINE_VALID[size] = masks
+    return masks
+
+
+def lines_through(size, x, y):
+    """经过 (x, y) 的四条线：[(线种类, 线下标, 该格在线上的位置)]，种类顺序同 bitboard.DIRECTIONS"""
+    return ((0, x, y), (1, y, x), (2, x - y + size - 1, x), (3, x + y, x))
+
+
+def _line_tables(board):
+    return (board.rows, board.cols, board.diags, board.antis)
+
+
+def window_code(own_line, blocked_line, pos):
+    """从线掩码中取出以 pos 为中心的 9 格窗口编码"""
+    own = ((own_line << CENTER) >> pos) & 0x1FF
+    # 低 4 位补 1：位置 -4..-1 在棋盘外，算堵住
+    blocked = (((blocked_line << CENTER) | 0xF) >> pos) & 0x1FF
+    return TERNARY[own] + 2 * TERNARY[blocked]
+
+
+def _blocked(tables, valid, kind, idx, color, size):
+    """对方棋子和棋盘外的位置都算堵住（棋盘外的位由 valid 取反得到）"""
+    full = (1 << (size + 2 * CENTER)) - 1
+    return tables[kind][3 - color][idx] | (full ^ valid[kind][idx])
+
+
+def cell_threats(board, x, y, color):
+    """color 在空位 (x, y) 落子后四个方向各自形成的棋型"""
+    size = board.size
+    tables = _line_tables(board)
+    valid = line_valid_masks(size)
+    result = []
+    for kind, idx, pos in lines_through(size, x, y):
+        own = tables[kind][color][idx] | (1 << pos)
+        blocked = _blocked(tables, valid, kind, idx, color, size)
+        result.append(PATTERN_CLASS[window_code(own, blocked, pos)])
+    return result
+
+
+def best_threat(board, x, y, color):
+    return max(cell_threats(board, x, y, color))
+
+
+def threat_map(board, color, cells=None, min_class=OPEN_TWO):
+    """列出 color 落子后能形成 min_class 以上棋型的空位：{(x, y): 最强棋型}"""
+    if cells is None:
+        cells = board.empty_cells()
+    threats = {}
+    for x, y in cells:
+        if not board.is_empty(x, y):
+            continue
+        cls = best_threat(board, x, y, color)
+        if cls >= min_class:
+            threats[(x, y)] = cls
+    return threats
+
+
+def describe_threats(board, color, cells=None, limit=8, min_class=OPEN_THREE):
+    """把 threat_map 排序后转成给 Prompt 用的中文提示行"""
+    threats = threat_map(board, color, cells, min_class)
+    ranked = sorted(threats.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [f"({x},{y}) {THREAT_NAMES[cls]}" for (x, y), cls in ranked]
+
+
+class PatternEvaluator:
+    """增量评估：缓存每条线对双方的分数，落子/悔棋后只重算经过那一格的四条线"""
+
+    def __init__(self, board):
+        self.board = board
+        size = board.size
+        self.valid = line_valid_masks(size)
+        n_lines = (size, size, 2 * size - 1, 2 * size - 1)
+        self.line_scores = [[[0] * n for n in n_lines] for _ in range(3)]
+        self.totals = [0, 0, 0]
+        for kind in range(4):
+            for idx in range(n_lines[kind]):
+                self._refresh(kind, idx)
+
+    def _line_score(self, kind, idx, color):
+        tables = _line_tables(self.board)
+        own_line = tables[kind][color][idx]
+        if not own_line:
+            return 0
+        blocked = _blocked(tables, self.valid, kind, idx, color, self.board.size)
+        score = 0
+        mask = own_line
+        while mask:
+            low = mask & -mask
+            pos = low.bit_length() - 1
+            score += PATTERN_SCORE[window_code(own_line, blocked, pos)]
+            mask ^= low
+        return score
+
+    def _refresh(self, kind, idx):
+        for color in (1, 2):
+            new = self._line_score(kind, idx, color)
+            self.totals[color] += new - self.line_scores[color][kind][idx]
+            self.line_scores[color][kind][idx] = new
+
+    def update(self, x, y):
+        """(x, y) 刚落子或刚被撤销后调用"""
+        for kind, idx, _ in lines_through(self.board.size, x, y):
+            self._refresh(kind, idx)
+
+    def score(self, color):
+        """站在 color 一方的评估分"""
+        return self.totals[color] - self.totals[3 - color]
@@ -0,0 +1,171 @@
+# prompt_session.py
+# 前缀稳定的 Prompt：原来每步都把规则、说明、棋盘从头拼一遍发过去，开头就不一样，服务端的 Prompt 缓存一次也命中不了！(╯▔皿▔)╯
+# 现在规则和作答要求放进每步都一字不差的系统前缀，每步只发增量（新落的子、需要时再附棋盘）：
+#   prefix  单轮：固定的系统前缀 + 这一步的增量和完整局面
+#   chat    多轮：整盘棋是一段对话，历史原样保留，前缀越来越长、越来越能命中缓存，每隔几步再附一次局面防止模型记错
+# python prompt_session.py 用模拟的服务端前缀缓存，比较三种方式的首 token 延迟（TTFT）。(ง •̀_•́)ง
+import contextlib
+import io
+import os
+import sys
+
+from bitboard import BLACK
+from board_encoding import count_tokens, needs_stone_lists
+from threat_solver import prompt_hint_section
+
+SESSION_MODES = ("off", "prefix", "chat")
+COLOR_LABELS = {1: "黑", 2: "白"}
+
+
+class PromptSession:
+    """一个模型在一盘棋里的对话状态，挂在 llm.session 上；mode 为 off 时 create_prompt 照旧拼完整 Prompt"""
+
+    def __init__(self, mode="prefix", board_every=5, max_turns=30):
+        self.mode = mode
+        self.board_every = board_every  # chat 模式下每隔几步附一次完整局面
+        self.max_turns = max_turns  # chat 历史超过这么多轮就清空重来（清空后第一步会重新附上局面）
+        self.reset()
+
+    @property
+    def active(self):
+        return self.mode in ("prefix", "chat")
+
+    def reset(self):
+        """新开一盘（或悔棋后历史对不上）时调用"""
+        self.history = []
+        self.seen = 0  # 上次作答时棋盘上已有（含它自己那一步）的子数
+        self.turns = 0
+
+    def turn_prompt(self, game, board_state, encoding=None):
+        """这一步要发的增量：上次作答以来新落的子，需要时附上局面（和完整 Prompt 一样，编码不含棋子时补上黑白棋子列表）和局面提示"""
+        if len(game.moves) < self.seen:
+            self.reset()
+        new_moves = game.moves[self.seen:]
+        if new_moves:
+            prompt = "新落子：" + "，".join(f"{COLOR_LABELS[color]} ({x},{y})" for x, y, color in new_moves) + "\n"
+        else:
+            prompt = "棋盘还是空的，由你先手。\n"
+        if self.mode == "prefix" or not self.history or self.turns % self.board_every == 0:
+            prompt += "当前棋盘状态：\n" + board_state + "\n"
+            if needs_stone_lists(game, encoding):
+                prompt += "【黑棋位置】： " + str(game.position.stones(1)) + "\n"
+                prompt += "【白棋位置】： " + str(game.position.stones(2)) + "\n"
+        if game.prompt_hints:
+            prompt += prompt_hint_section(game.position, game.player)
+        prompt += f"轮到你执{COLOR_LABELS[game.player]}落子，最终坐标用[]标出。\n"
+        return prompt
+
+    def messages(self, system_prompt, prompt):
+        """OpenAI 格式的消息列表：系统前缀 +（chat 模式下的）历史 + 这一步的增量"""
+        history = self.history if self.mode == "chat" else []
+        return [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": prompt}]
+
+    def record(self, game, prompt, move):
+        """这一步给出了合法坐标：记进历史，回复只留最终坐标（推理过程不回传）"""
+        self.turns += 1
+        self.seen = len(game.moves) + 1
+        if self.mode != "chat":
+            return
+        if len(self.history) >= 2 * self.max_turns:
+            self.history = []
+            return
+        self.history.append({"role": "user", "content": prompt})
+        self.history.append({"role": "assistant", "content": f"[{move[0]},{move[1]}]"})
+
+
+def gemini_contents(messages):
+    """把 OpenAI 格式的消息转成 Gemini 的 contents：系统前缀作为第一条用户消息的第一段，保证前缀不变"""
+    contents = []
+    for message in messages:
+        if message["role"] == "system":
+            contents.append({"role": "user", "parts": [message["content"]]})
+        elif message["role"] == "user" and contents and contents[-1]["role"] == "user":
+            contents[-1]["parts"].append(message["content"])
+        else:
+            role = "model" if message["role"] == "assistant" else "user"
+            contents.append({"role": role, "parts": [message["content"]]})
+    return contents
+
+
+# ---------- TTFT 基准：模拟服务端的前缀缓存 ----------
+
+class PrefixCache:
+    """模拟服务端的 Prompt 前缀缓存：和之前某次请求相同的最长前缀按块命中，命中部分几乎不花时间
+
+    首 token 延迟 = base + 未命中 token 数 × uncached + 命中 token 数 × cached（秒）。
+    """
+
+    def __init__(self, base=0.15, uncached=0.0004, cached=0.00002, block_tokens=64):
+        self.base = base
+        self.uncached = uncached
+        self.cached = cached
+        self.block_tokens = block_tokens
+        self.seen = []
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @staticmethod
+    def serialize(messages):
+        if isinstance(messages, str):
+            return messages
+        return "".join(f"<|{m['role']}|>{m['content']}" for m in messages)
+
+    def request(self, messages):
+        """登记一次请求，返回 (首 token 延迟, Prompt token 数, 命中 token 数)"""
+        text = self.serialize(messages)
+        common = max((len(os.path.commonprefix([previous, text])) for previous in self.seen), default=0)
+        self.seen.append(text)
+        tokens = count_tokens(text)
+        hit = count_tokens(text[:common]) // self.block_tokens * self.block_tokens if common else 0
+        hit = min(hit, tokens)
+        self.prompt_tokens += tokens
+        self.cached_tokens += hit
+        return self.base + (tokens - hit) * self.uncached + hit * self.cached, tokens, hit
+
+
+def measure_ttft(mode, moves, encoding="compact", cache=None):
+    """按 moves 的顺序重放一盘棋，黑白两边都用 QWQ 的 Prompt，返回 (每步的首 token 延迟, 缓存)"""
+    import configparser
+
+    from game_core import GomokuGame, MoveRequest
+    from QWQ import QWQ
+    from QWQ_black import QWQBlackLLM
+
+    cache = cache or PrefixCache()
+    game = GomokuGame()
+    config = configparser.ConfigParser()
+    llms = {BLACK: QWQBlackLLM(config, game), 3 - BLACK: QWQ(config, game)}
+    for llm in llms.values():
+        llm.board_encoding = encoding
+        llm.session = PromptSession(mode) if mode != "off" else None
+    samples = []
+    for x, y in moves:
+        llm = llms[game.player]
+        with contextlib.redirect_stdout(io.StringIO()):
+            prompt = MoveRequest(llm, game, game.current_color).build_prompt()
+        ttft, _, _ = cache.request(llm.chat_messages(prompt))
+        samples.append(ttft)
+        if llm.session is not None:
+            llm.session.record(game, prompt, (x, y))
+        game.play(x, y)
+    return samples, cache
+
+
+def ttft_report(encoding="compact", time_limit=0.05, out=sys.stdout):
+    """用本地引擎下一盘，再按三种方式重放（局面编码相同），打印平均首 token 延迟和缓存命中率"""
+    from engine import EnginePlayer
+    from game_core import play_game
+
+    player = EnginePlayer(time_limit=time_limit)
+    game = play_game(player, player)
+    moves = [(x, y) for x, y, _ in game.moves]
+    print(f"示例对局 {len(moves)} 步，局面编码 {encoding}", file=out)
+    for mode in SESSION_MODES:
+        samples, cache = measure_ttft(mode, moves, encoding)
+        hit_rate = cache.cached_tokens / cache.prompt_tokens if cache.prompt_tokens else 0
+        print(f"{mode:<7} 平均 TTFT {sum(samples) / len(samples) * 1000:7.1f} 毫秒，最后一步 {samples[-1] * 1000:7.1f} 毫秒，"
+              f"平均 Prompt {cache.prompt_tokens / len(samples):6.0f} token，缓存命中 {hit_rate:.0%}", file=out)
+
+
+if __name__ == "__main__":
+    ttft_report(sys.argv[1] if len(sys.argv) > 1 else "compact")
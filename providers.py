@@ -0,0 +1,143 @@
+# providers.py
+# 模型注册表：名字 -> 白棋 / 黑棋的实现类（"模块:类名" 字符串）和构造参数。
+# 模块是第一次选中这个模型时才 import 的，PVP、PVE 根本不会碰 openai / google.generativeai，启动飞快！(ง •̀_•́)ง
+# 加一个新模型只需在 config.ini 里写一个 [provider:名字] 小节，例如：
+#
+#   [provider:Kimi]
+#   type = openai
+#   model = moonshotai/Kimi-K2-Instruct
+#   base_url = https://api-inference.modelscope.cn/v1/
+#   api_key_section = modelscope
+#
+# type 决定用哪套 Prompt 和流式解析（openai 为 OpenAI 兼容接口，gemini 为 Google Gemini），
+# 也可以用 white = 模块:类名 / black = 模块:类名 直接指定实现类。
+# type = gemini 不支持 base_url（换服务地址请在 api_key_section 指向的小节里写 api_endpoint），写了不支持的配置项会在读配置时就跳过。
+import importlib
+import statistics
+import subprocess
+import sys
+from collections import namedtuple
+
+# white / black 为 "模块:类名"，options 为传给构造函数的关键字参数
+ProviderSpec = namedtuple("ProviderSpec", "name white black options")
+
+PROVIDER_TYPES = {
+    "gemini": ("gemini:GeminiLLM", "gemini_black:GeminiBlackLLM"),
+    "openai": ("QWQ:QWQ", "QWQ_black:QWQBlackLLM"),
+}
+
+BUILTIN_PROVIDERS = (
+    ProviderSpec("Gemini", "gemini:GeminiLLM", "gemini_black:GeminiBlackLLM", {}),
+    ProviderSpec("DeepSeek", "deepseek:DeepSeekLLM", "deepseek_black:DeepSeekBlackLLM", {}),
+    ProviderSpec("QWQ", "QWQ:QWQ", "QWQ_black:QWQBlackLLM", {}),
+)
+
+# [provider:名字] 小节里可以覆盖的构造参数：配置项 -> 关键字参数
+_OPTION_KEYS = {"model": "model_name", "base_url": "base_url", "api_key_section": "api_key_section"}
+# 每种 type 的实现类接受哪些参数（Gemini 没有 base_url）；自己写 white / black 的不检查
+TYPE_OPTIONS = {
+    "gemini": ("model", "api_key_section"),
+    "openai": ("model", "base_url", "api_key_section"),
+}
+_SPEC_KEYS = ("type", "white", "black")
+
+
+def load_class(path):
+    """按 "模块:类名" 导入实现类"""
+    module_name, class_name = path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class ProviderRegistry:
+    """按名字登记模型，get() 时才导入模块并创建实例，同一名字同一颜色只创建一次"""
+
+    def __init__(self, config=None):
+        self.specs = {}
+        self.instances = {}  # (名字, "White"/"Black") -> LLMInterface
+        for spec in BUILTIN_PROVIDERS:
+            self.register(spec)
+        if config is not None:
+            self.load_config(config)
+
+    def register(self, spec):
+        self.specs[spec.name] = spec
+
+    def load_config(self, config):
+        """读取 config.ini 里所有 [provider:名字] 小节，同名的会覆盖内置模型"""
+        for section in config.sections():
+            if not section.startswith("provider:"):
+                continue
+            name = section.split(":", 1)[1].strip()
+            provider_type = config.get(section, "type", fallback="openai")
+            white, black = PROVIDER_TYPES.get(provider_type, (None, None))
+            white = config.get(section, "white", fallback=white)
+            black = config.get(section, "black", fallback=black)
+            if not white or not black:
+                print(f"模型 {name} 的 type 不认识，也没写 white / black，跳过 (；′⌒`)")
+                continue
+            custom = config.has_option(section, "white") or config.has_option(section, "black")
+            allowed = _OPTION_KEYS if custom else TYPE_OPTIONS.get(provider_type, _OPTION_KEYS)
+            unknown = sorted(set(config.options(section)) - set(config.defaults()) - set(_SPEC_KEYS) - set(allowed))
+            if unknown:
+                # 现在就报错，免得第一次选中这个模型时才在构造函数里抛 TypeError
+                print(f"模型 {name}（type = {provider_type}）不支持配置项 {', '.join(unknown)}，"
+                      f"可用的有 {', '.join(allowed)}，跳过 (；′⌒`)")
+                continue
+            options = {arg: config.get(section, key) for key, arg in _OPTION_KEYS.items()
+                       if config.get(section, key, fallback="")}
+            self.register(ProviderSpec(name, white, black, options))
+
+    def names(self):
+        return list(self.specs)
+
+    def get(self, name, color, config, game):
+        """取 name 模型执 color（"White"/"Black"）的实例，第一次调用时才 import 对应模块"""
+        key = (name, color)
+        llm = self.instances.get(key)
+        if llm is None:
+            spec = self.specs[name]
+            cls = load_class(spec.white if color == "White" else spec.black)
+            llm = cls(config, game, **spec.options)
+            self.instances[key] = llm
+        return llm
+
+    def preload(self):
+        """一口气导入所有模型模块和它们的 SDK（旧版启动时的做法），基准测试对照用"""
+        for spec in self.specs.values():
+            load_class(spec.white)
+            load_class(spec.black)
+        for sdk in ("openai", "google.generativeai"):
+            try:
+                importlib.import_module(sdk)
+            except ImportError:
+                pass
+
+
+# ---------- 启动时间基准：每种场景开一个新解释器，测 import 用时 ----------
+
+STARTUP_SCENARIOS = (
+    ("界面模块，模型按需加载", "import gomoku"),
+    ("界面模块，启动时全部加载", "import gomoku, providers; providers.ProviderRegistry().preload()"),
+    ("无界面对局，按需加载", "import game_core, engine"),
+    ("无界面对局，全部加载", "import game_core, engine, providers; providers.ProviderRegistry().preload()"),
+)
+
+
+def measure_startup(statement, runs=5):
+    """在全新的子进程里执行 statement，返回每次用时（秒）的中位数"""
+    code = f"import time; _t = time.perf_counter(); {statement}; print(time.perf_counter() - _t)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    for label, statement in STARTUP_SCENARIOS:
+        try:
+            elapsed = measure_startup(statement)
+        except subprocess.CalledProcessError as e:
+            print(f"{label}：运行失败 (；′⌒`)\n{e.stderr}")
+            continue
+        print(f"{label}：{elapsed * 1000:.1f} 毫秒")
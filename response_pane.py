@@ -0,0 +1,129 @@
+# response_pane.py
+# 黑棋 / 白棋窗口的“环形缓冲”：R1 一步的思考过程就能有几万字，整盘 AIvsAI 全塞进 Text 控件，
+# 越下越卡、内存越涨！(╯▔皿▔)╯
+# 现在窗口里只保留最近几手的完整输出（同时限制总字数），更早的每一手折叠成一行摘要，点一下再从磁盘日志里读出来看；
+# 摘要也有上限，再早的直接删掉（日志里还在）。这样不管下多少手，插入和滚动的开销都差不多。(ง •̀_•́)ง
+import tkinter as tk
+
+SUMMARY_COLOR = "gray"
+
+
+class MoveBlock:
+    """窗口里属于同一手的一段文字：start 是它开头的 Text mark，chars 是目前显示的字数"""
+
+    def __init__(self, key, start):
+        self.key = key  # (对局编号, 第几手)
+        self.start = start
+        self.chars = 0
+        self.total = 0  # 这一手一共收到多少字（含被省略的）
+        self.collapsed = False
+        self.truncated = False
+        self.tag = None  # 摘要 / 省略提示的点击 tag
+
+
+class ResponsePane:
+    """管理一个 Text 控件：按手分块追加，超过 max_moves 手或 max_chars 字就把最旧的整手折叠成摘要
+
+    正在输出的这一手本身超过 max_chars 时，只保留最后 max_chars 字，前面换成一行提示。
+    on_expand(key) 在点击摘要或提示时调用，用来从日志里读出这一手的完整输出。
+    """
+
+    def __init__(self, widget, max_chars=20000, max_moves=4, max_summaries=100, on_expand=None):
+        self.widget = widget
+        self.max_chars = max_chars
+        self.max_moves = max(1, max_moves)
+        self.max_summaries = max_summaries
+        self.on_expand = on_expand
+        self.blocks = []
+        self.serial = 0
+        self.dropped = 0  # 连摘要都删掉的手数
+        widget.tag_configure("summary", foreground=SUMMARY_COLOR, underline=True)
+
+    def append(self, key, segments):
+        """把 [(文字, 类型), ...] 追加到 key 这一手的末尾，然后按上限折叠，只滚动一次"""
+        widget = self.widget
+        widget.config(state=tk.NORMAL)
+        if not self.blocks or self.blocks[-1].key != key:
+            self.serial += 1
+            block = MoveBlock(key, f"block{self.serial}")
+            widget.mark_set(block.start, "end-1c")
+            widget.mark_gravity(block.start, tk.LEFT)
+            self.blocks.append(block)
+        block = self.blocks[-1]
+        args = []
+        for text, text_type in segments:
+            args += [text, text_type]
+            block.chars += len(text)
+            block.total += len(text)
+        widget.insert(tk.END, *args)
+        self.trim()
+        widget.config(state=tk.DISABLED)
+        widget.see(tk.END)
+
+    def trim(self):
+        live = [block for block in self.blocks if not block.collapsed]
+        while len(live) > 1 and (len(live) > self.max_moves or sum(block.chars for block in live) > self.max_chars):
+            self.collapse(live.pop(0))
+        if live and live[-1].chars > self.max_chars:
+            self.truncate(live[-1])
+        summaries = [block for block in self.blocks if block.collapsed]
+        for block in summaries[:max(0, len(summaries) - self.max_summaries)]:
+            self.replace(block, [])
+            self.widget.mark_unset(block.start)
+            self.blocks.remove(block)
+            self.dropped += 1
+
+    def collapse(self, block):
+        game_id, move = block.key
+        self.replace(block, [f"▸ 第 {move} 手的输出已折叠（{block.total} 字），点击查看\n"])
+        block.collapsed = True
+
+    def truncate(self, block):
+        """正在输出的一手太长：删掉开头多出来的部分，开头放一行可点击的提示"""
+        widget = self.widget
+        notice = "▸ 本手前面的输出已省略，点击查看完整内容\n"
+        if not block.truncated:
+            self.make_tag(block)
+            widget.insert(block.start, notice, ("summary", block.tag))
+            block.truncated = True
+        body = f"{block.start} + {len(notice)} chars"
+        excess = block.chars - self.max_chars
+        widget.delete(body, f"{body} + {excess} chars")
+        block.chars -= excess
+
+    def replace(self, block, lines):
+        """把 block 的全部内容换成 lines（可点击的摘要），下一块的开头保持在原处"""
+        widget = self.widget
+        index = self.blocks.index(block)
+        end = self.blocks[index + 1].start if index + 1 < len(self.blocks) else "end-1c"
+        widget.delete(block.start, end)
+        if lines:
+            self.make_tag(block)
+            if end != "end-1c":
+                # 插在两个 mark 重合的位置，先让下一块的 mark 往右挪，摘要才会落在它前面
+                widget.mark_gravity(end, tk.RIGHT)
+            widget.insert(block.start, "".join(lines), ("summary", block.tag))
+            if end != "end-1c":
+                widget.mark_gravity(end, tk.LEFT)
+            block.chars = sum(len(line) for line in lines)
+        elif block.tag is not None:
+            widget.tag_delete(block.tag)
+            block.tag = None
+
+    def make_tag(self, block):
+        if block.tag is None:
+            block.tag = f"expand{block.start}"
+            if self.on_expand is not None:
+                self.widget.tag_bind(block.tag, "<Button-1>", lambda event, key=block.key: self.on_expand(key))
+
+    def clear(self):
+        widget = self.widget
+        widget.config(state=tk.NORMAL)
+        widget.delete("1.0", tk.END)
+        for block in self.blocks:
+            widget.mark_unset(block.start)
+            if block.tag is not None:
+                widget.tag_delete(block.tag)
+        widget.config(state=tk.DISABLED)
+        self.blocks = []
+        self.dropped = 0
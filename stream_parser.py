@@ -0,0 +1,97 @@
+# stream_parser.py
+# 流式解析：一边收 LLM 的流一边找最终坐标，只要“最终回答”部分出现了合法的 [x,y]，
+# 就马上关掉流让棋局继续，不用等 R1 / QwQ 把后面的废话说完！(ง •̀_•́)ง
+# 省下多少 token 和秒数没法直接量，所以每隔几步让流完整跑完一次，用这些样本估计“尾巴”的长度。
+# 模型常在回答里先写一个坐标再改口（“[7,8] …… 最终 [7,9]”），parse_response 取的是最后一个，
+# 所以坐标后面又收到 settle_chars 个字、中间没有新的 [ 才算定下来，不然提前关流和完整解析会下在不同的地方。
+
+SETTLE_CHARS = 80
+
+
+class StreamMoveParser:
+    """增量解析一条回复流：llm.final_answer_marker 之后最后一个坐标合法、且后面 settle_chars 个字里没有新的 [ 就算定下来了
+
+    没有分界标记的模型（比如 Gemini 的回复整段都是回答）无法判断坐标是否最终，feed 永远返回 None。
+    """
+
+    def __init__(self, llm, is_legal, settle_chars=SETTLE_CHARS):
+        self.llm = llm
+        self.is_legal = is_legal
+        self.settle_chars = settle_chars
+        self.marker = getattr(llm, "final_answer_marker", None)
+        # 套了缓存的 LLM 的 parse_response 会顺带决定存还是删缓存，流收到一半时只能用不动缓存的 peek_move
+        self.parse = getattr(llm, "peek_move", llm.parse_response)
+        self.text = ""
+        self.in_final = False
+        self.move = None
+
+    def feed(self, chunk):
+        """喂入一段流式输出，最终坐标定下来时返回 (x, y)，否则返回 None"""
+        self.text += chunk
+        if self.marker is None or self.move is not None:
+            return None
+        if not self.in_final:
+            self.in_final = self.marker in self.text
+            if not self.in_final:
+                return None
+        answer = self.text[self.text.rfind(self.marker) + len(self.marker):]
+        close = answer.rfind("]")
+        if close < 0:
+            return None
+        tail = answer[close + 1:]
+        if "[" in tail or len(tail) < self.settle_chars:
+            return None  # 后面可能还有一个坐标（改口），先等等
+        move = self.parse(self.text)
+        if move is not None and self.is_legal(*move):
+            self.move = move
+            return move
+        return None
+
+
+class EarlyStopper:
+    """决定定下坐标后是否提前关流，并统计省下的 token（按流式片段数近似）和秒数
+
+    每 calibrate_every 步让一条流完整跑完，记下坐标之后还有多少片段、多少秒，
+    提前关流时就用同一模型的平均尾巴长度作为“省下的量”。
+    """
+
+    def __init__(self, calibrate_every=10, settle_chars=SETTLE_CHARS):
+        self.calibrate_every = calibrate_every
+        self.settle_chars = settle_chars  # 交给 StreamMoveParser：坐标后面再等这么多字才算定下来
+        self.detections = {}   # 模型 -> 定下坐标的次数
+        self.tails = {}        # 模型 -> [样本数, 尾巴片段数之和, 尾巴秒数之和]
+        self.stopped = 0
+        self.saved_tokens = 0.0
+        self.saved_seconds = 0.0
+        self.last_saving = None  # 最近一次提前关流估计省下的 (token, 秒)
+
+    def should_stop(self, model):
+        """坐标刚定下来时调用：返回 True 就关流，False 表示这一步用来校准"""
+        count = self.detections.get(model, 0) + 1
+        self.detections[model] = count
+        if not self.calibrate_every:
+            return True
+        # 还没有任何样本时先校准一次，之后每 calibrate_every 步校准一次
+        return model in self.tails and count % self.calibrate_every != 0
+
+    def record_tail(self, model, chunks, seconds):
+        """校准步：坐标定下来之后流又跑了 chunks 个片段、seconds 秒"""
+        sample = self.tails.setdefault(model, [0, 0, 0.0])
+        sample[0] += 1
+        sample[1] += chunks
+        sample[2] += seconds
+
+    def record_stop(self, model):
+        """提前关流了一次，返回估计省下的 (token, 秒)"""
+        samples, chunks, seconds = self.tails.get(model, (0, 0, 0.0))
+        tokens = chunks / samples if samples else 0.0
+        secs = seconds / samples if samples else 0.0
+        self.stopped += 1
+        self.saved_tokens += tokens
+        self.saved_seconds += secs
+        self.last_saving = (tokens, secs)
+        return tokens, secs
+
+    def stats_text(self):
+        return (f"提前结束流式输出 {self.stopped} 次，估计共省下约 {self.saved_tokens:.0f} 个 token、"
+                f"{self.saved_seconds:.1f} 秒")
@@ -0,0 +1,6 @@
+# conftest.py
+# 测试直接 import 仓库根目录下的模块（仓库本身不是一个包）
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,67 @@
+# test_async_driver.py
+# 每步的硬性期限：卡住不出 token 的流在期限到时就要被关掉，不能等到 read_timeout
+import asyncio
+import time
+
+import pytest
+
+from async_driver import AsyncMoveDriver, LLMMoveTimeout
+from game_core import GomokuGame
+from llm_cache import CachedLLM, LLMResponseCache
+from llm_interface import LLMInterface
+
+
+class StalledLLM(LLMInterface):
+    """原生异步流：先吐一段思考，然后一直等下去（像服务端卡住的连接），记下流是否被关掉"""
+
+    final_answer_marker = "=== Final Answer ==="
+
+    def __init__(self, game):
+        self.gomoku_game = game
+        self.model_name = "stalled"
+        self.closed_at = None
+
+    def create_prompt(self, board_state, ai_color):
+        return board_state
+
+    def get_llm_response_stream(self, prompt):
+        raise AssertionError("异步驱动应该走原生异步流")
+
+    async def get_llm_response_astream(self, prompt, executor=None):
+        try:
+            yield "想一想 (7,7)"
+            await asyncio.sleep(3600)
+        finally:
+            self.closed_at = time.perf_counter()
+
+    def parse_response(self, response_text):
+        return None
+
+
+@pytest.fixture
+def driver():
+    driver = AsyncMoveDriver(move_timeout=0.2)
+    yield driver
+    driver.shutdown()
+
+
+def test_deadline_closes_stalled_stream(driver):
+    game = GomokuGame()
+    llm = StalledLLM(game)
+    started = time.perf_counter()
+    with pytest.raises(LLMMoveTimeout):
+        driver.run(driver.request_move(llm, game, "Black", "Stalled"))
+    assert llm.closed_at is not None and llm.closed_at - started < 1.0
+
+
+def test_deadline_closes_stalled_stream_through_cache(driver, tmp_path):
+    game = GomokuGame()
+    inner = StalledLLM(game)
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"))
+    llm = CachedLLM(inner, cache, "Stalled")
+    started = time.perf_counter()
+    with pytest.raises(LLMMoveTimeout):
+        driver.run(driver.request_move(llm, game, "Black", "Stalled"))
+    assert inner.closed_at is not None and inner.closed_at - started < 1.0
+    assert len(cache) == 0  # 没收完的回复不缓存
+    cache.close()
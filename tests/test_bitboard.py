@@ -0,0 +1,74 @@
+# test_bitboard.py
+# 位棋盘：连五判断、落子 / 悔棋和逐格暴力扫描的结果一致
+import random
+
+import pytest
+
+from bitboard import BitBoard, BLACK, WHITE, DIRECTIONS
+
+
+def brute_five(grid, color, through=None):
+    """逐格逐方向数连子，through 给出时只算经过这一格的五连"""
+    size = len(grid)
+    for x in range(size):
+        for y in range(size):
+            for dx, dy in DIRECTIONS:
+                cells = [(x + k * dx, y + k * dy) for k in range(5)]
+                if all(0 <= cx < size and 0 <= cy < size and grid[cx][cy] == color for cx, cy in cells):
+                    if through is None or through in cells:
+                        return True
+    return False
+
+
+def state(board):
+    return (list(board.bits), [list(r) for r in board.rows[1:]], [list(c) for c in board.cols[1:]],
+            [list(d) for d in board.diags[1:]], [list(a) for a in board.antis[1:]],
+            board.hash, board.near_mask, list(board.near_counts))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_game_matches_brute_force(seed):
+    rng = random.Random(seed)
+    size = rng.choice((9, 15))
+    board = BitBoard(size)
+    snapshots = [state(board)]
+    # 随机落在已有棋子附近，棋子挤在一起才容易出现五连
+    color = BLACK
+    while not board.is_full():
+        cells = board.candidates(1) or board.empty_cells()
+        x, y = rng.choice(cells)
+        board.make(x, y, color)
+        grid = board.to_list()
+        assert board.get(x, y) == color
+        assert board.check_win(x, y, color) == brute_five(grid, color, (x, y))
+        for c in (BLACK, WHITE):
+            assert board.has_five(c) == brute_five(grid, c)
+        snapshots.append(state(board))
+        if board.has_five(color):
+            break
+        color = 3 - color
+    assert board.move_count() == len(snapshots) - 1
+    while board.history:
+        snapshots.pop()
+        x, y, _ = board.unmake()
+        assert board.is_empty(x, y)
+        assert state(board) == snapshots[-1]
+    assert state(board) == state(BitBoard(size))
+
+
+def test_five_across_row_boundary_is_not_a_win():
+    # 每行末尾的哨兵位保证 (0,13)(0,14)(1,0)(1,1)(1,2) 不会被当成连五
+    board = BitBoard(15)
+    for x, y in ((0, 13), (0, 14), (1, 0), (1, 1), (1, 2)):
+        board.make(x, y, BLACK)
+    assert not board.has_five(BLACK)
+    assert not board.check_win(1, 0, BLACK)
+
+
+def test_make_rejects_occupied_and_out_of_bounds():
+    board = BitBoard(15)
+    board.make(7, 7, BLACK)
+    with pytest.raises(ValueError):
+        board.make(7, 7, WHITE)
+    with pytest.raises(ValueError):
+        board.make(15, 0, WHITE)
@@ -0,0 +1,56 @@
+# test_engine.py
+# 搜索引擎和 MCTS 的基本功：一步连五、堵住对方的冲四和活三
+import pytest
+
+from bitboard import BitBoard, BLACK, WHITE
+from engine import SearchEngine, WIN_SCORE
+from mcts import MCTSEngine
+
+# 黑棋 (7,3)-(7,6) 冲四，(7,2) 被白棋堵住，(7,7) 一步连五
+WIN_IN_ONE = [
+    (7, 3, BLACK), (7, 2, WHITE), (7, 4, BLACK), (3, 3, WHITE),
+    (7, 5, BLACK), (11, 11, WHITE), (7, 6, BLACK), (4, 10, WHITE),
+]
+# 白棋 (5,3)-(5,6) 冲四，另一头 (5,7) 已被黑棋堵住，黑棋必须下 (5,2)
+BLOCK_FOUR = [
+    (7, 7, BLACK), (5, 3, WHITE), (5, 7, BLACK), (5, 4, WHITE),
+    (9, 4, BLACK), (5, 5, WHITE), (10, 10, BLACK), (5, 6, WHITE),
+]
+# 白棋 (6,4)-(6,6) 活三，黑棋不堵 (6,3) 或 (6,7) 下一步就是活四
+BLOCK_THREE = [
+    (7, 7, BLACK), (6, 4, WHITE), (9, 10, BLACK), (6, 5, WHITE), (3, 10, BLACK), (6, 6, WHITE),
+]
+
+
+def board_from(moves):
+    board = BitBoard(15)
+    for x, y, color in moves:
+        board.make(x, y, color)
+    return board
+
+
+@pytest.mark.parametrize("use_threat_solver", [True, False])
+def test_search_engine_wins_in_one(use_threat_solver):
+    engine = SearchEngine(max_depth=3, use_threat_solver=use_threat_solver)
+    result = engine.search(board_from(WIN_IN_ONE), BLACK, time_limit=30)
+    assert result.move == (7, 7)
+    assert result.score >= WIN_SCORE - 100
+
+
+@pytest.mark.parametrize("moves, defences", [(BLOCK_FOUR, {(5, 2)}), (BLOCK_THREE, {(6, 3), (6, 7)})])
+def test_search_engine_blocks(moves, defences):
+    engine = SearchEngine(max_depth=3, use_threat_solver=False)
+    board = board_from(moves)
+    assert engine.search(board, BLACK, time_limit=30).move in defences
+    assert board.move_count() == len(moves)  # 搜索不改动传进来的局面
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_mcts_wins_in_one_and_blocks_four(seed):
+    assert MCTSEngine(max_playouts=256, seed=seed).search(board_from(WIN_IN_ONE), BLACK).move == (7, 7)
+    assert MCTSEngine(max_playouts=256, seed=seed).search(board_from(BLOCK_FOUR), BLACK).move == (5, 2)
+
+
+def test_empty_board_plays_center():
+    assert SearchEngine().search(BitBoard(15), BLACK).move == (7, 7)
+    assert MCTSEngine(max_playouts=16, seed=0).search(BitBoard(15), BLACK).move == (7, 7)
@@ -0,0 +1,136 @@
+# test_llm_cache.py
+# LLM 回复缓存：过期、按条数 / 字节数淘汰，以及和流式提前关流一起用时的存取
+import json
+import re
+
+import pytest
+
+import llm_cache
+from game_core import GomokuGame, request_llm_move
+from llm_cache import CachedLLM, LLMResponseCache
+from llm_interface import LLMInterface
+from stream_parser import EarlyStopper
+
+
+class FakeLLM(LLMInterface):
+    """按固定片段回复的 LLM，记下真正“调用 API”的次数"""
+
+    final_answer_marker = "最终答案"
+
+    def __init__(self, game, chunks):
+        self.gomoku_game = game
+        self.chunks = chunks
+        self.model_name = "fake-r1"
+        self.calls = 0
+
+    def create_prompt(self, board_state, ai_color):
+        return f"{ai_color}\n{board_state}"
+
+    def get_llm_response_stream(self, prompt):
+        self.calls += 1
+        yield from self.chunks
+
+    def parse_response(self, response_text):
+        # 和 QWQ.parse_response 一样取最终回答里的最后一个坐标
+        matches = re.findall(r"\[(\d+),\s*(\d+)\]", response_text.split(self.final_answer_marker)[-1])
+        return (int(matches[-1][0]), int(matches[-1][1])) if matches else None
+
+
+REPLY = ["先看看局面", "，下天元。", "最终答案", "：[7,", "7]", "。后面还有一大段废话", "，" * 100]
+
+
+@pytest.mark.parametrize("calibrate_every", [0, 10])
+def test_early_stop_replays_cached_reply_without_api_call(tmp_path, calibrate_every):
+    game = GomokuGame()
+    fake = FakeLLM(game, REPLY)
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"))
+    llm = CachedLLM(fake, cache, "Fake")
+    early_stop = EarlyStopper(calibrate_every)
+
+    assert request_llm_move(llm, game, "Black", early_stop=early_stop)[0] == (7, 7)
+    assert fake.calls == 1
+    for _ in range(2):
+        assert request_llm_move(llm, game, "Black", early_stop=early_stop)[0] == (7, 7)
+    assert fake.calls == 1
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+def put(cache, key, chunks):
+    cache.put(key, "Fake", "fake-r1", "Black", 0, chunks)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    put(cache, "a", ["[7,7]"])
+    clock.now += 59
+    assert cache.get("a") == ["[7,7]"]
+    clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_evicts_least_recently_used_by_count(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    put(cache, "a", ["a"])
+    clock.now += 1
+    put(cache, "b", ["b"])
+    clock.now += 1
+    assert cache.get("a") == ["a"]  # a 刚用过，b 成了最久没用到的
+    clock.now += 1
+    put(cache, "c", ["c"])
+    assert cache.get("b") is None
+    assert cache.get("a") == ["a"] and cache.get("c") == ["c"]
+    cache.close()
+
+
+def test_evicts_least_recently_used_by_bytes(tmp_path, clock):
+    chunk = "x" * 100
+    size = len(json.dumps([chunk]))
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), max_bytes=2 * size)
+    for key in ("a", "b", "c"):
+        put(cache, key, [chunk])
+        clock.now += 1
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("b") == [chunk] and cache.get("c") == [chunk]
+    cache.close()
+
+
+def test_illegal_replay_is_discarded(tmp_path):
+    game = GomokuGame()
+    game.play(7, 7)
+    fake = FakeLLM(game, ["最终答案", "：[8,8]"])
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"))
+    llm = CachedLLM(fake, cache, "Fake")
+    # 比如哈希碰撞：缓存里这个局面的回复落在了已经有子的 (7,7)
+    prompt = llm.create_prompt(game.get_prompt_board_state(), "White")
+    key = cache.make_key("Fake", "fake-r1", "White", game.position.hash, prompt)
+    cache.put(key, "Fake", "fake-r1", "White", game.position.hash, ["最终答案", "：[7,7]"])
+
+    assert request_llm_move(llm, game, "White")[0] == (7, 7)
+    assert fake.calls == 0
+    assert len(cache) == 0
+    # 重试时重新请求 API，合法的回复再存进去
+    assert request_llm_move(llm, game, "White")[0] == (8, 8)
+    assert fake.calls == 1
+    assert cache.get(key) == ["最终答案", "：[8,8]"]
+    cache.close()
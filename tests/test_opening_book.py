@@ -0,0 +1,67 @@
+# test_opening_book.py
+# 开局库：局面在 8 种对称下都能查到同一条走法（换回各自的实际坐标），存盘后还在
+import random
+
+import pytest
+
+from bitboard import BitBoard, BLACK, WHITE
+from opening_book import INVERSE, SYMMETRIES, OpeningBook, canonical_form, transform
+
+SIZE = 15
+
+
+def random_opening(seed, stones=6):
+    rng = random.Random(seed)
+    board = BitBoard(SIZE)
+    color = BLACK
+    for _ in range(stones):
+        board.make(*rng.choice(board.candidates() or [(7, 7)]), color)
+        color = 3 - color
+    move = rng.choice(board.candidates())
+    return board, color, move
+
+
+def transformed(board, symmetry):
+    other = BitBoard(board.size)
+    for x, y, color in board.history:
+        other.make(*transform(x, y, board.size, symmetry), color)
+    return other
+
+
+def test_inverse_undoes_each_symmetry():
+    for symmetry in range(len(SYMMETRIES)):
+        for x, y in ((0, 0), (3, 11), (14, 2), (7, 7)):
+            tx, ty = transform(x, y, SIZE, symmetry)
+            assert transform(tx, ty, SIZE, INVERSE[symmetry]) == (x, y)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("stored_under", [0, 1, 4, 7])
+def test_lookup_round_trips_under_all_symmetries(tmp_path, seed, stored_under):
+    board, color, move = random_opening(seed)
+    path = str(tmp_path / "book.json")
+    book = OpeningBook(path)
+    stored = transformed(board, stored_under)
+    book.store(stored, color, transform(*move, SIZE, stored_under), score=12, depth=4)
+    book.save()
+    reloaded = OpeningBook(path)
+    for symmetry in range(len(SYMMETRIES)):
+        position = transformed(board, symmetry)
+        assert canonical_form(position, color)[0] == canonical_form(board, color)[0]
+        for lookup_book in (book, reloaded):
+            entry = lookup_book.lookup(position, color)
+            assert entry is not None
+            assert entry.move == transform(*move, SIZE, symmetry)
+            assert (entry.score, entry.depth) == (12, 4)
+    assert len(reloaded) == 1
+    # 换一方行棋就是另一个局面
+    assert reloaded.lookup(board, 3 - color) is None
+
+
+def test_shallower_result_does_not_overwrite():
+    board, color, move = random_opening(0)
+    book = OpeningBook(None)
+    book.store(board, color, move, depth=6)
+    other = next(cell for cell in board.candidates() if cell != move)
+    book.store(board, color, other, depth=2)
+    assert book.lookup(board, color).move == move
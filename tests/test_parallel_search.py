@@ -0,0 +1,46 @@
+# test_parallel_search.py
+# 多进程分根搜索：合并各进程结果，以及和单进程一样先查 VCF / VCT
+from bitboard import BitBoard, BLACK, WHITE
+from engine import WIN_SCORE
+from parallel_search import ParallelSearchEngine, _pick_result
+from threat_solver import ThreatSolver
+
+# 黑棋 (7,5)(7,6) 和 (5,7)(6,7) 两个活二，走 (7,7) 一类的点能连续做活三取胜，但没有 VCF
+TWO_TWOS = [
+    (7, 5, BLACK), (0, 0, WHITE), (7, 6, BLACK), (0, 14, WHITE),
+    (5, 7, BLACK), (14, 0, WHITE), (6, 7, BLACK), (14, 14, WHITE),
+]
+
+
+def test_worker_without_a_finished_depth_is_skipped():
+    results = [[(1, (7, 7), 30), (2, (7, 7), 20)], [], [(1, (8, 8), 10), (2, (8, 8), 50), (3, (8, 8), 40)]]
+    assert _pick_result(results, (0, 0)) == ((8, 8), 50, 2)
+
+
+def test_no_results_fall_back_to_the_first_root_move():
+    assert _pick_result([[], []], (6, 6)) == ((6, 6), 0, 0)
+
+
+def test_decided_worker_does_not_cap_the_depth():
+    lost = [(1, (1, 1), 5), (2, (1, 1), -WIN_SCORE + 4)]
+    open_worker = [(1, (7, 7), 10), (2, (7, 7), 15), (3, (7, 7), 12)]
+    assert _pick_result([lost, open_worker], (0, 0)) == ((7, 7), 12, 3)
+    won = [(1, (2, 2), 50), (2, (2, 2), WIN_SCORE - 3)]
+    assert _pick_result([open_worker, won], (0, 0)) == ((2, 2), WIN_SCORE - 3, 2)
+
+
+def test_parallel_search_runs_vct_like_the_serial_engine():
+    board = BitBoard(15)
+    for x, y, color in TWO_TWOS:
+        board.make(x, y, color)
+    assert ThreatSolver().find_vcf(board, BLACK) is None
+    engine = ParallelSearchEngine(workers=2)
+    engine.solver.max_vct_depth = 2
+    try:
+        result = engine.search(board, BLACK, time_limit=20)
+    finally:
+        engine.shutdown()
+    assert result.score == WIN_SCORE
+    solver = ThreatSolver()
+    solver.max_vct_depth = 2
+    assert result.move == solver.find_vct(board, BLACK)[0]
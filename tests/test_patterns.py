@@ -0,0 +1,72 @@
+# test_patterns.py
+# 棋型评估：增量更新、NumPy 批量评估都要和整盘重新评估的结果一致
+import random
+
+import numpy as np
+import pytest
+
+from batch_eval import evaluate_batch, positions_from_boards, positions_from_moves
+from bitboard import BitBoard, BLACK, WHITE
+from patterns import PatternEvaluator
+
+
+def random_game(seed, size=15, max_moves=80):
+    """随机对局，落在已有棋子附近，出现五连或下满 max_moves 手为止"""
+    rng = random.Random(seed)
+    board = BitBoard(size)
+    color = BLACK
+    while board.move_count() < max_moves and not board.is_full():
+        x, y = rng.choice(board.candidates(1) or board.empty_cells())
+        board.make(x, y, color)
+        if board.check_win(x, y, color):
+            break
+        color = 3 - color
+    return list(board.history)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_incremental_matches_full_evaluation(seed):
+    moves = random_game(seed)
+    board = BitBoard(15)
+    evaluator = PatternEvaluator(board)
+    expected = []
+    for x, y, color in moves:
+        board.make(x, y, color)
+        evaluator.update(x, y)
+        fresh = PatternEvaluator(board.copy())
+        assert evaluator.totals == fresh.totals
+        expected.append(fresh.totals)
+    # 悔棋回去，每一步都要回到当时的分数
+    for totals in reversed(expected[:-1]):
+        x, y, _ = board.unmake()
+        evaluator.update(x, y)
+        assert evaluator.totals == totals
+    x, y, _ = board.unmake()
+    evaluator.update(x, y)
+    assert evaluator.totals == [0, 0, 0]
+
+
+@pytest.mark.parametrize("size", [9, 15])
+def test_batch_matches_pattern_evaluator(size):
+    boards = []
+    for seed in range(8):
+        board = BitBoard(size)
+        for x, y, color in random_game(seed, size):
+            board.make(x, y, color)
+            boards.append(board.copy())
+    result = evaluate_batch(positions_from_boards(boards), chunk_size=16)
+    for i, board in enumerate(boards):
+        assert result.scores[i] == PatternEvaluator(board).score(BLACK)
+        assert list(result.wins[i]) == [board.has_five(BLACK), board.has_five(WHITE)]
+        # 每个空位恰好计入一种棋型（含“无棋型”）
+        assert result.threats[i].sum(axis=1).tolist() == [len(board.empty_cells())] * 2
+
+
+def test_positions_from_moves_matches_boards():
+    moves = random_game(3)
+    board = BitBoard(15)
+    boards = []
+    for x, y, color in moves:
+        board.make(x, y, color)
+        boards.append(board.copy())
+    assert np.array_equal(positions_from_moves(moves), positions_from_boards(boards))
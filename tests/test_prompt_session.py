@@ -0,0 +1,30 @@
+# test_prompt_session.py
+# 会话模式的增量 Prompt：局面本身不含棋子（只发附近空位）时，每一步都要带上完整的棋子列表
+import pytest
+
+from bitboard import BLACK, WHITE
+from game_core import GomokuGame
+from prompt_session import PromptSession
+
+MOVES = [(7, 7), (7, 8), (8, 8), (6, 6), (9, 9), (8, 7)]
+
+
+@pytest.mark.parametrize("encoding", [None, "grid", "compact"])
+def test_prefix_prompt_lists_every_stone_with_relevant_cells(encoding):
+    game = GomokuGame()
+    game.prompt_relevant_cells = True
+    session = PromptSession("prefix")
+    for x, y in MOVES[:4]:
+        game.play(x, y)
+    # 上次作答之后只新落了两个子，增量里只有这两个，其余棋子全靠棋子列表
+    session.record(game, "上一步的 Prompt", (9, 9))
+    for x, y in MOVES[4:]:
+        game.play(x, y)
+
+    prompt = session.turn_prompt(game, game.get_prompt_board_state(encoding), encoding)
+
+    black = prompt.split("【黑棋位置】：")[1].split("\n")[0]
+    white = prompt.split("【白棋位置】：")[1].split("\n")[0]
+    for x, y, color in game.moves:
+        assert f"({x}, {y})" in (black if color == BLACK else white)
+    assert len(game.position.stones(BLACK)) + len(game.position.stones(WHITE)) == len(MOVES)
@@ -0,0 +1,41 @@
+# test_stream_parser.py
+# 流式解析：提前定下的坐标必须和流收完后 parse_response 解析出的一样
+from game_core import GomokuGame, request_llm_move
+from stream_parser import EarlyStopper, StreamMoveParser
+from test_llm_cache import FakeLLM
+
+# 先写了一个坐标，没过几个字又改口
+CHANGED_MIND = ["想一想", "最终答案", "：先下 [7,", "8]，", "不对，那样白棋能冲四，", "最终 [7,9]", "。", "理由如下：", *["……"] * 60]
+
+
+def feed_all(parser, chunks):
+    for chunk in chunks:
+        move = parser.feed(chunk)
+        if move is not None:
+            return move
+    return None
+
+
+def test_feed_agrees_with_parse_response_when_the_answer_changes():
+    game = GomokuGame()
+    fake = FakeLLM(game, CHANGED_MIND)
+    parser = StreamMoveParser(fake, game.is_legal)
+    assert feed_all(parser, CHANGED_MIND) == fake.parse_response("".join(CHANGED_MIND)) == (7, 9)
+
+
+def test_feed_waits_for_settle_chars():
+    game = GomokuGame()
+    fake = FakeLLM(game, [])
+    parser = StreamMoveParser(fake, game.is_legal, settle_chars=10)
+    assert parser.feed("最终答案：[7,7]") is None
+    assert parser.feed("。还有") is None
+    assert parser.feed("一点点，再来[") is None  # 后面又开了一个坐标，继续等
+    assert parser.feed("3,3]。结束了，后面全是废话") == (3, 3)
+
+
+def test_early_stop_plays_the_corrected_move():
+    game = GomokuGame()
+    fake = FakeLLM(game, CHANGED_MIND)
+    move, text = request_llm_move(fake, game, "Black", early_stop=EarlyStopper(0))
+    assert move == (7, 9)
+    assert len(text) < len("".join(CHANGED_MIND))  # 确实提前关流了
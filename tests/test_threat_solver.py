@@ -0,0 +1,97 @@
+# test_threat_solver.py
+# VCF 求解和对局复盘：手工摆出来的局面
+from bitboard import BitBoard, BLACK, WHITE
+from patterns import OPEN_FOUR, threat_map
+from threat_solver import ThreatSolver, analyze_missed_wins, three_defences
+
+# 黑棋横向 (7,3)-(7,5)、纵向 (4,6)-(6,6) 两个眠三，(7,6) 一子双冲四；白子先把两头堵上，角上的白子只是垫步
+DOUBLE_FOUR = [
+    (7, 3, BLACK), (7, 2, WHITE), (7, 4, BLACK), (3, 6, WHITE), (7, 5, BLACK), (0, 0, WHITE),
+    (4, 6, BLACK), (0, 14, WHITE), (5, 6, BLACK), (14, 0, WHITE), (6, 6, BLACK),
+]
+# 黑棋 (11,5)-(11,7) 活三：(11,4) 和 (11,8) 都能走成活四
+OPEN_THREE = [
+    (11, 5, BLACK), (0, 0, WHITE), (11, 6, BLACK), (0, 14, WHITE), (11, 7, BLACK), (14, 0, WHITE),
+]
+
+# 白棋 (7,5) 做成跳三 (7,5)_(9,7)(10,8)：黑棋堵 (11,9) 就能防住，以前只试 (8,6)，误报白棋 VCT
+BROKEN_THREE = [
+    (7, 7, BLACK), (9, 7, WHITE), (11, 8, BLACK), (7, 9, WHITE), (6, 6, BLACK),
+    (10, 9, WHITE), (9, 11, BLACK), (10, 8, WHITE), (10, 5, BLACK),
+]
+
+
+def board_from(moves):
+    board = BitBoard(15)
+    for x, y, color in moves:
+        board.make(x, y, color)
+    return board
+
+
+def assert_winning_line(board, line, attacker):
+    """手顺除最后一手外攻守交替，最后一手是攻方的连五点（活四时紧跟在攻方的冲四之后）"""
+    board = board.copy()
+    color = attacker
+    for x, y in line[:-1]:
+        assert board.is_empty(x, y)
+        board.make(x, y, color)
+        color = 3 - color
+    x, y = line[-1]
+    board.make(x, y, attacker)
+    assert board.check_win(x, y, attacker)
+
+
+def test_find_vcf_double_four():
+    board = board_from(DOUBLE_FOUR)
+    line = ThreatSolver().find_vcf(board, BLACK)
+    assert line is not None and line[0] == (7, 6)
+    assert_winning_line(board, line, BLACK)
+    assert ThreatSolver().find_vcf(board, WHITE) is None
+
+
+def test_find_vcf_defended():
+    board = board_from(DOUBLE_FOUR + [(7, 6, WHITE)])
+    assert ThreatSolver().find_vcf(board, BLACK) is None
+
+
+def test_missed_defence():
+    report = analyze_missed_wins(DOUBLE_FOUR + [(14, 14, WHITE)])
+    assert [(item["move_number"], item["kind"]) for item in report] == [(len(DOUBLE_FOUR) + 1, "missed_defence")]
+    assert report[0]["line"][0] == (7, 6)
+
+
+def test_defended_is_not_reported():
+    assert analyze_missed_wins(DOUBLE_FOUR + [(7, 6, WHITE)]) == []
+
+
+def test_missed_win():
+    moves = DOUBLE_FOUR + [(14, 14, WHITE), (1, 7, BLACK)]
+    last = [item for item in analyze_missed_wins(moves) if item["move_number"] == len(moves)]
+    assert [item["kind"] for item in last] == ["missed_win"]
+
+
+def test_other_winning_four_is_not_a_missed_win():
+    solver = ThreatSolver()
+    line = solver.find_vcf(board_from(OPEN_THREE), BLACK)
+    assert line is not None and line[0] in ((11, 4), (11, 8))
+    other = (11, 8) if line[0] == (11, 4) else (11, 4)
+    moves = OPEN_THREE + [other + (BLACK,)]
+    assert [item for item in analyze_missed_wins(moves, solver=solver) if item["move_number"] == len(moves)] == []
+
+
+def test_broken_three_end_blocks_are_defences():
+    board = board_from(BROKEN_THREE + [(7, 5, WHITE)])
+    defences = set()
+    for cell in threat_map(board, WHITE, board.candidates(), OPEN_FOUR):
+        defences.update(three_defences(board, 7, 5, cell))
+    assert {(6, 4), (8, 6), (11, 9)} <= defences
+
+
+def test_broken_three_is_not_a_vct():
+    board = board_from(BROKEN_THREE + [(7, 5, WHITE)])
+    solver = ThreatSolver(max_nodes=200000, time_limit=60)
+    line = solver._run(lambda b, c: solver._after_three(b, c, 7, 5, solver.max_vct_depth), board, WHITE, None)
+    assert line is None and solver.last_status == "disproved"
+    board.make(11, 9, BLACK)
+    assert solver.find_vct(board, WHITE, time_limit=60) is None
+    assert solver.last_status == "disproved"
@@ -0,0 +1,308 @@
+# threat_solver.py
+# 威胁空间搜索：只看冲四、活三这些“对方必须应”的走法，专门找连续冲四胜（VCF）和连续活三胜（VCT）。
+# 比全宽度的 Alpha-Beta 窄得多，在节点/时间预算内就能发现 LLM 经常漏掉的杀棋！(ง •̀_•́)ง
+# 结果按 Zobrist 哈希存进证明缓存，引擎、对局分析和 Prompt 提示都可以直接调用。
+import time
+from collections import OrderedDict
+
+from bitboard import BitBoard, DIRECTIONS
+from patterns import (
+    FIVE, OPEN_FOUR, FOUR, OPEN_THREE,
+    best_threat, threat_map, describe_threats,
+)
+
+
+class SolverBudgetExceeded(Exception):
+    """节点数或时间预算用完了"""
+
+
+def five_spots_through(board, x, y, color):
+    """经过 (x, y) 的四条线上，color 再下一子就能连五的空位"""
+    spots = []
+    for dx, dy in DIRECTIONS:
+        for k in range(-4, 5):
+            nx, ny = x + k * dx, y + k * dy
+            if k and board.in_bounds(nx, ny) and board.is_empty(nx, ny):
+                if best_threat(board, nx, ny, color) == FIVE and (nx, ny) not in spots:
+                    spots.append((nx, ny))
+    return spots
+
+
+def three_defences(board, x, y, cell):
+    """攻方在 (x, y) 成三后，cell 是它再下就成活四的点，返回对方所有的防点
+
+    同一条线上 (x, y) 前后四格内的空位都试一遍（跳三 X_XX 的两头也能防），
+    对方下在那里之后，这条线上攻方再也下不出活四 / 连五的才算。
+    """
+    attacker = board.get(x, y)
+    for dx, dy in DIRECTIONS:
+        line = [(x + j * dx, y + j * dy) for j in range(-4, 5)]
+        if cell not in line:
+            continue
+        empties = [(nx, ny) for nx, ny in line if board.in_bounds(nx, ny) and board.is_empty(nx, ny)]
+        defences = []
+        for bx, by in empties:
+            board.make(bx, by, 3 - attacker)
+            try:
+                if all(best_threat(board, nx, ny, attacker) < OPEN_FOUR
+                       for nx, ny in empties if (nx, ny) != (bx, by)):
+                    defences.append((bx, by))
+            finally:
+                board.unmake()
+        return defences
+    return [cell]
+
+
+class ThreatSolver:
+    """VCF / VCT 求解器，带节点预算、时间预算和按局面哈希的证明缓存"""
+
+    def __init__(self, max_nodes=20000, time_limit=0.5, max_vcf_depth=12, max_vct_depth=4, cache_size=100000):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.max_vcf_depth = max_vcf_depth  # 攻方最多连续冲四的步数
+        self.max_vct_depth = max_vct_depth  # 攻方最多连续活三的步数
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (哈希, 攻方, "vcf"/"vct") -> (深度, 手顺或 None)
+        self.nodes = 0
+        self.deadline = 0.0
+        self.cache_hits = 0
+        self.last_status = None  # "proved" / "disproved" / "budget"
+
+    # ---------- 缓存 ----------
+
+    def _cache_get(self, key, depth):
+        entry = self.cache.get(key)
+        if entry is None:
+            return False, None
+        stored_depth, line = entry
+        # 证明在任何深度都成立；证伪只对不超过当时深度的搜索有效
+        if line is not None or stored_depth >= depth:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return True, line
+        return False, None
+
+    def _cache_put(self, key, depth, line):
+        self.cache[key] = (depth, line)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)  # 淘汰最久没用到的
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise SolverBudgetExceeded()
+        if self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise SolverBudgetExceeded()
+
+    # ---------- 搜索 ----------
+
+    def _vcf(self, board, attacker, depth):
+        self._tick()
+        key = (board.hash, attacker, "vcf")
+        found, line = self._cache_get(key, depth)
+        if found:
+            return list(line) if line else None
+
+        defender = 3 - attacker
+        cells = board.candidates()
+        attacks = threat_map(board, attacker, cells, FOUR)
+        fives = [cell for cell, cls in attacks.items() if cls == FIVE]
+        if fives:
+            result = [fives[0]]
+            self._cache_put(key, depth, result)
+            return list(result)
+
+        result = None
+        if depth > 0:
+            defender_fives = [cell for cell, cls in threat_map(board, defender, cells, FIVE).items()]
+            if len(defender_fives) < 2:
+                moves = sorted((cell for cell, cls in attacks.items() if cls in (FOUR, OPEN_FOUR)),
+                               key=lambda cell: -attacks[cell])
+                if defender_fives:
+                    # 对方已经冲四了，只能在堵点上反冲四
+                    moves = [cell for cell in moves if cell == defender_fives[0]]
+                for x, y in moves:
+                    board.make(x, y, attacker)
+                    try:
+                        result = self._after_four(board, attacker, x, y, depth)
+                    finally:
+                        board.unmake()
+                    if result:
+                        break
+        self._cache_put(key, depth, result)
+        return list(result) if result else None
+
+    def _after_four(self, board, attacker, x, y, depth):
+        """攻方刚在 (x, y) 冲四，对方只能去堵，返回从 (x, y) 开始的完整手顺或 None"""
+        spots = five_spots_through(board, x, y, attacker)
+        if len(spots) >= 2:
+            return [(x, y), spots[0]]  # 活四，两头堵不住
+        if not spots:
+            return None
+        bx, by = spots[0]
+        defender = 3 - attacker
+        board.make(bx, by, defender)
+        try:
+            if board.check_win(bx, by, defender):
+                return None
+            sub = self._vcf(board, attacker, depth - 1)
+        finally:
+            board.unmake()
+        if sub:
+            return [(x, y), (bx, by)] + sub
+        return None
+
+    def _vct(self, board, attacker, depth):
+        self._tick()
+        key = (board.hash, attacker, "vct")
+        found, line = self._cache_get(key, depth)
+        if found:
+            return list(line) if line else None
+
+        result = self._vcf(board, attacker, self.max_vcf_depth)
+        if result is None and depth > 0:
+            defender = 3 - attacker
+            cells = board.candidates()
+            if not threat_map(board, defender, cells, FIVE):
+                attacks = threat_map(board, attacker, cells, OPEN_THREE)
+                moves = sorted(attacks, key=lambda cell: -attacks[cell])
+                for x, y in moves:
+                    board.make(x, y, attacker)
+                    try:
+                        result = self._after_three(board, attacker, x, y, depth)
+                    finally:
+                        board.unmake()
+                    if result:
+                        break
+        self._cache_put(key, depth, result)
+        return list(result) if result else None
+
+    def _after_three(self, board, attacker, x, y, depth):
+        """攻方刚在 (x, y) 做出活三（或冲四），对方所有像样的应手都必须被继续攻破"""
+        defender = 3 - attacker
+        cells = board.candidates()
+        # 对方的应手：攻方下一手能成活四/连五的点，这些点所在的线上 (x, y) 前后四格内的所有空位
+        # （跳三 X_XX 的两头也能防），加上对方自己的冲四（反击）
+        replies = set()
+        for cell in threat_map(board, attacker, cells, OPEN_FOUR):
+            replies.update(three_defences(board, x, y, cell))
+        replies.update(threat_map(board, defender, cells, FOUR))
+        if not replies:
+            return None
+        first_line = None
+        for rx, ry in sorted(replies):
+            board.make(rx, ry, defender)
+            try:
+                if board.check_win(rx, ry, defender):
+                    return None
+                sub = self._vct(board, attacker, depth - 1)
+            finally:
+                board.unmake()
+            if not sub:
+                return None
+            if first_line is None:
+                first_line = [(x, y), (rx, ry)] + sub
+        return first_line
+
+    def _run(self, search, position, color, time_limit):
+        board = position.copy() if isinstance(position, BitBoard) else position.position.copy()
+        self.nodes = 0
+        self.deadline = time.perf_counter() + (self.time_limit if time_limit is None else time_limit)
+        try:
+            line = search(board, color)
+        except SolverBudgetExceeded:
+            self.last_status = "budget"
+            return None
+        self.last_status = "proved" if line else "disproved"
+        return line
+
+    def find_vcf(self, position, color, time_limit=None):
+        """color 方连续冲四取胜的手顺（双方交替的坐标列表，第一个是攻方的下一手），找不到返回 None"""
+        return self._run(lambda board, c: self._vcf(board, c, self.max_vcf_depth), position, color, time_limit)
+
+    def find_vct(self, position, color, time_limit=None):
+        """color 方连续活三/冲四取胜的手顺，找不到返回 None"""
+        return self._run(lambda board, c: self._vct(board, c, self.max_vct_depth), position, color, time_limit)
+
+
+def _format_line(line):
+    return " → ".join(f"({x},{y})" for x, y in line)
+
+
+def prompt_hint_section(position, color, solver=None):
+    """给 create_prompt 用的可选【局面提示】：必胜手顺、对方的杀棋和双方的主要棋型点"""
+    if solver is None:
+        solver = ThreatSolver(max_nodes=5000, time_limit=0.3)
+    lines = []
+    own_line = solver.find_vcf(position, color) or solver.find_vct(position, color)
+    if own_line:
+        lines.append(f"你有必胜手顺（攻守交替）：{_format_line(own_line)}，先下 ({own_line[0][0]},{own_line[0][1]})！")
+    their_line = solver.find_vcf(position, 3 - color)
+    if their_line:
+        lines.append(f"对方有连续冲四的杀棋：{_format_line(their_line)}，必须抢先防守！")
+    cells = position.candidates()
+    own_threats = describe_threats(position, color, cells, limit=5)
+    their_threats = describe_threats(position, 3 - color, cells, limit=5)
+    if own_threats:
+        lines.append("你下这些点能形成：" + "，".join(own_threats))
+    if their_threats:
+        lines.append("对方下这些点能形成：" + "，".join(their_threats))
+    if not lines:
+        return ""
+    return "\n【局面提示】(本地威胁分析，仅供参考)\n" + "\n".join(lines) + "\n"
+
+
+def _keeps_vcf(solver, board, x, y, color):
+    """color 刚在 (x, y) 落子（已经 make 过）：这一手本身还是连续冲四杀吗？
+
+    走了另一条能杀的冲四不算漏：活四直接赢；冲四的话，对方只能去堵，堵完 color 仍有 VCF 就还是杀。
+    """
+    spots = five_spots_through(board, x, y, color)
+    if len(spots) >= 2:
+        return True
+    if not spots or threat_map(board, 3 - color, board.candidates(), FIVE):
+        return False  # 没冲四，或者对方自己能先连五
+    bx, by = spots[0]
+    board.make(bx, by, 3 - color)
+    try:
+        return bool(solver.find_vcf(board, color))
+    finally:
+        board.unmake()
+
+
+def analyze_missed_wins(moves, size=15, solver=None):
+    """逐步回放一盘棋，找出行棋方有 VCF 却没走、或者对方有 VCF 却没防住的步
+
+    moves 是 [(x, y, color), ...]，返回 [{"move_number", "color", "played", "kind", "line"}, ...]，
+    kind 为 "missed_win"（漏了自己的杀）或 "missed_defence"（没防住对方的杀）；
+    走的不是求解器给的那条手顺、但同样是能杀的冲四，不算漏。
+    """
+    if solver is None:
+        solver = ThreatSolver()
+    board = BitBoard(size)
+    report = []
+    for number, (x, y, color) in enumerate(moves, 1):
+        own_line = solver.find_vcf(board, color)
+        their_line = solver.find_vcf(board, 3 - color)
+        board.make(x, y, color)
+        if board.check_win(x, y, color):
+            continue
+        if own_line and (x, y) != own_line[0] and not _keeps_vcf(solver, board, x, y, color):
+            report.append({"move_number": number, "color": color, "played": (x, y),
+                           "kind": "missed_win", "line": own_line})
+        elif their_line and solver.find_vcf(board, 3 - color):
+            report.append({"move_number": number, "color": color, "played": (x, y),
+                           "kind": "missed_defence", "line": their_line})
+    return report
+
+
+def describe_missed_wins(report):
+    """把 analyze_missed_wins 的结果转成可读的中文报告"""
+    names = {1: "黑棋", 2: "白棋"}
+    lines = []
+    for item in report:
+        what = "漏掉了自己的连续冲四杀" if item["kind"] == "missed_win" else "没防住对方的连续冲四杀"
+        lines.append(f"第 {item['move_number']} 手 {names[item['color']]} 下在 {item['played']}，{what}：{_format_line(item['line'])}")
+    return "\n".join(lines)
+